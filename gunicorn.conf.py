@@ -0,0 +1,17 @@
+'''
+gunicorn settings, read by gunicorn when started from the repository root:
+    gunicorn "personal_time_manager:gunicorn_main_routine()"
+
+The solve jobs (backend/jobs.py) live in the memory of the process that accepted them, a second worker process
+would answer 404 when polled or cancelled for the jobs of the first one.
+So the app runs in one worker serving the requests with threads, and refuses to start with more workers.
+'''
+workers = 1
+worker_class = "gthread"
+threads = 8
+
+
+def on_starting(server):
+    if server.cfg.workers != 1:
+        raise RuntimeError(f"the solve jobs need a single worker (got {server.cfg.workers}), "
+                           "use threads for more concurrent requests")
@@ -3,11 +3,15 @@
 '''
 from flask import Blueprint, request, jsonify
 import time
+from datetime import date
 from ..database.db_handler import DatabaseHandler
+from ..csp.portfolio import CONFIGURABLE
+from .jobs import JobManager
 
-# create a Blueprint and the Database Handler
+# create a Blueprint, the Database Handler and the background solve jobs
 main_routes = Blueprint('main_routes', __name__)
 db = DatabaseHandler()
+jobs = JobManager() # in the memory of this process, the app runs in a single worker (gunicorn.conf.py)
 
 # --- API Endpoints ---
 
@@ -85,6 +89,45 @@ def get_timetable():
     mock_timetable = { "tuitions": [ { "day": "saturday", "subject": "Math", "start": "10:00", "end": "11:30" }, { "day": "monday", "subject": "Physics", "start": "19:00", "end": "20:00" } ] }
     return jsonify(mock_timetable)
 
+@main_routes.route('/timetable/solve', methods=['POST'])
+def submit_solve_job():
+    '''
+    queues the solving of a week and returns the job id straight away, see jobs.py
+    body: {"userId", "weekStart": "YYYY-MM-DD" (a Saturday), "timeLimit": seconds (optional), "options": csp options (optional)}
+    '''
+    data = request.get_json(silent=True) or {}
+    user_id = data.get('userId')
+    week_start = data.get('weekStart')
+    options = data.get('options') or {}
+
+    if not user_id:
+        return jsonify({"error": "Invalid or missing user ID"}), 401
+    try:
+        if date.fromisoformat(week_start).weekday() != 5:
+            return jsonify({"error": "weekStart must be a Saturday"}), 400
+    except (TypeError, ValueError):
+        return jsonify({"error": "weekStart must be an ISO date (YYYY-MM-DD)"}), 400
+    unknown = set(options) - set(CONFIGURABLE)
+    if unknown:
+        return jsonify({"error": f"Unknown options {sorted(unknown)}, choose from {list(CONFIGURABLE)}"}), 400
+
+    try:
+        job, created = jobs.submit({"user_id": user_id, "week_start": week_start, "options": options}, data.get('timeLimit'))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid timeLimit: {e}"}), 400
+    return jsonify({"jobId": job.id, "status": job.status, "deduplicated": not created}), 202
+
+@main_routes.route('/timetable/solve/<job_id>', methods=['GET', 'DELETE'])
+def handle_solve_job(job_id):
+    if request.method == 'GET':
+        job = jobs.get(job_id)
+    else: # DELETE cancels the job
+        job = jobs.cancel(job_id)
+
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
+
 @main_routes.route('/logs', methods=['GET'])
 def get_logs():
     student_id = request.args.get('student_id')
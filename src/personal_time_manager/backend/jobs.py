@@ -0,0 +1,270 @@
+'''
+Background solve jobs
+
+Solving a hard week can take seconds, far too long to hold a gunicorn sync worker, so POST /timetable/solve only queues a job
+and answers with its id straight away. A small pool of threads runs the jobs,
+the client polls GET /timetable/solve/<id> for the status and the progress and can DELETE it to cancel it.
+
+- every job has a deadline, the search stops there (keeping the best timetable found so far when optimizing)
+- a cancelled or late job stops at the next value its search tries (the checks run before every consistency check)
+- the progress (nodes explored, best cost so far) is updated while the search runs
+- submitting the same inputs as a queued or running job gives back that job instead of solving again,
+  a finished job is never given back: the sessions, calendar or prayer times behind the same inputs may have changed since
+
+The CSP is built inside the job (building a week fetches the prayer times) by the build function of the JobManager,
+planner.build_week_csp by default.
+
+The jobs live in the memory of the process that accepted them: the app has to be served by a single process
+(one gunicorn worker with threads, enforced by gunicorn.conf.py), another worker would answer 404 for them.
+'''
+from __future__ import annotations
+import hashlib
+import json
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional
+from personal_time_manager.csp.csp import CSP
+from personal_time_manager.csp.optimize import branch_and_bound
+from personal_time_manager.csp.stats import SolverStats
+from personal_time_manager.sessions.base_session import Session
+
+QUEUED = "queued"
+RUNNING = "running"
+SOLVED = "solved"
+UNSATISFIABLE = "unsatisfiable"
+TIMED_OUT = "timed_out"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+FINISHED = (SOLVED, UNSATISFIABLE, TIMED_OUT, CANCELLED, FAILED)
+REUSABLE = (QUEUED, RUNNING) # submitting the same inputs again gives back these jobs
+
+PROGRESS_INTERVAL = 200 # nodes between two progress updates
+
+
+class JobStopped(Exception):
+    '''
+    raised from inside the search to stop a cancelled or late job
+    '''
+    def __init__(self, status: str):
+        super().__init__(status)
+        self.status = status
+
+
+def job_key(inputs: dict) -> str:
+    '''
+    :return str: sha256 hex digest of the inputs, equal for inputs equal once serialized (key order doesn't matter)
+    '''
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str).encode()).hexdigest()
+
+def timetable(solution: dict[Session: datetime]) -> list[dict]:
+    '''
+    json-able timetable of a solution, sorted by start
+    '''
+    return [{"name": session.session_descriptor.name, "start": start.isoformat(), "end": (start + session.base_duration).isoformat()}
+            for session, start in sorted(solution.items(), key=lambda item: item[1])]
+
+
+class Job:
+    def __init__(self, key: str, inputs: dict, time_limit: float):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.inputs = inputs
+        self.time_limit = time_limit
+        self.status = QUEUED
+        self.progress = {"nodes": 0, "backtracks": 0, "best_cost": None, "elapsed_seconds": 0.0}
+        self.result: Optional[list[dict]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def to_dict(self) -> dict:
+        return {"jobId": self.id, "status": self.status, "inputs": self.inputs, "timeLimit": self.time_limit,
+                "progress": dict(self.progress), "result": self.result, "error": self.error,
+                "createdAt": self.created_at, "startedAt": self.started_at, "finishedAt": self.finished_at}
+
+
+class JobManager:
+    '''
+    runs the solve jobs in a thread pool and keeps them (the finished ones up to keep_finished) for polling
+    '''
+    def __init__(self, build: Optional[Callable[..., CSP]] = None, max_workers: int = 2,
+                 default_time_limit: float = 30.0, max_time_limit: float = 120.0, keep_finished: int = 100):
+        '''
+        :param build: called with the inputs of a job as keyword arguments, returns the CSP to solve
+        :param default_time_limit: seconds a job may run when the request doesn't say
+        :param max_time_limit: the time limit of a request is capped to this
+        '''
+        self.build = build if build is not None else _build_week
+        self.default_time_limit = default_time_limit
+        self.max_time_limit = max_time_limit
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="solve-job")
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str: Job] = OrderedDict() # by id, oldest first
+        self._by_key: dict[str: Job] = {}
+
+    def submit(self, inputs: dict, time_limit: Optional[float] = None) -> tuple[Job, bool]:
+        '''
+        :param inputs: json-able keyword arguments of build, they identify the job
+        :return tuple: (the job, False if it's an existing job with the same inputs)
+        '''
+        time_limit = self.default_time_limit if time_limit is None else float(time_limit)
+        if not math.isfinite(time_limit) or time_limit <= 0:
+            raise ValueError("the time limit must be a positive number of seconds")
+        time_limit = min(time_limit, self.max_time_limit)
+
+        key = job_key(inputs)
+        with self._lock:
+            existing = self._by_key.get(key)
+            if existing is not None and existing.status in REUSABLE:
+                return existing, False
+
+            job = Job(key, inputs, time_limit)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            self._forget_old_jobs()
+        self._executor.submit(self._run, job)
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        '''
+        a queued job is cancelled right away, a running one as soon as its search tries its next value
+        :return: the job, None if there's no such job
+        '''
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if not job.finished:
+                job.cancel_requested.set()
+                if job.status == QUEUED:
+                    self._finish(job, CANCELLED)
+        return job
+
+    def wait(self, job_id: str, timeout: Optional[float] = None, poll: float = 0.01) -> Optional[Job]:
+        '''
+        blocks until the job is finished or timeout seconds passed (used by the tests and scripts, the web clients poll)
+        '''
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        job = self.get(job_id)
+        while job is not None and not job.finished and (deadline is None or time.perf_counter() < deadline):
+            time.sleep(poll)
+        return job
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel_requested.set()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _forget_old_jobs(self) -> None:
+        finished = [job for job in self._jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+
+    def _finish(self, job: Job, status: str, result: Optional[list[dict]] = None, error: Optional[str] = None) -> None:
+        job.status, job.result, job.error = status, result, error
+        job.finished_at = time.time()
+        if job.started_at is not None:
+            job.progress["elapsed_seconds"] = job.finished_at - job.started_at
+
+    def _run(self, job: Job) -> None:
+        with self._lock:
+            if job.status != QUEUED: # cancelled while queued
+                return
+            job.status = RUNNING
+            job.started_at = time.time()
+        deadline = time.perf_counter() + job.time_limit
+
+        def check() -> None:
+            job.progress["elapsed_seconds"] = time.time() - job.started_at
+            if job.cancel_requested.is_set():
+                raise JobStopped(CANCELLED)
+            if time.perf_counter() > deadline:
+                raise JobStopped(TIMED_OUT)
+
+        try:
+            csp = self.build(**job.inputs)
+            check()
+            if csp.soft_constraints:
+                status, solution = self._optimize(job, csp, deadline)
+            else:
+                status, solution = self._solve(job, csp, check)
+            result = None if solution is None else timetable(solution)
+            with self._lock:
+                self._finish(job, status, result)
+        except JobStopped as stopped:
+            with self._lock:
+                self._finish(job, stopped.status)
+        except Exception as e:
+            print(f"!!! SOLVE JOB {job.id} FAILED: {e} !!!")
+            with self._lock:
+                self._finish(job, FAILED, error=str(e))
+
+    @staticmethod
+    def _solve(job: Job, csp: CSP, check: Callable) -> tuple[str, Optional[dict[Session: datetime]]]:
+        def on_progress(stats) -> None:
+            job.progress["nodes"], job.progress["backtracks"] = stats.nodes, stats.backtracks
+            check()
+
+        # the deadline and the cancellation are checked on every value tried, not only at the progress reports,
+        # a job stopped between two reports still records how far it got
+        stats = SolverStats()
+        try:
+            solution = csp.solve(on_progress=on_progress, progress_interval=PROGRESS_INTERVAL, check=check, stats=stats)
+        finally:
+            job.progress["nodes"], job.progress["backtracks"] = stats.nodes, stats.backtracks
+        if solution is None:
+            return UNSATISFIABLE, None
+        job.progress["best_cost"] = csp.cost(solution)
+        return SOLVED, solution
+
+    @staticmethod
+    def _optimize(job: Job, csp: CSP, deadline: float) -> tuple[str, Optional[dict[Session: datetime]]]:
+        '''
+        branch and bound until the deadline, a job out of time still gives the best timetable found
+        '''
+        def on_improvement(solution: dict[Session: datetime], cost: float) -> None:
+            job.progress["best_cost"] = cost
+
+        stats = SolverStats()
+
+        def should_stop() -> bool:
+            if stats.nodes != job.progress["nodes"]:
+                job.progress["nodes"], job.progress["backtracks"] = stats.nodes, stats.backtracks
+                if stats.nodes % PROGRESS_INTERVAL == 0:
+                    job.progress["elapsed_seconds"] = time.time() - job.started_at
+            return job.cancel_requested.is_set()
+
+        solution, _ = branch_and_bound(csp, time_budget=max(0.0, deadline - time.perf_counter()),
+                                       on_improvement=on_improvement, should_stop=should_stop, stats=stats)
+        if job.cancel_requested.is_set():
+            raise JobStopped(CANCELLED)
+        if time.perf_counter() > deadline:
+            return TIMED_OUT, solution
+        return (UNSATISFIABLE, None) if solution is None else (SOLVED, solution)
+
+def _build_week(week_start: str, options: Optional[dict] = None, **_) -> CSP:
+    '''
+    the CSP of the week starting on the week_start Saturday (iso date), other inputs (the user ...) only tell jobs apart
+    '''
+    from personal_time_manager.csp.planner import build_week_csp # imports the session groups, only needed by real jobs
+    return build_week_csp(datetime.fromisoformat(week_start), **(options or {}))
@@ -0,0 +1,229 @@
+'''
+Conflict-directed backjumping (CBJ) with nogood learning for the iterative search
+
+Chronological backtracking goes back to the previous variable when every value of a variable failed,
+even when that previous variable has nothing to do with the failure (a Friday tuition failing because of a Saturday one
+re-tries every variable assigned in between). Here every frame keeps the conflict set of its variable:
+the assigned variables the failures of its values were caused by, taken from Constraint.conflict_set.
+When the values run out the search jumps straight back to the most recent variable of the conflict set
+and passes the rest of the conflict set on to it.
+
+The values of the conflict set at that moment can't be part of any solution together, they are learned as a nogood
+so the same combination is rejected on sight the next time the search reaches it through another branch.
+
+Forward checking is done here too, recording for every pruned value the variables that ruled it out,
+so a wiped out domain also points at its real culprits. Other inference (mac) is not supported,
+neither is the propagate hook of global constraints (its prunings have no precise culprits), their checks still apply.
+'''
+from __future__ import annotations
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Callable, Iterator, Optional, TYPE_CHECKING
+from personal_time_manager.sessions.base_session import Session
+from personal_time_manager.sessions.minute_domain import same_kind
+from personal_time_manager.csp.inference import restore
+
+if TYPE_CHECKING:
+    from personal_time_manager.csp.csp import CSP
+    from personal_time_manager.csp.stats import SolverStats
+
+
+NOGOOD_LIMIT = 10_000 # nogoods kept at most, learning stops once reached
+MAX_NOGOOD_SIZE = 12 # bigger nogoods are not stored, they are too specific to match again
+
+
+class NogoodStore:
+    '''
+    learned combinations of (variable, value) no solution contains
+    each nogood is indexed under all its pairs so it's found whichever of its variables is assigned last
+    '''
+    def __init__(self, limit: int = NOGOOD_LIMIT, max_size: int = MAX_NOGOOD_SIZE):
+        self.limit = limit
+        self.max_size = max_size
+        self._index: dict[tuple[Session, datetime]: list[tuple[tuple[Session, datetime], ...]]] = {}
+        self._seen: set[frozenset] = set()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def add(self, nogood: dict[Session: datetime]) -> bool:
+        '''
+        :return boolean: True if the nogood was stored
+        '''
+        if not nogood or len(nogood) > self.max_size or len(self._seen) >= self.limit:
+            return False
+
+        pairs = tuple(nogood.items())
+        key = frozenset(pairs)
+        if key in self._seen:
+            return False
+
+        self._seen.add(key)
+        for pair in pairs:
+            self._index.setdefault(pair, []).append(pairs)
+        return True
+
+    def violated(self, variable: Session, value: datetime, assignment: dict[Session: datetime]) -> Optional[set[Session]]:
+        '''
+        :return set: the other variables of a nogood the assignment of variable to value completes, None if there is none
+        '''
+        for pairs in self._index.get((variable, value), ()):
+            if all(other is variable or (other in assignment and assignment[other] == other_value)
+                   for other, other_value in pairs):
+                return {other for other, _ in pairs if other is not variable}
+        return None
+
+
+class JumpFrame:
+    '''
+    one level of the search stack
+    '''
+    __slots__ = ("variable", "values", "removals", "conflicts", "culprits")
+
+    def __init__(self, variable: Session, values: Iterator[datetime]):
+        self.variable = variable
+        self.values = values
+        self.removals = [] # domain prunings done for the value currently assigned to variable
+        self.conflicts: set[Session] = set() # variables the failed values of variable were in conflict with
+        self.culprits: dict[Session: set[Session]] = {} # variables behind the prunings of each neighbour's domain
+
+
+def forward_check(csp: CSP, frame: JumpFrame, assignment: dict[Session: datetime],
+                  domains: dict[Session: list[datetime]]) -> Optional[Session]:
+    '''
+    forward checking of the neighbours of frame.variable, recording the culprits of every pruned value in frame.culprits
+    :return Session: the neighbour whose domain got wiped out, None if every domain still has values
+    '''
+    variable = frame.variable
+    for neighbour in csp.neighbours(variable):
+        if neighbour in assignment:
+            continue
+
+        legal_values = []
+        culprits = set()
+        for value in domains[neighbour]:
+            assignment[neighbour] = value
+            if csp.consistent(neighbour, assignment):
+                legal_values.append(value)
+            else:
+                culprits |= csp.conflict_set(neighbour, assignment)
+        if neighbour in assignment:
+            del assignment[neighbour]
+
+        if len(legal_values) < len(domains[neighbour]):
+            frame.removals.append((neighbour, domains[neighbour]))
+            domains[neighbour] = same_kind(domains[neighbour], legal_values)
+            culprits.discard(neighbour)
+            frame.culprits[neighbour] = culprits
+
+        if not legal_values:
+            return neighbour
+
+    return None
+
+
+def backjumping_search(csp: CSP, assignment: Optional[dict[Session: datetime]] = None,
+                       bound: Optional[Callable] = None, stats: Optional[SolverStats] = None,
+                       nogoods: Optional[NogoodStore] = None) -> Iterator[dict[Session: datetime]]:
+    '''
+    generator of the solutions extending the passed assignment, same interface as search.iterative_search
+    :param nogoods: store to learn in, a new one by default (only reuse one for searches of the same csp and assignment)
+    '''
+    if csp.inference not in ("none", "forward_checking"):
+        raise ValueError(f"Backjumping works with the 'none' and 'forward_checking' inference, not {csp.inference!r}")
+
+    assignment = csp.make_assignment(assignment)
+    domains = csp.initial_domains(assignment)
+    if domains is None:
+        return
+
+    nogoods = NogoodStore() if nogoods is None else nogoods
+    position = {variable: index for index, variable in enumerate(csp.variables)}
+    unassigned = [variable for variable in csp.variables if variable not in assignment]
+    depth: dict[Session: int] = {} # stack level of the variables assigned by the search (the passed ones are never undone)
+
+    if not unassigned:
+        yield dict(assignment)
+        return
+
+    def push() -> None:
+        variable = csp.select_unassigned_variable(unassigned, assignment, domains)
+        del unassigned[bisect_left(unassigned, position[variable], key=position.__getitem__)]
+        depth[variable] = len(stack)
+        stack.append(JumpFrame(variable, iter(csp.order_domain_values(variable, assignment, domains))))
+
+    def undo_prunings(frame: JumpFrame) -> None:
+        restore(domains, frame.removals)
+        frame.culprits.clear()
+
+    def undo(frame: JumpFrame) -> None:
+        if frame.variable in assignment:
+            del assignment[frame.variable]
+        undo_prunings(frame)
+
+    def pruning_culprits(variable: Session) -> set[Session]:
+        # the variables that ruled out values of variable's domain, through the frames still on the stack
+        culprits = set()
+        for frame in stack:
+            culprits |= frame.culprits.get(variable, set())
+        return culprits
+
+    def earlier_variables(frame: JumpFrame) -> set[Session]:
+        return {other.variable for other in stack[:depth[frame.variable]]}
+
+    stack: list[JumpFrame] = []
+    push()
+    while stack:
+        frame = stack[-1]
+        variable = frame.variable
+        undo(frame)
+
+        for value in frame.values:
+            assignment[variable] = value
+            nogood = nogoods.violated(variable, value, assignment)
+            if nogood is not None:
+                frame.conflicts |= nogood
+            elif not csp.consistent(variable, assignment):
+                frame.conflicts |= csp.conflict_set(variable, assignment) - {variable}
+            else:
+                if stats is not None:
+                    stats.nodes += 1
+                    stats.max_depth = max(stats.max_depth, len(stack))
+
+                wiped_out = forward_check(csp, frame, assignment, domains) if csp.inference == "forward_checking" else None
+                if wiped_out is None:
+                    if bound is None or bound(assignment, domains):
+                        break
+                    # cut by the bound, not by a conflict, nothing is known about the culprits
+                    frame.conflicts |= earlier_variables(frame)
+                else:
+                    frame.conflicts |= pruning_culprits(wiped_out) - {variable}
+                undo_prunings(frame)
+            del assignment[variable]
+        else:
+            # every value failed, jump back to the most recent variable of the conflict set
+            conflicts = (frame.conflicts | pruning_culprits(variable)) - {variable}
+            if nogoods.add({other: assignment[other] for other in conflicts}) and stats is not None:
+                stats.nogoods += 1
+
+            target = max((depth[other] for other in conflicts if other in depth), default=-1)
+            if stats is not None:
+                stats.backtracks += 1
+                stats.backjumps += len(stack) - 1 - target - 1 if target >= 0 else 0
+
+            while len(stack) - 1 > target:
+                popped = stack.pop()
+                undo(popped)
+                del depth[popped.variable]
+                insort(unassigned, popped.variable, key=position.__getitem__)
+            if stack:
+                stack[-1].conflicts |= conflicts - {stack[-1].variable}
+            continue
+
+        if unassigned:
+            push()
+        else:
+            yield dict(assignment)
+            # the next solutions are searched chronologically, a variable whose values led to a solution has no culprit
+            for frame in stack:
+                frame.conflicts |= earlier_variables(frame)
@@ -0,0 +1,154 @@
+'''
+Content addressed cache of CSP solutions
+
+The same week gets solved again and again (backend restarts, saves that change nothing the timetable depends on,
+several users looking at the same shared tuitions). The problem is fingerprinted from what defines it:
+the session descriptors, durations, allowed overlaps, domains, the constraints and their parameters and the partial assignment.
+Two CSPs with the same fingerprint have the same solutions, even if they were built from different Session objects,
+so the cached solution is stored by variable index and mapped back to the Sessions of the asking CSP.
+
+SolutionCache keeps the most recently used solutions in memory (LRU) and can sit on a persistent store,
+PostgresSolutionStore keeps them in the solution_cache table (see sql_code.sql) through DatabaseHandler.
+"No solution" is cached too.
+A problem holding something that can't be written down by value (any object but the types of _canonical)
+raises Uncacheable and is solved without the cache: its identity (id) could be reused by another object once it is
+garbage collected, or by another process sharing the store, and would answer a different problem from the cache.
+'''
+from __future__ import annotations
+import dataclasses
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, Optional, TYPE_CHECKING
+from personal_time_manager.sessions.base_session import Session
+from personal_time_manager.sessions.minute_domain import MinuteDomain
+
+if TYPE_CHECKING:
+    from personal_time_manager.csp.csp import CSP
+    from personal_time_manager.database.db_handler import DatabaseHandler
+
+
+class Uncacheable(Exception):
+    '''
+    the problem holds a value fingerprint can't canonicalise by value
+    '''
+
+
+def _canonical(value: Any, position: dict[Session: int]) -> Any:
+    '''
+    json-able form of a descriptor or a constraint parameter, Sessions are replaced by their variable index
+    '''
+    if isinstance(value, Session):
+        return ["session", position.get(value, -1)]
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, Enum):
+        return f"{type(value).__qualname__}.{value.name}"
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return [type(value).__qualname__,
+                {field.name: _canonical(getattr(value, field.name), position) for field in dataclasses.fields(value)}]
+    if isinstance(value, (list, tuple, MinuteDomain)): # the same values give the same fingerprint whatever the domain type
+        return [_canonical(item, position) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonical(item, position) for item in value), key=json.dumps)
+    if isinstance(value, dict):
+        return sorted(([_canonical(key, position), _canonical(item, position)] for key, item in value.items()), key=json.dumps)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise Uncacheable(f"{type(value).__qualname__} can't be fingerprinted by value")
+
+def fingerprint(csp: CSP, assignment: Optional[dict[Session: datetime]] = None) -> str:
+    '''
+    :return str: sha256 hex digest identifying the problem, equal for CSPs with the same solutions
+    :raises Uncacheable: when a descriptor or a constraint parameter isn't made of the types _canonical knows
+    '''
+    position = {variable: index for index, variable in enumerate(csp.variables)}
+    problem = {
+        "variables": [[_canonical(variable.session_descriptor, position),
+                       _canonical(variable.base_duration, position),
+                       _canonical(variable.allowed_to_overlap_session, position),
+                       _canonical(csp.domains[variable], position)] for variable in csp.variables],
+        # constraint parameters are their public attributes, the private ones are caches
+        "constraints": [[[type(constraint).__qualname__,
+                          {name: _canonical(parameter, position) for name, parameter in sorted(vars(constraint).items())
+                           if not name.startswith("_")}] for constraint in csp.constraints[variable]]
+                        for variable in csp.variables],
+        "assignment": sorted([position.get(variable, -1), value.isoformat()] for variable, value in (assignment or {}).items()),
+    }
+    return hashlib.sha256(json.dumps(problem, separators=(",", ":")).encode()).hexdigest()
+
+
+class PostgresSolutionStore:
+    '''
+    persistent layer of SolutionCache in the solution_cache table
+    a failing database never fails the solving, the cache is just skipped
+    '''
+    def __init__(self, db_handler: DatabaseHandler):
+        self.db_handler = db_handler
+
+    def get(self, key: str) -> Optional[dict]:
+        try:
+            return self.db_handler.get_cached_solution(key)
+        except Exception as e:
+            print(f"!!! SOLUTION CACHE READ FAILED: {e} !!!")
+            return None
+
+    def put(self, key: str, entry: dict) -> None:
+        try:
+            self.db_handler.save_cached_solution(key, entry)
+        except Exception as e:
+            print(f"!!! SOLUTION CACHE WRITE FAILED: {e} !!!")
+
+
+MISS = object() # returned by SolutionCache.get when the problem isn't cached (None means cached without solution)
+
+class SolutionCache:
+    '''
+    LRU cache {fingerprint: start of every variable by index or None if there's no solution}
+    '''
+    def __init__(self, capacity: int = 128, store: Optional[PostgresSolutionStore] = None):
+        self.capacity = capacity
+        self.store = store
+        self._entries: OrderedDict[str: Optional[tuple[datetime, ...]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remember(self, key: str, values: Optional[tuple[datetime, ...]]) -> None:
+        self._entries[key] = values
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def get(self, csp: CSP, key: str) -> Any:
+        '''
+        :return: the cached solution mapped to the variables of the csp, None if cached without solution, MISS if not cached
+        '''
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            values = self._entries[key]
+        else:
+            stored = self.store.get(key) if self.store is not None else None
+            if stored is None:
+                self.misses += 1
+                return MISS
+            values = None if stored.get("values") is None else tuple(datetime.fromisoformat(value) for value in stored["values"])
+            self._remember(key, values)
+
+        self.hits += 1
+        return None if values is None else dict(zip(csp.variables, values))
+
+    def put(self, csp: CSP, key: str, solution: Optional[dict[Session: datetime]]) -> None:
+        values = None if solution is None else tuple(solution[variable] for variable in csp.variables)
+        self._remember(key, values)
+        if self.store is not None:
+            self.store.put(key, {"values": None if values is None else [value.isoformat() for value in values]})
+
+    def clear(self) -> None:
+        self._entries.clear()
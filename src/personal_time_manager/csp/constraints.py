@@ -1,11 +1,12 @@
 '''
 
 '''
-from datetime import datetime, timedelta
-from csp import Constraint, CSP
-from prayers import Prayers
-from sessions import Session
+from datetime import date, datetime, time, timedelta
 from typing import Optional
+from personal_time_manager.csp.csp import Constraint, SoftConstraint
+from personal_time_manager.csp.interval_index import IndexedAssignment
+from personal_time_manager.sessions.base_session import Session
+from personal_time_manager.sessions.minute_domain import MinuteDomain
 
 class NoTimeOverlapConstraint(Constraint):
     '''
@@ -26,53 +27,468 @@ class NoTimeOverlapConstraint(Constraint):
         self.session = variable
         self.tolerance = tolerance
 
+    def scope(self, domains: dict[Session: list[datetime]]) -> list[Session]:
+        '''
+        every session that can possibly start within the time window self.session can occupy
+        the window spans from the earliest start in its domain to the latest start plus its maximum duration
+        '''
+        own_domain = domains[self.session]
+        if not own_domain:
+            return [self.session]
+
+        window_start, latest = domain_bounds(own_domain)
+        window_end = latest + self.session.max_duration
+
+        scope = []
+        for other_session, other_domain in domains.items():
+            if other_session is self.session:
+                scope.append(other_session)
+            elif isinstance(other_domain, MinuteDomain):
+                if other_domain.starts_within(window_start, window_end): # compared as minute offsets
+                    scope.append(other_session)
+            elif any(window_start <= value < window_end for value in other_domain):
+                scope.append(other_session)
+
+        return scope
+
     def satisfied(self, assignment: dict[Session: datetime]) -> bool:
         '''
-        actual testing for overlap of specific self.session with the other assignment dictionary
-        1- update overlapped_sessions every run, to account for possible change in previous trial
-        2- test 
-            1- any of the others start after self.session starts
-            AND
-            2- any of the others starts before self.session ends
-            AND
-            3- not in the allowed_to_overlap_session
-            AND
-            4- not within tolerance of next session starting time
+        actual testing for overlap of specific self.session with the other assignment dictionary (see overlap_walk)
+        nothing is written on the sessions, with an IndexedAssignment the walk is cached in assignment.overlaps
+        and only walked again after a change of the assignment inside the window of self.session
         '''
         if self.session not in assignment.keys():
             # Skip entirely if this session is not yet assigned
             return True
 
+        _, overlapped = self.walk(assignment)
+        return overlapped is not None
+
+    def walk(self, assignment: dict[Session: datetime]) -> tuple[datetime, Optional[tuple[Session, ...]]]:
+        '''
+        overlap_walk of self.session, from assignment.overlaps when the assignment is an IndexedAssignment
+        '''
+        return cached_overlap_walk(self.session, assignment, self.tolerance)
+
+    def conflict_set(self, assignment: dict[Session: datetime], domains: dict[Session: list[datetime]],
+                     variable: Optional[Session] = None) -> set[Session]:
+        '''
+        self.session and the sessions starting inside the part of its window walked before the overlap was found
+        (the overlapping session and the allowed ones that pushed the end of self.session over it)
+        '''
+        return walk_conflicts(self.session, assignment, self.tolerance)
+
+    def overlapped_sessions(self, assignment: dict[Session: datetime]) -> list[Session]:
+        '''
+        the allowed sessions happening inside self.session in the assignment (empty if unassigned or overlapping)
+        '''
+        if self.session not in assignment:
+            return []
+        _, overlapped = self.walk(assignment)
+        return list(overlapped or [])
+
+    def duration(self, assignment: dict[Session: datetime]) -> timedelta:
+        '''
+        the duration of self.session in the assignment, its base duration extended by the sessions overlapping it
+        '''
+        if self.session not in assignment:
+            return self.session.base_duration
+        end, _ = self.walk(assignment)
+        return end - assignment[self.session]
+
+    def prune_domain(self, variable: Session, values: list[datetime], assignment: dict[Session: datetime]) -> list[datetime]:
+        '''
+        with an occupancy grid in the assignment the whole domain is filtered in one vectorized operation
+        '''
+        grid = getattr(assignment, "grid", None)
+        if grid is None or variable is not self.session:
+            return values
+
+        return grid.free_starts(self.session, values)
+
+
+def overlap_walk(session: Session, assignment: dict[Session: datetime], tolerance: timedelta,
+                 visited: Optional[set[Session]] = None) -> tuple[datetime, Optional[tuple[Session, ...]]]:
+    '''
+    pure evaluation of the overlap of an assigned session, the sessions themselves are never modified
+    the others starting at or after session's start are walked in start time order until one starts after session ends
+        - one in the allowed_to_overlap_session AND not within tolerance of session starting time
+          is overlapped and extends the end of session by its own (extended) duration
+        - any other one is an overlap
+    With an IndexedAssignment only the sessions inside the window are visited, O(log n + k)
+
+    :return tuple: (end of the session, allowed sessions overlapping it) or (end reached, None) if there is an overlap
+    '''
+    visited = (visited or set()) | {session}
+    start = assignment[session]
+    if isinstance(assignment, IndexedAssignment):
+        later_sessions = assignment.intervals.starting_from(start)
+    else:
+        later_sessions = sorted(((other_session, other_session_start_time)
+                                 for other_session, other_session_start_time in assignment.items()
+                                 if other_session_start_time >= start), key=lambda item: item[1])
+
+    overlapped = []
+    end = start + session.base_duration
+    for other_session, other_session_start_time in later_sessions:
+        if other_session is session:
+            continue
+        if other_session_start_time >= end:
+            break
 
-        ### Step 1:
-        # Update overlapped_sessions list and duration if an allowed_to_overlap_session is present
-        self.session.reset_overlap()
-        for other_session, other_session_start_time in assignment.items():
-            # skip test if it's the session to be tested
-            if other_session == self.session:
+        # test if allowed overlap session and tolerance
+        if (other_session in session.allowed_to_overlap_session) and \
+           ((other_session_start_time - start) > tolerance):
+            overlapped.append(other_session)
+            if other_session.allowed_to_overlap_session and other_session not in visited:
+                other_end, _ = overlap_walk(other_session, assignment, tolerance, visited)
+                end += other_end - other_session_start_time
+            else:
+                end += other_session.base_duration
+        else:
+            return end, None
+
+    return end, tuple(overlapped)
+
+
+def cached_overlap_walk(session: Session, assignment: dict[Session: datetime],
+                        tolerance: timedelta) -> tuple[datetime, Optional[tuple[Session, ...]]]:
+    '''
+    overlap_walk of an assigned session, from assignment.overlaps when the assignment is an IndexedAssignment
+    '''
+    cache = getattr(assignment, "overlaps", None)
+    if cache is None:
+        return overlap_walk(session, assignment, tolerance)
+
+    cached = cache.get(session, tolerance)
+    if cached is None:
+        end, overlapped = overlap_walk(session, assignment, tolerance)
+        cached = cache.put(session, tolerance, assignment[session], end, overlapped)
+    return cached
+
+def walk_conflicts(session: Session, assignment: dict[Session: datetime], tolerance: timedelta) -> set[Session]:
+    '''
+    the session and the sessions starting inside the part of its window walked before its overlap was found
+    '''
+    start = assignment[session]
+    end, _ = cached_overlap_walk(session, assignment, tolerance)
+    if isinstance(assignment, IndexedAssignment):
+        conflicts = {session}
+        for other_session, other_session_start_time in assignment.intervals.starting_from(start):
+            if other_session_start_time >= end:
+                break
+            conflicts.add(other_session)
+        return conflicts
+
+    return {session} | {other_session for other_session, other_session_start_time in assignment.items()
+                        if start <= other_session_start_time < end}
+
+
+class DisjunctiveConstraint(Constraint):
+    '''
+    Global no-overlap constraint over all the sessions of one person's week, one object instead of a NoTimeOverlapConstraint per session
+
+    It is satisfied exactly when the NoTimeOverlapConstraints of all its sessions would be (same overlap walk, same tolerances,
+    allowed_to_overlap_session respected), but it also reasons on all the sessions at once (self.propagate):
+    a session nested in another (a prayer inside a lesson) pauses it, so the sessions never share time
+    and each one needs its base duration of the person's time inside its window [earliest start, latest end).
+        - overload checking: the sessions whose windows all fall inside [a, b) need more than b - a in total -> no solution
+          ("these five sessions can't all fit between 16:00 and 20:00")
+        - edge finding: if a session can't fit in [a, b) together with the ones that must, it has to come after all of them
+          (its earliest start moves to a + their durations) or symmetrically before all of them
+    Sessions allowed to overlap each other can nest so they are never used to push one another.
+    The reasoning is only done around the just assigned session, where the windows changed.
+    '''
+    def __init__(self, sessions: list[Session], tolerance: timedelta, tolerances: Optional[dict[Session: timedelta]] = None):
+        '''
+        param tolerance: like NoTimeOverlapConstraint, minutes after the start of a session during which even an allowed session can't start
+        param tolerances: tolerance of specific sessions (for example lessons) if different from the default one
+        '''
+        super().__init__(list(sessions))
+        self.tolerance = tolerance
+        self.tolerances = tolerances or {}
+        self._members = set(self.variables)
+        self._span = max((session.max_duration for session in self.variables), default=timedelta(0))
+        # sessions that may nest in each other, in either direction
+        self._related = {session: set(session.allowed_to_overlap_session) for session in self.variables}
+        for session in self.variables:
+            for other_session in session.allowed_to_overlap_session:
+                if other_session in self._related:
+                    self._related[other_session].add(session)
+
+    def tolerance_of(self, session: Session) -> timedelta:
+        return self.tolerances.get(session, self.tolerance)
+
+    def scope(self, domains: dict[Session: list[datetime]]) -> list[Session]:
+        return self.variables
+
+    def scope_of(self, variable: Session, domains: dict[Session: list[datetime]]) -> list[Session]:
+        '''
+        the sessions the NoTimeOverlapConstraints would link to variable:
+        the ones that can start inside its window and the ones it can start inside of
+        '''
+        window = self._window(variable, domains)
+        if window is None:
+            return [variable]
+
+        scope = []
+        for other_session in self.variables:
+            if other_session is variable:
+                scope.append(other_session)
                 continue
+            other_window = self._window(other_session, domains)
+            if other_window is not None and \
+               (any(window[0] <= value < window[1] for value in domains[other_session]) or
+                any(other_window[0] <= value < other_window[1] for value in domains[variable])):
+                scope.append(other_session)
+        return scope
+
+    def _window(self, session: Session, domains: dict[Session: list[datetime]]) -> Optional[tuple[datetime, datetime]]:
+        values = domains.get(session)
+        if not values:
+            return None
+        earliest, latest = domain_bounds(values)
+        return earliest, latest + session.max_duration
+
+    def _walked_with(self, variable: Session, assignment: dict[Session: datetime]) -> list[Session]:
+        '''
+        the assigned sessions whose overlap walk can see the value of variable: itself and the ones starting at most
+        the longest session duration before it
+        '''
+        start = assignment[variable]
+        if isinstance(assignment, IndexedAssignment):
+            sessions = [variable]
+            for other_session, other_session_start_time in assignment.intervals.starting_from(start - self._span):
+                if other_session_start_time > start:
+                    break
+                if other_session is not variable and other_session in self._members:
+                    sessions.append(other_session)
+            return sessions
 
-            # test time overlap and if allowed overlap session and tolerance
-            if ((other_session_start_time > assignment[self.session] and \
-                other_session_start_time < (assignment[self.session] + self.session.duration)) and \
-                (other_session in self.session.allowed_to_overlap_session) and \
-                ((other_session_start_time - assignment[self.session]) > self.tolerance)):
-                    self.session.add_overlap(other_session)
-
-        ### Step 2:
-        # Actual test
-        for other_session, other_session_start_time in assignment.items():
-            # skip test if it's the session to be tested
-            if other_session == self.session:
+        return [variable] + [other_session for other_session, other_session_start_time in assignment.items()
+                             if other_session is not variable and other_session in self._members
+                             and start - self._span <= other_session_start_time <= start]
+
+    def satisfied(self, assignment: dict[Session: datetime]) -> bool:
+        return all(cached_overlap_walk(session, assignment, self.tolerance_of(session))[1] is not None
+                   for session in self.variables if session in assignment)
+
+    def satisfied_by(self, variable: Session, assignment: dict[Session: datetime]) -> bool:
+        if variable not in assignment or variable not in self._members:
+            return True
+
+        return all(cached_overlap_walk(session, assignment, self.tolerance_of(session))[1] is not None
+                   for session in self._walked_with(variable, assignment))
+
+    def conflict_set(self, assignment: dict[Session: datetime], domains: dict[Session: list[datetime]],
+                     variable: Optional[Session] = None) -> set[Session]:
+        '''
+        the culprits of the first overlapping walk, among the walks that can see variable if it's given
+        '''
+        if variable is not None and variable in assignment and variable in self._members:
+            sessions = self._walked_with(variable, assignment)
+        else:
+            sessions = [session for session in self.variables if session in assignment]
+
+        for session in sessions:
+            if cached_overlap_walk(session, assignment, self.tolerance_of(session))[1] is None:
+                return walk_conflicts(session, assignment, self.tolerance_of(session))
+        return super().conflict_set(assignment, domains, variable)
+
+    def prune_domain(self, variable: Session, values: list[datetime], assignment: dict[Session: datetime]) -> list[datetime]:
+        grid = getattr(assignment, "grid", None)
+        if grid is None or variable not in self._members:
+            return values
+
+        return grid.free_starts(variable, values)
+
+    def _task(self, session: Session, assignment: dict[Session: datetime],
+              domains: dict[Session: list[datetime]]) -> Optional[tuple[Session, datetime, datetime, timedelta]]:
+        '''
+        (session, earliest start, latest start, duration) of a session or None if it has no values left
+        '''
+        if session in assignment:
+            return session, assignment[session], assignment[session], session.base_duration
+        values = domains.get(session)
+        if not values:
+            return None
+        earliest, latest = domain_bounds(values)
+        return session, earliest, latest, session.base_duration
+
+    def _latest_end(self, task: tuple, tasks: dict[Session: tuple]) -> datetime:
+        '''
+        the latest the session of the task can end: its latest start plus its duration extended by every allowed session
+        that can start inside it
+        '''
+        session, earliest, latest, duration = task
+        window_end = latest + session.max_duration
+        end = latest + duration
+        for other_session in session.allowed_to_overlap_session:
+            other_task = tasks.get(other_session)
+            if other_task is None or (other_task[2] >= earliest and other_task[1] < window_end):
+                end += other_session.max_duration
+        return end
+
+    def propagate(self, variable: Session, assignment: dict[Session: datetime],
+                  domains: dict[Session: list[datetime]]) -> Optional[dict[Session: list[datetime]]]:
+        if variable not in self._members or variable not in assignment:
+            return {}
+
+        tasks = {}
+        for session in self.variables:
+            task = self._task(session, assignment, domains)
+            if task is not None:
+                tasks[session] = task
+
+        # only the windows around the assigned session changed, the reasoning is limited to the sessions near it
+        zone_start = assignment[variable] - self._span
+        zone_end = assignment[variable] + 2 * self._span
+        near = [(session, earliest, latest, duration, self._latest_end((session, earliest, latest, duration), tasks))
+                for session, earliest, latest, duration in tasks.values() if earliest < zone_end and latest >= zone_start]
+
+        if overloaded(near):
+            return None
+
+        pruned = {}
+        for session, earliest, latest, duration, end in near:
+            if session in assignment:
                 continue
 
-            if other_session in self.session.overlapped_sessions:
-                # skip if this is allowed overlapping
+            others = [task for task in near if task[0] is not session and task[0] not in self._related[session]]
+            new_earliest, new_latest = edge_finding((session, earliest, latest, duration, end), others)
+            if new_earliest > earliest or new_latest < latest:
+                values = domains[session]
+                pruned[session] = values.between(new_earliest, new_latest) if isinstance(values, MinuteDomain) else \
+                    [value for value in values if new_earliest <= value <= new_latest]
+
+        return pruned
+
+
+def domain_bounds(values: list[datetime]) -> tuple[datetime, datetime]:
+    '''
+    (earliest, latest) value of a non empty domain
+    '''
+    if isinstance(values, MinuteDomain):
+        return values.bounds()
+    return min(values), max(values)
+
+def overloaded(tasks: list[tuple]) -> bool:
+    '''
+    :param tasks: (session, earliest start, latest start, duration, latest end)
+    :return boolean: True if some window [a, b) is too short for the durations of the tasks that have to fit in it
+    '''
+    by_end = sorted(tasks, key=lambda task: task[4])
+    for index, (_, _, _, _, window_end) in enumerate(by_end):
+        total = timedelta(0)
+        for _, earliest, _, duration, _ in sorted(by_end[:index + 1], key=lambda task: task[1], reverse=True):
+            total += duration
+            if earliest + total > window_end:
+                return True
+    return False
+
+def edge_finding(task: tuple, others: list[tuple]) -> tuple[datetime, datetime]:
+    '''
+    :param task: (session, earliest start, latest start, duration, latest end) of an unassigned session
+    :param others: the tasks that can't nest with it
+    :return tuple: the (earliest, latest) start of the session once the sets of others it must follow or precede are known
+        - the others fitting in [a, b) (b before the task's latest end) leave no room for it inside -> it comes after all of them
+        - the others fitting in [a, b) (a after the task's earliest start) leave no room for it inside -> it comes before all of them
+    '''
+    _, earliest, latest, duration, end = task
+    new_earliest, new_latest = earliest, latest
+
+    by_end = sorted(others, key=lambda other: other[4])
+    for index, (_, _, _, _, window_end) in enumerate(by_end):
+        if not earliest < window_end < end:
+            continue
+        total = timedelta(0)
+        for _, window_start, _, other_duration, _ in sorted(by_end[:index + 1], key=lambda other: other[1], reverse=True):
+            total += other_duration
+            if min(window_start, earliest) + total + duration > window_end:
+                new_earliest = max(new_earliest, window_start + total)
+
+    by_start = sorted(others, key=lambda other: other[1])
+    for index, (_, window_start, _, _, _) in enumerate(by_start):
+        if not earliest < window_start < end:
+            continue
+        total = timedelta(0)
+        for _, _, _, other_duration, window_end in sorted(by_start[index:], key=lambda other: other[4]):
+            total += other_duration
+            if window_start + total + duration > max(window_end, end):
+                new_latest = min(new_latest, window_end - total - duration)
+
+    return new_earliest, new_latest
+
+
+class PreferredHoursPenalty(SoftConstraint):
+    '''
+    Soft constraint preferring sessions to happen within a daily time window (for example no lessons late at night)
+    the penalty is the number of minutes of the sessions falling outside the window
+    '''
+    def __init__(self, variables: list[Session], earliest: time, latest: time, weight: float = 1.0):
+        '''
+        param earliest: the time of the day sessions should not start before
+        param latest: the time of the day sessions should be finished by
+        '''
+        super().__init__(variables, weight)
+        self.earliest = earliest
+        self.latest = latest
+
+    def minutes_outside(self, session: Session, start: datetime) -> float:
+        end = start + session.base_duration
+        window_start = datetime.combine(start.date(), self.earliest)
+        window_end = datetime.combine(start.date(), self.latest)
+
+        before = max(timedelta(0), min(end, window_start) - start)
+        after = max(timedelta(0), end - max(start, window_end))
+        return (before + after) / timedelta(minutes=1)
+
+    def penalty(self, assignment: dict[Session: datetime]) -> float:
+        return sum(self.minutes_outside(session, assignment[session]) for session in self.variables if session in assignment)
+
+    def lower_bound(self, assignment: dict[Session: datetime], domains: dict[Session: list[datetime]]) -> float:
+        '''
+        the penalty of the assigned sessions plus the smallest penalty each unassigned session can still get
+        '''
+        bound = 0.0
+        for session in self.variables:
+            if session in assignment:
+                bound += self.minutes_outside(session, assignment[session])
+            elif domains[session]:
+                bound += min(self.minutes_outside(session, value) for value in domains[session])
+        return bound
+
+
+class GapPenalty(SoftConstraint):
+    '''
+    Soft constraint preferring compact days
+    the penalty is the number of idle minutes between the first and the last of the sessions of each day
+    '''
+    def day_gaps(self, assignment: dict[Session: datetime]) -> dict[date: float]:
+        '''
+        idle minutes between the assigned sessions of each day (overlapping sessions, like a prayer inside a lesson, merge)
+        '''
+        intervals = sorted((assignment[session], assignment[session] + session.base_duration)
+                           for session in self.variables if session in assignment)
+        gaps = {}
+        current_day = None
+        for start, end in intervals:
+            if start.date() != current_day:
+                current_day, busy_until = start.date(), end
+                gaps[current_day] = 0.0
                 continue
 
-            if (other_session_start_time > assignment[self.session] and \
-                other_session_start_time < (assignment[self.session] + self.session.duration)):
-                return False
+            if start > busy_until:
+                gaps[current_day] += (start - busy_until) / timedelta(minutes=1)
+            busy_until = max(busy_until, end)
+        return gaps
 
-        return True
+    def penalty(self, assignment: dict[Session: datetime]) -> float:
+        return sum(self.day_gaps(assignment).values())
 
+    def lower_bound(self, assignment: dict[Session: datetime], domains: dict[Session: list[datetime]]) -> float:
+        '''
+        the gaps of the days no unassigned session can land on anymore (a session placed in a gap would shrink it)
+        '''
+        open_days = {value.date() for session in self.variables if session not in assignment for value in domains[session]}
+        return sum(gap for day, gap in self.day_gaps(assignment).items() if day not in open_days)
@@ -1,9 +1,25 @@
 '''
 
 '''
+import random
+import time
 from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
+from itertools import islice
+from typing import Callable, Iterator, Optional
 from personal_time_manager.sessions.base_session import Session
+from personal_time_manager.sessions.minute_domain import MinuteDomain, take
+from personal_time_manager.csp.heuristics import VARIABLE_ORDERINGS, VALUE_ORDERINGS, resolve
+from personal_time_manager.csp.inference import INFERENCES, ac3, restore
+from personal_time_manager.csp.search import interruptible, iterative_search
+from personal_time_manager.csp.repair import min_conflicts
+from personal_time_manager.csp.optimize import branch_and_bound, k_best
+from personal_time_manager.csp.portfolio import solve_portfolio
+from personal_time_manager.csp.decompose import solve_decomposed
+from personal_time_manager.csp.cache import MISS, SolutionCache, Uncacheable, fingerprint
+from personal_time_manager.csp.stats import SolverStats, instrument
+from personal_time_manager.csp.interval_index import IndexedAssignment
+from personal_time_manager.csp.occupancy_grid import OccupancyGrid
 
 # Abstract base class
 # This is a parent class meant a blue print to be inherited by other classes
@@ -27,14 +43,124 @@ class Constraint(ABC):
         """
         pass
 
+    def scope(self, domains: dict[Session: list[datetime]]) -> list[Session]:
+        """
+        :param domains: the domains dict of the csp this constraint is added to
+        :return list: every variable whose assigned value can change the result of self.satisfied
+                      by default only the variables the constraint is imposed on,
+                      constraints that read other entries of the assignment must override it
+        """
+        return self.variables
+
+    def scope_of(self, variable: Session, domains: dict[Session: list[datetime]]) -> list[Session]:
+        """
+        :param variable: one of self.variables
+        :return list: the variables of the scope whose values can interact with the value of the passed variable
+                      by default the whole scope, global constraints over many variables override it
+                      so the constraint graph only links the variables that can actually conflict
+        """
+        return self.scope(domains)
+
+    def satisfied_by(self, variable: Session, assignment: dict[Session: datetime]) -> bool:
+        """
+        :return boolean: False if the value of the variable violates the constraint (what CSP.consistent checks)
+                         by default the whole constraint is checked with self.satisfied,
+                         global constraints override it to only check the part the variable can break
+        """
+        return self.satisfied(assignment)
+
+    def conflict_set(self, assignment: dict[Session: datetime], domains: dict[Session: list[datetime]],
+                     variable: Optional[Session] = None) -> set[Session]:
+        """
+        called when self.satisfied(assignment) is False
+        :param variable: the variable whose value was found inconsistent, if known
+        :return set: the assigned variables whose values together violate the constraint (used by the backjumping search)
+                     by default every assigned variable of the scope, constraints knowing the culprits precisely should override it
+        """
+        return {variable for variable in self.scope(domains) if variable in assignment}
+
+    def propagate(self, variable: Session, assignment: dict[Session: datetime],
+                  domains: dict[Session: list[datetime]]) -> Optional[dict[Session: list[datetime]]]:
+        """
+        pruning reasoning over the whole constraint at once, run by the inference after variable got assigned (see inference.propagate)
+        :return dict: the new domains of the unassigned variables it pruned (a value is only removed if no solution can hold it),
+                      None if no solution extends the assignment
+                      by default nothing is pruned, global constraints override it
+        """
+        return {}
+
+    def prune_domain(self, variable: Session, values: list[datetime], assignment: dict[Session: datetime]) -> list[datetime]:
+        """
+        :return list: the values of the variable that may still satisfy this constraint with the rest of the assignment
+                      it's a pre-filter, it may keep values that fail self.satisfied but must never drop one that passes
+                      by default nothing is dropped, constraints able to rule out many values at once override it
+        """
+        return values
+
+
+class SoftConstraint(ABC):
+    """
+    Preference on the timetable, the solver minimizes the weighted sum of the penalties of all soft constraints
+    (see CSP.optimize) while the hard Constraints still have to be satisfied
+    """
+
+    def __init__(self, variables: list[Session], weight: float = 1.0):
+        self.variables = variables
+        self.weight = weight
+
+    @abstractmethod
+    def penalty(self, assignment: dict[Session: datetime]) -> float:
+        """
+        :param assignment: dict of variables keys and possible value from the domains dict for the dict value
+        :return float: the (unweighted) penalty of the assignment, 0 when the preference is fully met
+        """
+        pass
+
+    def lower_bound(self, assignment: dict[Session: datetime], domains: dict[Session: list[datetime]]) -> float:
+        """
+        :param domains: the current domains of the unassigned variables
+        :return float: a value the penalty of any complete assignment extending this one can't go below
+                       used by branch and bound to cut branches, the default is 0 which never cuts anything
+                       override it with something tighter whenever possible
+        """
+        return 0.0
+
 
 class CSP:
 
-    def __init__(self, variables: list[Session], domains: dict[Session: list[datetime]]):
+    def __init__(self, variables: list[Session], domains: dict[Session: list[datetime]],
+                 variable_ordering: str = "static", value_ordering: str = "static",
+                 inference: str = "none", ac3_preprocessing: bool = False, occupancy_grid: bool = False,
+                 backjumping: bool = False, seed: Optional[int] = None, solution_cache: Optional[SolutionCache] = None):
+        """
+        :param variable_ordering: name of the heuristic choosing the next variable to assign ("static", "mrv", "mrv_degree", "mrv_random")
+                                  or a function with the same signature as the ones in heuristics.py
+        :param value_ordering: name of the heuristic ordering the values of the chosen variable ("static", "lcv", "random")
+                               or a function with the same signature as the ones in heuristics.py
+        :param inference: domain pruning done after each assignment ("none", "forward_checking", "mac")
+        :param ac3_preprocessing: run ac3 on the domains once before the search starts
+        :param occupancy_grid: keep a numpy minute grid of the assigned starts to filter whole domains at once
+                               (see occupancy_grid.py, slower than without it on the benchmark weeks)
+        :param backjumping: iterative search with conflict-directed backjumping and nogood learning (see backjumping.py)
+                            works with the "none" and "forward_checking" inference
+        :param seed: seed of self.random used by the randomized orderings
+        :param solution_cache: SolutionCache looked up by self.solve before searching (see cache.py), can be shared by many CSPs
+        """
 
         self.variables = variables # varaibles that need to be assignment with all constraint satisfied domain value
         self.domains = domains # possible values for each variable
         self.constraints = {} # list of constraints imposed on each variable
+        self.soft_constraints = [] # preferences to optimize, see self.optimize
+        self.variable_ordering = variable_ordering
+        self.value_ordering = value_ordering
+        self.inference = inference
+        self.ac3_preprocessing = ac3_preprocessing
+        self.occupancy_grid = occupancy_grid
+        self.backjumping = backjumping
+        self.random = random.Random(seed)
+        self.solution_cache = solution_cache
+        self._neighbours = None # constraint graph, built lazily as it depends on all the constraints added
+        self._watchers = None # constraints whose scope holds each variable, built with the constraint graph
 
         # creating the constraints Dict
         for variable in self.variables:
@@ -59,20 +185,334 @@ class CSP:
             else:
                 self.constraints[variable].append(constraint) # adding the constraint
 
+        self._neighbours = None # the constraint graph needs to be rebuilt
+        self._watchers = None
+
+    def add_soft_constraint(self, soft_constraint: SoftConstraint):
+        """
+        :param soft_constraint: object of a SoftConstraint subclass, taken into account by self.cost and self.optimize
+        """
+        for variable in soft_constraint.variables:
+            if variable not in self.constraints:
+                raise LookupError("soft constraint affect a variable that is not found in the csp.variables list")
+
+        self.soft_constraints.append(soft_constraint)
+
+    def cost(self, assignment: dict[Session: datetime]) -> float:
+        """
+        :return float: weighted sum of the penalties of all the soft constraints
+        """
+        return sum(soft_constraint.weight * soft_constraint.penalty(assignment) for soft_constraint in self.soft_constraints)
+
+    def cost_lower_bound(self, assignment: dict[Session: datetime], domains: dict[Session: list[datetime]]) -> float:
+        """
+        :return float: weighted sum of the lower bounds of all the soft constraints
+        """
+        return sum(soft_constraint.weight * soft_constraint.lower_bound(assignment, domains)
+                   for soft_constraint in self.soft_constraints)
+
+    def neighbours(self, variable: Session) -> set[Session]:
+        """
+        :return set: all the variables sharing a constraint with the passed variable
+                     i.e. the variables whose values can make a value of this variable (in)consistent
+        """
+        if self._neighbours is None:
+            self._build_constraint_graph()
+
+        return self._neighbours[variable]
+
+    def watching(self, variable: Session) -> list:
+        """
+        :return list: the constraints the value of the variable can violate, its own constraints first
+                      then the constraints of the other variables having it in their scope
+                      (a NoTimeOverlapConstraint only looks at the sessions starting during its own session)
+        """
+        if self._watchers is None:
+            self._build_constraint_graph()
+
+        return self._watchers[variable]
+
+    def _build_constraint_graph(self) -> None:
+        neighbours = {variable: set() for variable in self.variables}
+        watchers = {variable: dict.fromkeys(self.constraints[variable]) for variable in self.variables} # ordered set
+        for variable, constraints in self.constraints.items():
+            for constraint in constraints:
+                for other in constraint.scope_of(variable, self.domains):
+                    if other is not variable and other in neighbours:
+                        neighbours[variable].add(other)
+                        neighbours[other].add(variable)
+                        watchers[other][constraint] = None
+
+        self._neighbours = neighbours
+        self._watchers = {variable: list(constraints) for variable, constraints in watchers.items()}
+
     def consistent(self, variable: Session, assignment: dict[Session: datetime]):
         """
         :param assignment: dict of variables keys and possible value from the domains dict for the dict value
-        :return boolean: checks that ALL constraints in a variable's constraint list(in constraints dict) is satisfied
+        :return boolean: checks that ALL constraints the variable takes part in (see self.watching) are satisfied
                         according to the value assigned to the variable in the passed assignment dict argument in this function
         """
-        for constraint in self.constraints[variable]: # looping each constraint object
-            if not constraint.satisfied(assignment):
+        for constraint in self.watching(variable): # looping each constraint the variable takes part in
+            if not constraint.satisfied_by(variable, assignment):
                 return False
 
         return True # after looping all constraints in the variable and making sure it is all saitisfied according to the value in the assingment dict
 
+    def conflict_set(self, variable: Session, assignment: dict[Session: datetime]) -> set[Session]:
+        """
+        :return set: the assigned variables responsible for the first violated constraint the variable takes part in
+                     empty if the variable is consistent
+        """
+        for constraint in self.watching(variable):
+            if not constraint.satisfied_by(variable, assignment):
+                return constraint.conflict_set(assignment, self.domains, variable)
+
+        return set()
+
+    def legal_values(self, variable: Session, assignment: dict[Session: datetime],
+                     domains: dict[Session: list[datetime]]) -> list[datetime]:
+        """
+        :return list: the values in the variable's domain that are consistent with the passed assignment
+                      (a MinuteDomain taken from the offsets of a MinuteDomain domain)
+        """
+        candidates = domains[variable]
+        for constraint in self.constraints[variable]:
+            candidates = constraint.prune_domain(variable, candidates, assignment)
+
+        # the values are tried in the assignment itself (no copy), the variable's entry is put back as it was after
+        was_assigned = variable in assignment
+        previous_value = assignment.get(variable)
+        kept = []
+        for position, value in enumerate(candidates):
+            assignment[variable] = value
+            if self.consistent(variable, assignment):
+                kept.append(position)
+        values = take(candidates, kept)
+
+        if was_assigned:
+            assignment[variable] = previous_value
+        elif variable in assignment:
+            del assignment[variable]
+
+        return values
+
+    def count_legal_values(self, variable: Session, assignment: dict[Session: datetime],
+                           domains: dict[Session: list[datetime]]) -> int:
+        """
+        :return int: number of values in the variable's domain that are consistent with the passed assignment
+        """
+        return len(self.legal_values(variable, assignment, domains))
+
+    def select_unassigned_variable(self, unassigned: list[Session], assignment: dict[Session: datetime],
+                                   domains: dict[Session: list[datetime]] = None) -> Session:
+        """
+        :param unassigned: the variables not yet in the assignment, in the order of self.variables
+        :param domains: the current (possibly pruned) domains, self.domains by default
+        :return Session: the next variable to assign according to self.variable_ordering
+        """
+        select = resolve(VARIABLE_ORDERINGS, self.variable_ordering)
+        return select(self, unassigned, assignment, self.domains if domains is None else domains)
+
+    def order_domain_values(self, variable: Session, assignment: dict[Session: datetime],
+                            domains: dict[Session: list[datetime]] = None) -> list[datetime]:
+        """
+        :param domains: the current (possibly pruned) domains, self.domains by default
+        :return list: the domain values of the variable in the order they should be tried according to self.value_ordering
+        """
+        order = resolve(VALUE_ORDERINGS, self.value_ordering)
+        return order(self, variable, assignment, self.domains if domains is None else domains)
+
+    def infer(self, variable: Session, assignment: dict[Session: datetime],
+              domains: dict[Session: list[datetime]], removals: list) -> bool:
+        """
+        prunes the domains of the unassigned variables after variable got assigned according to self.inference
+        every pruning is recorded in removals to be undone with inference.restore when backtracking
+        :return boolean: False if some domain got wiped out
+        """
+        if self.inference not in INFERENCES:
+            raise ValueError(f"Unknown inference {self.inference!r}, choose one of {list(INFERENCES)}")
+
+        return INFERENCES[self.inference](self, variable, assignment, domains, removals)
+
+    def make_assignment(self, assignment: Optional[dict[Session: datetime]] = None) -> IndexedAssignment:
+        """
+        :return IndexedAssignment: the mutable assignment the search engines work on, filled with the passed one
+        """
+        grid = OccupancyGrid.for_domains(self.domains, assignment) if self.occupancy_grid else None
+        return IndexedAssignment(assignment, grid)
+
+    def initial_domains(self, assignment: dict[Session: datetime]) -> Optional[dict[Session: list[datetime]]]:
+        """
+        :return dict: a copy of the domains the search can prune, with the inference already applied to the pre-assigned variables
+                      None if the assignment can't be extended to a solution
+        """
+        # MinuteDomains are immutable, pruning replaces them so they don't need a copy
+        domains = {variable: self.domains[variable] if isinstance(self.domains[variable], MinuteDomain)
+                   else list(self.domains[variable]) for variable in self.variables}
+        removals = []
+
+        if self.ac3_preprocessing and not ac3(self, assignment, domains, removals):
+            return None
+
+        for variable in assignment:
+            if not self.infer(variable, assignment, domains, removals):
+                return None
+
+        return domains
+
+    def solve(self, assignment: Optional[dict[Session: datetime]] = None, engine: str = "iterative",
+              return_stats: bool = False, on_progress: Optional[Callable] = None, progress_interval: int = 1000,
+              check: Optional[Callable] = None, stats: Optional[SolverStats] = None):
+        """
+        :param assignment: partial assignment the solution has to extend, empty by default
+        :param engine: "iterative" (explicit stack, one mutable assignment) or "recursive" (self.backtracking_search)
+                       both give the same solution
+        :param return_stats: also return the SolverStats of the search (see stats.py)
+        :param on_progress: called with the SolverStats so far every progress_interval nodes
+        :param check: called before every consistency check (every value tried, by the search and the inference),
+                      an exception raised from it stops the search and is passed on (deadlines, cancellation, see search.interruptible)
+        :param stats: SolverStats filled while searching, still readable when a check stopped the search
+        :return dict: the first solution found or None if there is no solution
+                      (solution, stats) if return_stats is True
+                      with self.solution_cache an identical problem solved before is answered from the cache (no stats),
+                      a problem that can't be fingerprinted (cache.Uncacheable) is always searched
+        """
+        if return_stats or on_progress is not None or check is not None or stats is not None:
+            if engine != "iterative":
+                raise ValueError("Solver statistics and checks are only supported by the iterative engine")
+            return self.solve_with_stats(assignment, on_progress, progress_interval, return_stats, check, stats)
+
+        if engine not in ("iterative", "recursive"):
+            raise ValueError(f"Unknown search engine {engine!r}, choose one of ['iterative', 'recursive']")
+
+        key = None
+        if self.solution_cache is not None:
+            try:
+                key = fingerprint(self, assignment)
+            except Uncacheable:
+                key = None
+        if key is not None:
+            cached = self.solution_cache.get(self, key)
+            if cached is not MISS:
+                return cached
+
+        solution = self.iterative_search(assignment) if engine == "iterative" else self.backtracking_search(assignment)
+        if key is not None:
+            self.solution_cache.put(self, key, solution)
+        return solution
+
+    def solve_with_stats(self, assignment: Optional[dict[Session: datetime]], on_progress: Optional[Callable],
+                         progress_interval: int, return_stats: bool, check: Optional[Callable] = None,
+                         stats: Optional[SolverStats] = None):
+        """
+        iterative search on an instrumented copy of the csp, see solve
+        """
+        stats = stats if stats is not None else SolverStats()
+        bound = None
+        if on_progress is not None:
+            def bound(assignment: dict[Session: datetime], domains: dict[Session: list[datetime]]) -> bool:
+                if stats.nodes % progress_interval == 0:
+                    on_progress(stats)
+                return True
+
+        searched = instrument(self, stats)
+        if check is not None:
+            searched = interruptible(searched, check)
+        start = time.perf_counter()
+        solution = next(iterative_search(searched, assignment, bound, stats), None)
+        stats.elapsed_seconds = time.perf_counter() - start
+        stats.solved = solution is not None
+
+        if on_progress is not None:
+            on_progress(stats)
+        return (solution, stats) if return_stats else solution
+
+    def repair(self, previous_solution: dict[Session: datetime], max_steps: int = 1000,
+               seed: Optional[int] = 0) -> Optional[dict[Session: datetime]]:
+        """
+        re-solves starting from a previous solution, moving only the sessions that now conflict (min-conflicts, see repair.py)
+        falls back to a full self.solve() if the repair doesn't succeed within max_steps moves
+        :param previous_solution: solution of an earlier version of the problem, sessions are matched by identity or descriptor
+        """
+        solution = min_conflicts(self, previous_solution, max_steps, seed)
+        if solution is None:
+            return self.solve()
+        return solution
+
+    def optimize(self, assignment: Optional[dict[Session: datetime]] = None, time_budget: Optional[float] = None,
+                 node_budget: Optional[int] = None, on_improvement: Optional[Callable] = None) -> tuple[Optional[dict[Session: datetime]], float]:
+        """
+        anytime branch and bound minimizing self.cost (see optimize.py)
+        :param time_budget: seconds of wall-clock time after which the best solution found so far is returned
+        :param node_budget: number of search nodes after which the best solution found so far is returned
+        :param on_improvement: called with (solution, cost) every time a better solution is found
+        :return tuple: (best solution or None, its cost) the solution is optimal if no budget ran out
+        """
+        return branch_and_bound(self, assignment, time_budget, node_budget, on_improvement)
+
+    def iter_solutions(self, assignment: Optional[dict[Session: datetime]] = None, limit: Optional[int] = None,
+                       order_by: Optional[str | Callable] = None) -> Iterator[dict[Session: datetime]]:
+        """
+        the solutions extending the assignment, one search continued for every next solution (nothing is kept but the search state)
+        :param limit: stop after this many solutions, all of them by default (sum(1 for _ in csp.iter_solutions()) counts them)
+        :param order_by: None yields the solutions lazily in the order the search finds them
+                         "cost" (self.cost) or a function solution -> number yields the limit best ones, best first (see optimize.k_best)
+                         the whole search has to run before the best are known, only limit solutions are kept meanwhile
+        :return iterator: of new solution dicts
+        """
+        if limit is not None and limit < 0:
+            raise ValueError(f"limit must be 0 or more, or None, not {limit}")
+
+        if order_by is None:
+            return islice(iterative_search(self, assignment), limit)
+
+        if limit is None:
+            raise ValueError("order_by needs a limit, all the solutions would have to be kept to sort them")
+        if order_by != "cost" and not callable(order_by):
+            raise ValueError(f"Unknown order_by {order_by!r}, choose 'cost' or a function of the solution")
+
+        objective = None if order_by == "cost" else order_by
+
+        def best() -> Iterator[dict[Session: datetime]]:
+            for _, solution in k_best(self, limit, assignment, objective):
+                yield solution
+
+        return best()
+
+    def solve_portfolio(self, configurations: Optional[list[dict]] = None,
+                        max_workers: Optional[int] = None) -> Optional[dict[Session: datetime]]:
+        """
+        runs differently configured searches of this csp in parallel processes and returns the first solution found (see portfolio.py)
+        :param configurations: list of dicts of attributes to override per search (variable_ordering, value_ordering, inference, seed ...)
+                               portfolio.DEFAULT_PORTFOLIO by default
+        :param max_workers: number of processes, one per configuration by default
+        """
+        return solve_portfolio(self, configurations, max_workers)
+
+    def solve_decomposed(self, assignment: Optional[dict[Session: datetime]] = None,
+                         max_workers: Optional[int] = None) -> Optional[dict[Session: datetime]]:
+        """
+        solves every connected component of the constraint graph on its own and merges the solutions (see decompose.py)
+        :param max_workers: solve the components in a process pool of this many processes, in this process if None
+        """
+        return solve_decomposed(self, assignment, max_workers)
+
+    def iterative_search(self, assignment: Optional[dict[Session: datetime]] = None) -> Optional[dict[Session: datetime]]:
+        """
+        non recursive version of backtracking_search, see search.py
+        """
+        return next(iterative_search(self, assignment), None)
+
+    def backtracking_search(self, assignment: Optional[dict[Session: datetime]] = None,
+                            domains: dict[Session: list[datetime]] = None):
+        # the current domains get pruned by the inference while searching, starting from a copy of self.domains
+        # the assignment is indexed by start time so overlap constraints don't scan all of it
+        if domains is None:
+            assignment = self.make_assignment(assignment)
+            domains = self.initial_domains(assignment)
+            if domains is None:
+                return None
 
-    def backtracking_search(self, assignment = {}):
         # assignment is complete if every variable is assigned (our base case)
         if len(assignment) == len(self.variables):
             return assignment
@@ -80,16 +520,20 @@ class CSP:
         # get all variables in the CSP but not in the assignment
         unassigned: List[V] = [v for v in self.variables if v not in assignment]
 
-        # get the every possible domain value of the first unassigned variable
-        first: V = unassigned[0]
-        for value in self.domains[first]:
+        # get the every possible domain value of the next variable chosen by the ordering heuristic
+        first: V = self.select_unassigned_variable(unassigned, assignment, domains)
+        for value in self.order_domain_values(first, assignment, domains):
             local_assignment = assignment.copy()
             local_assignment[first] = value
             # if we're still consistent, we recurse (continue)
             if self.consistent(first, local_assignment):
-                result: Optional[Dict[V, D]] = self.backtracking_search(local_assignment)
-                # if we didn't find the result, we will end up backtracking
-                if result is not None:
-                    return result
+                # prune the other domains, a wiped out domain means this value is a dead end already
+                removals = []
+                if self.infer(first, local_assignment, domains, removals):
+                    result: Optional[Dict[V, D]] = self.backtracking_search(local_assignment, domains)
+                    # if we didn't find the result, we will end up backtracking
+                    if result is not None:
+                        return result
+                restore(domains, removals)
         return None
 
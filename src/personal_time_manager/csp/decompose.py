@@ -0,0 +1,109 @@
+'''
+Decomposition of a CSP into independent sub-problems
+
+Most sessions only interact with the sessions of the same day (or the same students), the constraint graph
+(CSP.neighbours, built from the constraints and the domains) is made of several connected components
+with no constraint between them. Solving them as one search multiplies their costs: a dead end in one component
+makes the search re-try the values of all the unrelated variables assigned before it.
+
+Every component is solved on its own by a copy of the csp restricted to its variables (same orderings, inference ...),
+in this process or in a process pool, and the solutions of the components are merged.
+There is no solution as soon as one component has none, the searches of the other components still running are then stopped
+(see worker_pool.py).
+'''
+from __future__ import annotations
+import copy
+from datetime import datetime
+from typing import Optional, TYPE_CHECKING
+from personal_time_manager.sessions.base_session import Session
+from personal_time_manager.csp.search import interruptible, iterative_search
+from personal_time_manager.csp.worker_pool import WorkerPool, check_stop
+
+if TYPE_CHECKING:
+    from personal_time_manager.csp.csp import CSP
+
+
+def connected_components(csp: CSP) -> list[list[Session]]:
+    '''
+    :return list: the variables of every connected component of the constraint graph, each in csp.variables order
+                  the components are sorted by their first variable
+    '''
+    component_of: dict[Session: int] = {}
+    components: list[list[Session]] = []
+    for variable in csp.variables:
+        if variable in component_of:
+            continue
+
+        component_of[variable] = len(components)
+        members = [variable]
+        frontier = [variable]
+        while frontier:
+            for neighbour in csp.neighbours(frontier.pop()):
+                if neighbour not in component_of:
+                    component_of[neighbour] = len(components)
+                    members.append(neighbour)
+                    frontier.append(neighbour)
+        components.append(members)
+
+    position = {variable: index for index, variable in enumerate(csp.variables)}
+    return [sorted(members, key=position.__getitem__) for members in components]
+
+def sub_csp(csp: CSP, variables: list[Session]) -> CSP:
+    '''
+    shallow copy of the csp restricted to the variables of one component (the constraint objects are shared)
+    soft constraints are left out, the components are only solved for the hard constraints
+    '''
+    component = copy.copy(csp)
+    component.variables = variables
+    component.domains = {variable: csp.domains[variable] for variable in variables}
+    component.constraints = {variable: csp.constraints[variable] for variable in variables}
+    component.soft_constraints = []
+    component._neighbours = None
+    component._watchers = None
+    return component
+
+
+def _solve_component(component: CSP, assignment: dict[int: datetime], in_worker: bool = False) -> Optional[dict[int: datetime]]:
+    # the assignment and the solution go by variable index so they map to the Sessions of the caller,
+    # in a worker the search stops once the pool is stopped (see worker_pool.py)
+    searched = interruptible(component, check_stop) if in_worker else component
+    solution = next(iterative_search(searched, {component.variables[index]: value for index, value in assignment.items()}), None)
+    if solution is None:
+        return None
+
+    position = {variable: index for index, variable in enumerate(component.variables)}
+    return {position[variable]: value for variable, value in solution.items()}
+
+def solve_decomposed(csp: CSP, assignment: Optional[dict[Session: datetime]] = None,
+                     max_workers: Optional[int] = None) -> Optional[dict[Session: datetime]]:
+    '''
+    :param assignment: partial assignment the solution has to extend, empty by default
+    :param max_workers: solve the components in a process pool of this many processes, in this process if None
+    :return dict: the merged solutions of all the components, None if one of them has no solution
+    '''
+    assignment = assignment or {}
+    components = [sub_csp(csp, variables) for variables in connected_components(csp)]
+    tasks = []
+    for component in components:
+        position = {variable: index for index, variable in enumerate(component.variables)}
+        tasks.append((component, {position[variable]: value for variable, value in assignment.items() if variable in position}))
+
+    solution = {}
+    if max_workers is None:
+        for component, component_assignment in tasks:
+            component_solution = _solve_component(component, component_assignment)
+            if component_solution is None:
+                return None
+            solution.update({component.variables[index]: value for index, value in component_solution.items()})
+    else:
+        # a component without solution makes the others pointless, leaving the pool stops them
+        with WorkerPool(max_workers) as pool:
+            worker_tasks = [(component, component_assignment, True) for component, component_assignment in tasks]
+            for task_index, component_solution in pool.as_completed(_solve_component, worker_tasks):
+                if component_solution is None:
+                    return None
+                component = tasks[task_index][0]
+                solution.update({component.variables[index]: value for index, value in component_solution.items()})
+
+    # back in the order of csp.variables like the other engines
+    return {variable: solution[variable] for variable in csp.variables}
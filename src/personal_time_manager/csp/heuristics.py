@@ -0,0 +1,148 @@
+'''
+Variable and value ordering heuristics for the CSP backtracking search
+
+Variable ordering functions pick the next variable to assign
+    (csp, unassigned, assignment, domains) -> Session
+
+Value ordering functions decide in which order the domain values of that variable are tried
+    (csp, variable, assignment, domains) -> list[datetime]
+
+The "static" strategies reproduce the original behaviour of the search:
+first unassigned variable in csp.variables order, domain values in list order
+'''
+from __future__ import annotations
+from datetime import datetime
+from typing import Callable, TYPE_CHECKING
+from personal_time_manager.sessions.base_session import Session
+
+if TYPE_CHECKING:
+    from personal_time_manager.csp.csp import CSP
+
+
+def remaining_values(csp: CSP, variable: Session, assignment: dict[Session: datetime],
+                     domains: dict[Session: list[datetime]]) -> int:
+    '''
+    number of values of the variable still consistent with the assignment
+    with inference enabled the pruned domains only hold such values so their size is used directly
+    '''
+    if csp.inference != "none":
+        return len(domains[variable])
+    return csp.count_legal_values(variable, assignment, domains)
+
+
+### Variable ordering
+def first_unassigned(csp: CSP, unassigned: list[Session], assignment: dict[Session: datetime],
+                     domains: dict[Session: list[datetime]]) -> Session:
+    '''
+    static ordering, the first unassigned variable in the order they were given to the csp
+    '''
+    return unassigned[0]
+
+def minimum_remaining_values(csp: CSP, unassigned: list[Session], assignment: dict[Session: datetime],
+                             domains: dict[Session: list[datetime]]) -> Session:
+    '''
+    MRV (fail-first) ordering, the variable with the least amount of values still consistent with the assignment
+    ties are broken by the static order
+    '''
+    return min(unassigned, key=lambda variable: remaining_values(csp, variable, assignment, domains))
+
+def mrv_degree(csp: CSP, unassigned: list[Session], assignment: dict[Session: datetime],
+               domains: dict[Session: list[datetime]]) -> Session:
+    '''
+    MRV ordering with ties broken by the degree heuristic
+    the variable constraining the most unassigned variables is chosen first
+    '''
+    def key(variable: Session) -> tuple[int, int]:
+        degree = sum(1 for neighbour in csp.neighbours(variable) if neighbour not in assignment)
+        return remaining_values(csp, variable, assignment, domains), -degree
+
+    return min(unassigned, key=key)
+
+def mrv_random(csp: CSP, unassigned: list[Session], assignment: dict[Session: datetime],
+               domains: dict[Session: list[datetime]]) -> Session:
+    '''
+    MRV ordering with ties broken randomly (csp.random), gives differently behaving searches for a portfolio
+    '''
+    remaining = {variable: remaining_values(csp, variable, assignment, domains) for variable in unassigned}
+    fewest = min(remaining.values())
+    return csp.random.choice([variable for variable in unassigned if remaining[variable] == fewest])
+
+
+### Value ordering
+def domain_order(csp: CSP, variable: Session, assignment: dict[Session: datetime],
+                 domains: dict[Session: list[datetime]]) -> list[datetime]:
+    '''
+    static ordering, the values in the order of the domain list
+    '''
+    return domains[variable]
+
+def least_constraining_value(csp: CSP, variable: Session, assignment: dict[Session: datetime],
+                             domains: dict[Session: list[datetime]]) -> list[datetime]:
+    '''
+    LCV ordering, the values ruling out the least amount of values in the domains of the unassigned neighbours are tried first
+    ties are broken by the domain order (sorted is stable)
+    '''
+    unassigned_neighbours = [neighbour for neighbour in csp.neighbours(variable) if neighbour not in assignment]
+
+    def ruled_out(value: datetime) -> int:
+        trial_assignment = assignment.copy()
+        trial_assignment[variable] = value
+        count = 0
+        for neighbour in unassigned_neighbours:
+            count += len(domains[neighbour]) - csp.count_legal_values(neighbour, trial_assignment, domains)
+        return count
+
+    return sorted(domains[variable], key=ruled_out)
+
+def random_order(csp: CSP, variable: Session, assignment: dict[Session: datetime],
+                 domains: dict[Session: list[datetime]]) -> list[datetime]:
+    '''
+    the values shuffled with csp.random (seeded by the csp seed so the search is reproducible)
+    '''
+    values = list(domains[variable])
+    csp.random.shuffle(values)
+    return values
+
+class WarmStartOrdering:
+    '''
+    value ordering trying a hinted value first (the start of the session in a previous solution, see planner.py)
+    then the values in the order of the fallback ordering
+    a class and not a closure so csps using it can still be pickled to the portfolio and decomposition workers
+    '''
+    def __init__(self, hints: dict[Session: datetime], fallback: str | Callable = "static"):
+        self.hints = hints
+        self.fallback = fallback
+
+    def __call__(self, csp: CSP, variable: Session, assignment: dict[Session: datetime],
+                 domains: dict[Session: list[datetime]]) -> list[datetime]:
+        values = resolve(VALUE_ORDERINGS, self.fallback)(csp, variable, assignment, domains)
+        hint = self.hints.get(variable)
+        if hint is None or hint not in domains[variable]:
+            return values
+        return [hint, *(value for value in values if value != hint)]
+
+
+VARIABLE_ORDERINGS: dict[str: Callable] = {
+    "static": first_unassigned,
+    "mrv": minimum_remaining_values,
+    "mrv_degree": mrv_degree,
+    "mrv_random": mrv_random,
+}
+
+VALUE_ORDERINGS: dict[str: Callable] = {
+    "static": domain_order,
+    "lcv": least_constraining_value,
+    "random": random_order,
+}
+
+def resolve(strategies: dict[str: Callable], strategy: str | Callable) -> Callable:
+    '''
+    returns the ordering function of a strategy given by name or the strategy itself if it's already a function
+    '''
+    if callable(strategy):
+        return strategy
+
+    try:
+        return strategies[strategy]
+    except KeyError:
+        raise ValueError(f"Unknown ordering strategy {strategy!r}, choose one of {list(strategies)}")
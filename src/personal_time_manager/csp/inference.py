@@ -0,0 +1,146 @@
+'''
+Inference (constraint propagation) for the CSP backtracking search
+
+After a variable is assigned, the domains of the unassigned variables are pruned from values that can no longer be part of a solution.
+This finds dead ends as soon as they are caused instead of when the search reaches the affected variable.
+
+Every pruning is recorded in the removals list as (variable, domain list before pruning)
+so the search can restore the domains when it backtracks by calling restore(domains, removals)
+
+Inference functions take (csp, variable, assignment, domains, removals) and return False if a domain got wiped out
+
+Forward checking and MAC also run the propagate hook of the constraints watching the assigned variable,
+global constraints (like DisjunctiveConstraint) prune there what the checks of one variable at a time can't see
+'''
+from __future__ import annotations
+from collections import deque
+from datetime import datetime
+from typing import Callable, Optional, TYPE_CHECKING
+from personal_time_manager.sessions.base_session import Session
+from personal_time_manager.sessions.minute_domain import same_kind, take
+
+if TYPE_CHECKING:
+    from personal_time_manager.csp.csp import CSP
+
+
+def no_inference(csp: CSP, variable: Session, assignment: dict[Session: datetime],
+                 domains: dict[Session: list[datetime]], removals: list) -> bool:
+    return True
+
+def forward_checking(csp: CSP, variable: Session, assignment: dict[Session: datetime],
+                     domains: dict[Session: list[datetime]], removals: list) -> bool:
+    '''
+    removes the values of every unassigned neighbour of the just assigned variable that are no longer consistent with the assignment
+    (the same test the search would do when it reaches the neighbour, just done earlier)
+    '''
+    for neighbour in csp.neighbours(variable):
+        if neighbour in assignment:
+            continue
+
+        legal_values = csp.legal_values(neighbour, assignment, domains)
+        if len(legal_values) < len(domains[neighbour]):
+            removals.append((neighbour, domains[neighbour]))
+            domains[neighbour] = same_kind(domains[neighbour], legal_values)
+
+        if not legal_values:
+            return False
+
+    return propagate(csp, variable, assignment, domains, removals)
+
+def propagate(csp: CSP, variable: Session, assignment: dict[Session: datetime],
+              domains: dict[Session: list[datetime]], removals: list) -> bool:
+    '''
+    applies the prunings of Constraint.propagate of every constraint watching the just assigned variable
+    :return boolean: False if a constraint proved the assignment can't be extended or a domain got wiped out
+    '''
+    for constraint in csp.watching(variable):
+        pruned = constraint.propagate(variable, assignment, domains)
+        if pruned is None:
+            return False
+
+        for other, values in pruned.items():
+            removals.append((other, domains[other]))
+            domains[other] = same_kind(domains[other], values)
+            if not values:
+                return False
+
+    return True
+
+def revise(csp: CSP, variable: Session, other: Session, assignment: dict[Session: datetime],
+           domains: dict[Session: list[datetime]], removals: list) -> bool:
+    '''
+    removes the values of variable that have no supporting value of other
+    a value of other supports a value of variable if the constraints of both are satisfied with the two values in the assignment
+    :return boolean: True if the domain of variable was pruned
+    '''
+    other_values = [assignment[other]] if other in assignment else domains[other]
+    trial_assignment = assignment.copy()
+
+    supported = []
+    for position, value in enumerate(domains[variable]):
+        trial_assignment[variable] = value
+        for other_value in other_values:
+            trial_assignment[other] = other_value
+            if csp.consistent(variable, trial_assignment) and csp.consistent(other, trial_assignment):
+                supported.append(position)
+                break
+
+    if len(supported) < len(domains[variable]):
+        removals.append((variable, domains[variable]))
+        domains[variable] = take(domains[variable], supported)
+        return True
+
+    return False
+
+def ac3(csp: CSP, assignment: dict[Session: datetime], domains: dict[Session: list[datetime]],
+        removals: list, arcs: Optional[list[tuple[Session, Session]]] = None) -> bool:
+    '''
+    makes the domains of the unassigned variables arc consistent
+    :param arcs: the (variable, other) arcs to start from, by default every arc between unassigned neighbours
+    :return boolean: False if a domain got wiped out i.e. there is no solution extending the assignment
+    '''
+    if arcs is None:
+        arcs = [(variable, neighbour) for variable in csp.variables if variable not in assignment
+                for neighbour in csp.neighbours(variable) if neighbour not in assignment]
+
+    queue = deque(arcs)
+    queued = set(arcs)
+    while queue:
+        variable, other = queue.popleft()
+        queued.discard((variable, other))
+
+        if revise(csp, variable, other, assignment, domains, removals):
+            if not domains[variable]:
+                return False
+
+            # the variables depending on the pruned one need to be revised again
+            for neighbour in csp.neighbours(variable):
+                arc = (neighbour, variable)
+                if neighbour is not other and neighbour not in assignment and arc not in queued:
+                    queue.append(arc)
+                    queued.add(arc)
+
+    return True
+
+def maintain_arc_consistency(csp: CSP, variable: Session, assignment: dict[Session: datetime],
+                             domains: dict[Session: list[datetime]], removals: list) -> bool:
+    '''
+    MAC, runs ac3 starting from the arcs pointing to the just assigned variable
+    '''
+    arcs = [(neighbour, variable) for neighbour in csp.neighbours(variable) if neighbour not in assignment]
+    return ac3(csp, assignment, domains, removals, arcs) and propagate(csp, variable, assignment, domains, removals)
+
+def restore(domains: dict[Session: list[datetime]], removals: list) -> None:
+    '''
+    undoes the prunings recorded in removals (latest first)
+    '''
+    for variable, previous_domain in reversed(removals):
+        domains[variable] = previous_domain
+    removals.clear()
+
+
+INFERENCES: dict[str: Callable] = {
+    "none": no_inference,
+    "forward_checking": forward_checking,
+    "mac": maintain_arc_consistency,
+}
@@ -0,0 +1,167 @@
+'''
+Interval index of the assigned sessions
+
+The assignment used by the solver is an IndexedAssignment, a dict that keeps its sessions sorted by their start time
+while values are assigned and unassigned, so NoTimeOverlapConstraint can find the sessions starting inside a time window
+in O(log n + k) instead of scanning the whole assignment.
+It also caches the result of the overlap walk of every checked session (OverlapCache), an entry is only dropped
+when a session is assigned or unassigned inside the time window the walk covered.
+'''
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Iterator, Optional, TYPE_CHECKING
+from personal_time_manager.sessions.base_session import Session
+
+if TYPE_CHECKING:
+    from personal_time_manager.csp.occupancy_grid import OccupancyGrid
+
+
+class IntervalIndex:
+    '''
+    sessions sorted by start time (two parallel lists searched with bisect)
+    '''
+    def __init__(self):
+        self._starts: list[datetime] = []
+        self._sessions: list[Session] = []
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def add(self, session: Session, start: datetime) -> None:
+        index = bisect_right(self._starts, start)
+        self._starts.insert(index, start)
+        self._sessions.insert(index, session)
+
+    def remove(self, session: Session, start: datetime) -> None:
+        index = bisect_left(self._starts, start)
+        while self._sessions[index] is not session:
+            index += 1
+        del self._starts[index]
+        del self._sessions[index]
+
+    def starting_from(self, time: datetime) -> Iterator[tuple[Session, datetime]]:
+        '''
+        (session, start) of the sessions starting at or after time, in start time order
+        the iteration is lazy so the caller can stop as soon as the starts go past its window
+        '''
+        for index in range(bisect_left(self._starts, time), len(self._starts)):
+            yield self._sessions[index], self._starts[index]
+
+    def starting_between(self, low: datetime, high: datetime) -> list[tuple[Session, datetime]]:
+        '''
+        (session, start) of the sessions with low < start < high, in start time order
+        '''
+        first = bisect_right(self._starts, low)
+        last = bisect_left(self._starts, high)
+        return list(zip(self._sessions[first:last], self._starts[first:last]))
+
+    def copy(self) -> IntervalIndex:
+        index = IntervalIndex()
+        index._starts = self._starts.copy()
+        index._sessions = self._sessions.copy()
+        return index
+
+
+class OverlapCache:
+    '''
+    (end, overlapped sessions) of the overlap walk of NoTimeOverlapConstraint per session and tolerance
+    valid for the current assignment, an entry covering [start, end) is dropped by a change of the assignment inside it
+    '''
+    def __init__(self):
+        self._entries: dict[Session: dict[timedelta: tuple]] = {}
+        self._span = timedelta(0) # longest window cached, how far back a change can fall inside an entry
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def get(self, session: Session, tolerance: timedelta) -> Optional[tuple]:
+        entries = self._entries.get(session)
+        return None if entries is None else entries.get(tolerance)
+
+    def put(self, session: Session, tolerance: timedelta, start: datetime, end: datetime,
+            overlapped: Optional[tuple[Session, ...]]) -> tuple:
+        entry = (end, overlapped)
+        self._entries.setdefault(session, {})[tolerance] = entry
+        self._span = max(self._span, end - start)
+        return entry
+
+    def invalidate(self, session: Session, time: datetime, intervals: IntervalIndex) -> None:
+        '''
+        drop the entries of the session and the ones whose window contains time (session was assigned or unassigned at time)
+        '''
+        self._entries.pop(session, None)
+        if not self._entries:
+            return
+
+        for other_session, start in intervals.starting_from(time - self._span):
+            if start > time:
+                break
+            entries = self._entries.get(other_session)
+            if entries:
+                for tolerance, (end, _) in list(entries.items()):
+                    if time < end:
+                        del entries[tolerance]
+
+    def copy(self) -> OverlapCache:
+        cache = OverlapCache()
+        cache._entries = {session: entries.copy() for session, entries in self._entries.items()}
+        cache._span = self._span
+        return cache
+
+
+class IndexedAssignment(dict):
+    '''
+    assignment dict {Session: start datetime} keeping self.intervals and self.overlaps up to date on every change
+    and the occupancy grid too if one is given (see occupancy_grid.py)
+    '''
+    def __init__(self, assignment: dict[Session: datetime] = None, grid: OccupancyGrid = None):
+        super().__init__()
+        self.intervals = IntervalIndex()
+        self.overlaps = OverlapCache()
+        self.grid = grid
+        if assignment:
+            self.update(assignment)
+
+    def __setitem__(self, session: Session, start: datetime) -> None:
+        if session in self:
+            # reassigning keeps the dict order, only the index entries move
+            self.overlaps.invalidate(session, self[session], self.intervals)
+            self.intervals.remove(session, self[session])
+            if self.grid is not None:
+                self.grid.remove(session)
+        super().__setitem__(session, start)
+        self.intervals.add(session, start)
+        self.overlaps.invalidate(session, start, self.intervals)
+        if self.grid is not None:
+            self.grid.place(session, start)
+
+    def __delitem__(self, session: Session) -> None:
+        self.overlaps.invalidate(session, self[session], self.intervals)
+        self.intervals.remove(session, self[session])
+        super().__delitem__(session)
+        if self.grid is not None:
+            self.grid.remove(session)
+
+    def pop(self, session: Session, *default):
+        if session not in self:
+            return super().pop(session, *default)
+        start = self[session]
+        del self[session]
+        return start
+
+    def update(self, assignment: dict[Session: datetime]) -> None:
+        for session, start in dict(assignment).items():
+            self[session] = start
+
+    def clear(self) -> None:
+        for session in list(self):
+            del self[session]
+
+    def copy(self) -> IndexedAssignment:
+        assignment = IndexedAssignment()
+        dict.update(assignment, self)
+        assignment.intervals = self.intervals.copy()
+        assignment.overlaps = self.overlaps.copy()
+        assignment.grid = None if self.grid is None else self.grid.copy()
+        return assignment
@@ -0,0 +1,99 @@
+'''
+Anytime branch and bound over the soft constraints of a CSP
+
+The iterative search (search.py) enumerates the solutions, on every node the lower bound of the cost
+(CSP.cost_lower_bound) is compared to the best solution found so far and the branch is cut if it can't do better.
+Every better solution is reported as soon as it's found, and the search stops when a time or node budget runs out,
+returning the best timetable reachable within the budget instead of the first one.
+
+k_best keeps the k best solutions instead of one (alternative timetables to choose from),
+a branch is cut once k solutions are known and it can't beat the worst of them.
+'''
+from __future__ import annotations
+import heapq
+import time
+from datetime import datetime
+from typing import Callable, Optional, TYPE_CHECKING
+from personal_time_manager.sessions.base_session import Session
+from personal_time_manager.csp.search import interruptible, iterative_search
+
+if TYPE_CHECKING:
+    from personal_time_manager.csp.csp import CSP
+    from personal_time_manager.csp.stats import SolverStats
+
+
+class BudgetExhausted(Exception):
+    '''
+    raised from inside the search to stop it when the time or node budget runs out
+    '''
+
+
+def branch_and_bound(csp: CSP, assignment: Optional[dict[Session: datetime]] = None, time_budget: Optional[float] = None,
+                     node_budget: Optional[int] = None, on_improvement: Optional[Callable] = None,
+                     should_stop: Optional[Callable] = None, stats: Optional[SolverStats] = None) -> tuple[Optional[dict[Session: datetime]], float]:
+    '''
+    :param time_budget: seconds of wall-clock time the search may take
+    :param node_budget: number of nodes the search may expand
+    :param on_improvement: called with (solution, cost) on every improving solution
+    :param should_stop: called before every consistency check (every value tried, failing ones included),
+                        the search stops (keeping the best solution so far) as soon as it returns True
+    :param stats: SolverStats the search counts its nodes and backtracks in
+    :return tuple: (best solution found or None, its cost or infinity)
+    '''
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    best_solution = None
+    best_cost = float("inf")
+    nodes = 0
+
+    def bound(assignment: dict[Session: datetime], domains: dict[Session: list[datetime]]) -> bool:
+        nonlocal nodes
+        nodes += 1
+        if node_budget is not None and nodes > node_budget:
+            raise BudgetExhausted()
+
+        return csp.cost_lower_bound(assignment, domains) < best_cost
+
+    # the time and should_stop are checked on every value tried, a value failing the inference never reaches bound
+    def check() -> None:
+        if (deadline is not None and time.perf_counter() > deadline) or (should_stop is not None and should_stop()):
+            raise BudgetExhausted()
+
+    searched = csp if deadline is None and should_stop is None else interruptible(csp, check)
+    try:
+        for solution in iterative_search(searched, assignment, bound, stats):
+            cost = csp.cost(solution)
+            if cost < best_cost:
+                best_solution, best_cost = solution, cost
+                if on_improvement is not None:
+                    on_improvement(solution, cost)
+    except BudgetExhausted:
+        pass
+
+    return best_solution, best_cost
+
+def k_best(csp: CSP, limit: int, assignment: Optional[dict[Session: datetime]] = None,
+           objective: Optional[Callable] = None) -> list[tuple[float, dict[Session: datetime]]]:
+    '''
+    :param limit: number of solutions kept, only these are held in memory while the search enumerates the others
+    :param objective: function solution -> number to minimize, csp.cost if None
+                      (only csp.cost has a lower bound (CSP.cost_lower_bound) to cut branches with, any other objective
+                      means enumerating every solution)
+    :return list: (cost, solution) of the limit best solutions, best first, ties in the order the search found them
+    '''
+    if limit == 0:
+        return [] # no search at all, there is nothing to keep
+    worst_first = [] # heap of (-cost, -found order, solution), the worst kept solution on top
+
+    def bound(assignment: dict[Session: datetime], domains: dict[Session: list[datetime]]) -> bool:
+        return len(worst_first) < limit or csp.cost_lower_bound(assignment, domains) < -worst_first[0][0]
+
+    solutions = iterative_search(csp, assignment, bound if objective is None else None)
+    for order, solution in enumerate(solutions):
+        cost = csp.cost(solution) if objective is None else objective(solution)
+        entry = (-cost, -order, solution)
+        if len(worst_first) < limit:
+            heapq.heappush(worst_first, entry)
+        elif entry > worst_first[0]:
+            heapq.heapreplace(worst_first, entry)
+
+    return [(-cost, solution) for cost, _, solution in sorted(worst_first, reverse=True)]
@@ -0,0 +1,168 @@
+'''
+Planning many weeks (a whole school term) in one go
+
+A SessionGroup is tied to one Saturday week_start_date, so a term is a series of weekly CSPs.
+Consecutive weeks are nearly identical (same tuitions, prayer times moving by a minute or two),
+so each week is warm started from the last solved one: its solution is moved forward by the weeks in between
+and every session tries its previous start first (WarmStartOrdering in heuristics.py), falling back to the csp's own value ordering.
+When the previous timetable still fits, the search goes straight down without backtracking.
+
+The weeks are solved in order and yielded as soon as they are solved so the caller can show or save them one by one.
+
+Building the same week again (a timetable asked for twice, a job retried) loads its groups again, which is cheap
+(the prayer months and the calendar are cached, the calendar synced incrementally), but the CSP built from them
+is usually the same. Given a WeekCache, build_week_csp gives back the CSP it built last time for the week
+as long as the version of every group (SessionGroup.version, GoogleCalendar.version) is the same.
+'''
+from __future__ import annotations
+import copy
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, Optional
+from personal_time_manager.sessions.base_session import Session, SessionGroup
+from personal_time_manager.sessions.loading import load_session_groups
+from personal_time_manager.sessions.session_table import SessionTable
+from personal_time_manager.sessions.prayers import Prayers
+from personal_time_manager.sessions.tuition import Tuitions
+from personal_time_manager.sessions.google_calender import GoogleCalendar
+from personal_time_manager.csp.csp import CSP
+from personal_time_manager.csp.constraints import DisjunctiveConstraint, NoTimeOverlapConstraint
+from personal_time_manager.csp.heuristics import WarmStartOrdering
+from personal_time_manager.csp.repair import carry_over
+
+WEEK = timedelta(days=7)
+
+
+def week_starts(first_day: datetime, last_day: datetime) -> list[datetime]:
+    '''
+    :return list: the Saturday starting every week from the one holding first_day to the one holding last_day (included)
+    '''
+    week_start = SessionGroup.week_start_of(first_day)
+    starts = []
+    while week_start <= last_day:
+        starts.append(week_start)
+        week_start += WEEK
+    return starts
+
+
+class WeekCache:
+    '''
+    the CSP last built for every week and build options, with the versions of the groups it was built from
+    a hit gives a shallow copy of the cached CSP: the variables, domains and constraints are the ones built before,
+    setting an attribute of it (value_ordering in plan_weeks ...) doesn't change the cached one
+    '''
+    def __init__(self):
+        self._weeks: dict[tuple: tuple[tuple, CSP]] = {} # (week start, options): (versions of the groups, csp)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, versions: tuple, build: Callable[[], CSP]) -> CSP:
+        '''
+        :param versions: the versions of the groups just loaded
+        :param build: builds the CSP when the cached one is missing or built from other versions
+        '''
+        with self._lock:
+            cached = self._weeks.get(key)
+            if cached is not None and cached[0] == versions:
+                self.hits += 1
+                return copy.copy(cached[1])
+            self.misses += 1
+        csp = build()
+        with self._lock:
+            self._weeks[key] = (versions, csp)
+        return copy.copy(csp)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._weeks.clear()
+
+
+def build_week_csp(week_start: datetime, session_groups: tuple[type[SessionGroup], ...] = (Prayers, Tuitions, GoogleCalendar),
+                   tolerance: timedelta = timedelta(minutes=0),
+                   load_timeouts: Optional[dict[type[SessionGroup]: float]] = None, disjunctive: bool = True,
+                   cache: Optional[WeekCache] = None, **csp_options) -> CSP:
+    '''
+    the CSP of one week: the sessions of every group under one DisjunctiveConstraint
+    the groups are loaded concurrently (see loading.py)
+    :param load_timeouts: seconds each group may take to load, their LOAD_TIMEOUT by default
+    :param disjunctive: False for a NoTimeOverlapConstraint per session instead (same solutions, no overload reasoning)
+    :param cache: gives back the CSP built before for the week if none of its groups changed since
+    :param csp_options: passed to CSP (variable_ordering, inference ...)
+    '''
+    groups = load_session_groups(week_start, session_groups, load_timeouts)
+
+    def build() -> CSP:
+        variables: list[Session] = []
+        domains: dict[Session: list[datetime]] = {}
+        for group in groups:
+            variables.extend(group.csp_variables)
+            domains.update(group.csp_domains)
+        return _no_overlap_csp(variables, domains, tolerance, disjunctive, csp_options)
+
+    key = _cache_key(week_start, session_groups, tolerance, disjunctive, csp_options)
+    if cache is None or key is None:
+        return build()
+    return cache.get(key, tuple(group.version for group in groups), build)
+
+def _cache_key(*options) -> Optional[tuple]:
+    '''
+    the options as a WeekCache key, None when one of them can't be a key (the CSP is then not cached)
+    '''
+    key = tuple(tuple(sorted(option.items())) if isinstance(option, dict) else option for option in options)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+def build_table_csp(table: SessionTable, tolerance: timedelta = timedelta(minutes=0), disjunctive: bool = True,
+                    **csp_options) -> CSP:
+    '''
+    the CSP of the sessions of a SessionTable, solved on its lightweight rows, table.render(solution) gives the real descriptors
+    :param disjunctive: like build_week_csp
+    '''
+    variables = table.table_sessions()
+    return _no_overlap_csp(variables, {session: session.domain_values for session in variables}, tolerance, disjunctive, csp_options)
+
+def _no_overlap_csp(variables: list[Session], domains: dict[Session: list[datetime]], tolerance: timedelta,
+                    disjunctive: bool, csp_options: dict) -> CSP:
+    '''
+    a DisjunctiveConstraint over all the sessions prunes the crowded days the pairwise constraints only find by search
+    (see the "crowded" benchmark week), the pairwise ones are kept for comparing
+    '''
+    csp = CSP(variables, domains, **csp_options)
+    if disjunctive:
+        csp.add_constraint(DisjunctiveConstraint(variables, tolerance))
+        return csp
+    for session in variables:
+        csp.add_constraint(NoTimeOverlapConstraint(session, tolerance))
+    return csp
+
+def warm_start_hints(csp: CSP, previous_solution: dict[Session: datetime], shift: timedelta) -> dict[Session: datetime]:
+    '''
+    the starts of the previous solution moved by shift, for the sessions of the csp with the same descriptor
+    starts no longer in the session's domain are dropped
+    '''
+    return carry_over(csp, {session: start + shift for session, start in previous_solution.items()})
+
+def plan_weeks(first_day: datetime, last_day: datetime, build_week: Callable[..., CSP] = build_week_csp,
+               engine: str = "iterative", warm_start: bool = True,
+               **csp_options) -> Iterator[tuple[datetime, Optional[dict[Session: datetime]]]]:
+    '''
+    :param build_week: called with the week start and csp_options, returns the CSP of that week
+    :param engine: engine of CSP.solve
+    :param warm_start: start each week from the last solved one, False solves every week from scratch
+    :return iterator: (week start, solution or None if the week has no solution) for every week, in order, as they get solved
+    '''
+    previous_solution, previous_week_start = None, None
+    for week_start in week_starts(first_day, last_day):
+        csp = build_week(week_start, **csp_options)
+        if warm_start and previous_solution is not None:
+            hints = warm_start_hints(csp, previous_solution, week_start - previous_week_start)
+            csp.value_ordering = WarmStartOrdering(hints, csp.value_ordering)
+
+        solution = csp.solve(engine=engine)
+        if solution is not None:
+            previous_solution, previous_week_start = solution, week_start
+        yield week_start, solution
@@ -0,0 +1,92 @@
+'''
+Parallel portfolio solving
+
+Hard weeks are very sensitive to the variable and value ordering, one configuration finishes in milliseconds while another runs for minutes.
+The portfolio starts several differently configured (or differently seeded) searches of the same CSP in a process pool,
+returns the first answer and stops the others.
+
+The CSP is pickled to the workers (Sessions, constraints and orderings given by name are all picklable)
+and the solution comes back as {variable index: value} so it's mapped to the Session objects of the caller.
+The searches check the stop event of the pool on every value they try (failing ones included) so they stop soon after the first answer,
+a worker still running STOP_GRACE seconds later is terminated (see worker_pool.py).
+'''
+from __future__ import annotations
+import copy
+import random
+from datetime import datetime
+from typing import Optional, TYPE_CHECKING
+from personal_time_manager.sessions.base_session import Session
+from personal_time_manager.csp.search import interruptible, iterative_search
+from personal_time_manager.csp.worker_pool import Stopped, WorkerPool, check_stop
+
+if TYPE_CHECKING:
+    from personal_time_manager.csp.csp import CSP
+
+
+DEFAULT_PORTFOLIO: list[dict] = [
+    {"variable_ordering": "static"},
+    {"variable_ordering": "mrv", "inference": "forward_checking"},
+    {"variable_ordering": "mrv_degree", "value_ordering": "lcv", "inference": "forward_checking"},
+    {"variable_ordering": "mrv_random", "value_ordering": "random", "inference": "forward_checking", "seed": 1},
+]
+
+CONFIGURABLE = ("variable_ordering", "value_ordering", "inference", "ac3_preprocessing", "occupancy_grid", "backjumping", "seed")
+
+SOLVED = "solved"
+UNSATISFIABLE = "unsatisfiable"
+CANCELLED = "cancelled"
+
+
+def configure(csp: CSP, configuration: dict) -> CSP:
+    '''
+    shallow copy of the csp with the attributes of the configuration overridden
+    '''
+    unknown = set(configuration) - set(CONFIGURABLE)
+    if unknown:
+        raise ValueError(f"Unknown portfolio configuration keys {sorted(unknown)}, choose from {list(CONFIGURABLE)}")
+
+    configured = copy.copy(csp)
+    for attribute, value in configuration.items():
+        if attribute == "seed":
+            configured.random = random.Random(value)
+        else:
+            setattr(configured, attribute, value)
+    return configured
+
+
+### Worker side
+def _run_configuration(csp: CSP, configuration: dict) -> tuple[str, Optional[dict[int: datetime]]]:
+    configured = configure(csp, configuration)
+    try:
+        solution = next(iterative_search(interruptible(configured, check_stop)), None)
+    except Stopped: # another worker already answered
+        return CANCELLED, None
+
+    if solution is None:
+        return UNSATISFIABLE, None
+
+    position = {variable: index for index, variable in enumerate(configured.variables)}
+    return SOLVED, {position[variable]: value for variable, value in solution.items()}
+
+
+### Caller side
+def solve_portfolio(csp: CSP, configurations: Optional[list[dict]] = None,
+                    max_workers: Optional[int] = None) -> Optional[dict[Session: datetime]]:
+    '''
+    :param configurations: the attributes overridden for each search, DEFAULT_PORTFOLIO by default
+    :param max_workers: number of processes, one per configuration by default
+    :return dict: the first solution found, None as soon as one search proves there is no solution
+    '''
+    configurations = configurations or DEFAULT_PORTFOLIO
+    for configuration in configurations:
+        configure(csp, configuration) # fail early on bad configurations
+
+    # leaving the pool stops the searches still running
+    with WorkerPool(max_workers or len(configurations)) as pool:
+        for _, (status, solution) in pool.as_completed(_run_configuration, [(csp, configuration) for configuration in configurations]):
+            if status == SOLVED:
+                # in the order of csp.variables like solve()
+                return {variable: solution[index] for index, variable in enumerate(csp.variables)}
+            if status == UNSATISFIABLE:
+                return None # every search is complete, one proof is enough
+    return None
@@ -0,0 +1,112 @@
+'''
+Incremental repair of a previous solution with min-conflicts local search
+
+When one student or one prayer time changes, most of the previous timetable is still valid.
+Instead of searching from an empty assignment, the previous solution is taken as the starting point:
+- sessions keep their previous start if it's still in their domain
+- sessions without a (valid) previous start are placed where they conflict the least
+- then, until nothing conflicts, a conflicted session is moved to the start with the least conflicts
+
+Only the sessions around a conflict are looked at on each step, so the cost follows the size of the change and not of the week.
+'''
+from __future__ import annotations
+import random
+from datetime import datetime
+from typing import Optional, TYPE_CHECKING
+from personal_time_manager.sessions.base_session import Session
+
+if TYPE_CHECKING:
+    from personal_time_manager.csp.csp import CSP
+
+
+def carry_over(csp: CSP, previous_solution: dict[Session: datetime]) -> dict[Session: datetime]:
+    '''
+    the values of the previous solution for the variables of the csp
+    sessions are matched by identity, or by an equal session_descriptor if the csp was rebuilt with new Session objects
+    only values that are still in the variable's domain are kept
+    '''
+    by_descriptor = {}
+    unhashable = []
+    for session, value in previous_solution.items():
+        try:
+            by_descriptor[session.session_descriptor] = value
+        except TypeError: # mutable dataclass descriptors (like Tuition) can't be hashed
+            unhashable.append((session.session_descriptor, value))
+
+    carried = {}
+    for variable in csp.variables:
+        if variable in previous_solution:
+            value = previous_solution[variable]
+        else:
+            try:
+                value = by_descriptor.get(variable.session_descriptor)
+            except TypeError:
+                value = next((value for descriptor, value in unhashable if descriptor == variable.session_descriptor), None)
+
+        if value is not None and value in csp.domains[variable]:
+            carried[variable] = value
+
+    return carried
+
+def count_conflicts(csp: CSP, variable: Session, assignment: dict[Session: datetime]) -> int:
+    '''
+    number of variables among the variable and its assigned neighbours whose constraints are violated by the assignment
+    '''
+    conflicts = 0 if csp.consistent(variable, assignment) else 1
+    for neighbour in csp.neighbours(variable):
+        if neighbour in assignment and not csp.consistent(neighbour, assignment):
+            conflicts += 1
+    return conflicts
+
+def min_conflict_value(csp: CSP, variable: Session, assignment: dict[Session: datetime], generator: random.Random) -> datetime:
+    '''
+    the value of the variable with the least conflicts, the current value wins ties (stability) then a random one of the best
+    '''
+    current_value = assignment.get(variable)
+    best_values = []
+    best_conflicts = None
+    for value in csp.domains[variable]:
+        assignment[variable] = value
+        conflicts = count_conflicts(csp, variable, assignment)
+        if best_conflicts is None or conflicts < best_conflicts:
+            best_values, best_conflicts = [value], conflicts
+        elif conflicts == best_conflicts:
+            best_values.append(value)
+
+    if current_value in best_values:
+        return current_value
+    return generator.choice(best_values)
+
+def min_conflicts(csp: CSP, previous_solution: dict[Session: datetime], max_steps: int = 1000,
+                  seed: Optional[int] = 0) -> Optional[dict[Session: datetime]]:
+    '''
+    :param previous_solution: the solution to repair, may miss variables or hold values no longer in their domains
+    :param max_steps: number of moves allowed before giving up
+    :return dict: a solution or None if the repair didn't succeed within max_steps
+    '''
+    generator = random.Random(seed)
+    if any(not csp.domains[variable] for variable in csp.variables):
+        return None
+
+    assignment = csp.make_assignment(carry_over(csp, previous_solution))
+    for variable in csp.variables:
+        if variable not in assignment:
+            assignment[variable] = min_conflict_value(csp, variable, assignment, generator)
+
+    # conflicted variables are tracked incrementally, a move only changes the status of the moved variable and its neighbours
+    position = {variable: index for index, variable in enumerate(csp.variables)}
+    conflicted = {variable for variable in csp.variables if not csp.consistent(variable, assignment)}
+    for _ in range(max_steps):
+        if not conflicted:
+            return dict(assignment)
+
+        variable = generator.choice(sorted(conflicted, key=position.__getitem__))
+        assignment[variable] = min_conflict_value(csp, variable, assignment, generator)
+
+        for affected in [variable, *csp.neighbours(variable)]:
+            if csp.consistent(affected, assignment):
+                conflicted.discard(affected)
+            else:
+                conflicted.add(affected)
+
+    return dict(assignment) if not conflicted else None
@@ -0,0 +1,118 @@
+'''
+Iterative search engine for the CSP
+
+Same search as CSP.backtracking_search (same heuristics, same inference, same solution)
+but without recursion and without copying the assignment on every node:
+- one mutable assignment dict (an IndexedAssignment), values are set and deleted in place
+- an explicit stack of frames, each holding the variable, the iterator over its remaining ordered values
+  and the trail of domain prunings done by the inference for the current value
+- the unassigned variables are kept incrementally in a list sorted by their position in csp.variables
+
+A search only stops between two solutions, interruptible(csp, check) stops it anywhere (deadlines, cancellation).
+'''
+from __future__ import annotations
+import copy
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Callable, Iterator, Optional, TYPE_CHECKING
+from personal_time_manager.sessions.base_session import Session
+from personal_time_manager.csp.inference import restore
+from personal_time_manager.csp.backjumping import backjumping_search
+
+if TYPE_CHECKING:
+    from personal_time_manager.csp.csp import CSP
+    from personal_time_manager.csp.stats import SolverStats
+
+
+class Frame:
+    '''
+    one level of the search stack
+    '''
+    __slots__ = ("variable", "values", "removals")
+
+    def __init__(self, variable: Session, values: Iterator[datetime]):
+        self.variable = variable
+        self.values = values
+        self.removals = [] # domain prunings done for the value currently assigned to variable
+
+
+def iterative_search(csp: CSP, assignment: Optional[dict[Session: datetime]] = None,
+                     bound: Optional[Callable] = None, stats: Optional[SolverStats] = None) -> Iterator[dict[Session: datetime]]:
+    '''
+    generator of the solutions extending the passed assignment, in the order the recursive search would find them
+    every yielded solution is a new dict, the search continues from where it stopped when the next one is asked for
+    :param bound: called with (assignment, domains) on every consistent node, returning False cuts the branch (branch and bound)
+    :param stats: SolverStats to count nodes, backtracks and depth in (the constraint counters come from stats.instrument)
+    with csp.backjumping the search is done by backjumping.backjumping_search instead
+    '''
+    if csp.backjumping:
+        yield from backjumping_search(csp, assignment, bound, stats)
+        return
+
+    assignment = csp.make_assignment(assignment)
+    domains = csp.initial_domains(assignment)
+    if domains is None:
+        return
+
+    position = {variable: index for index, variable in enumerate(csp.variables)}
+    unassigned = [variable for variable in csp.variables if variable not in assignment]
+
+    if not unassigned:
+        yield dict(assignment)
+        return
+
+    def push() -> None:
+        variable = csp.select_unassigned_variable(unassigned, assignment, domains)
+        del unassigned[bisect_left(unassigned, position[variable], key=position.__getitem__)]
+        stack.append(Frame(variable, iter(csp.order_domain_values(variable, assignment, domains))))
+
+    stack: list[Frame] = []
+    push()
+    while stack:
+        frame = stack[-1]
+        variable = frame.variable
+
+        # undo the previous value tried for this variable
+        if variable in assignment:
+            del assignment[variable]
+            restore(domains, frame.removals)
+
+        for value in frame.values:
+            assignment[variable] = value
+            if csp.consistent(variable, assignment):
+                if stats is not None:
+                    stats.nodes += 1
+                    stats.max_depth = max(stats.max_depth, len(stack))
+                if csp.infer(variable, assignment, domains, frame.removals) and \
+                   (bound is None or bound(assignment, domains)):
+                    break
+                restore(domains, frame.removals)
+            del assignment[variable]
+        else:
+            # every value failed, backtrack to the previous variable
+            stack.pop()
+            if stats is not None:
+                stats.backtracks += 1
+            insort(unassigned, variable, key=position.__getitem__)
+            continue
+
+        if unassigned:
+            push()
+        else:
+            yield dict(assignment)
+
+def interruptible(csp: CSP, check: Callable[[], None]) -> CSP:
+    '''
+    shallow copy of the csp calling check() before every consistency check, that is on every value tried
+    by the search and by the inference (forward checking, MAC), the failing ones included
+    check stops the search by raising, the exception goes through the search to its caller
+    '''
+    checked = copy.copy(csp)
+    consistent = csp.consistent
+
+    def checked_consistent(variable: Session, assignment: dict[Session: datetime]) -> bool:
+        check()
+        return consistent(variable, assignment)
+
+    checked.consistent = checked_consistent
+    return checked
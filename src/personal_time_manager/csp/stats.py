@@ -0,0 +1,54 @@
+'''
+Solver statistics
+
+Filled by the iterative search when asked for (CSP.solve(return_stats=True) or an on_progress callback),
+nothing here runs when statistics are not requested.
+dataclasses.asdict(stats) gives a plain dict ready to be logged.
+'''
+from __future__ import annotations
+import copy
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import TYPE_CHECKING
+from personal_time_manager.sessions.base_session import Session
+
+if TYPE_CHECKING:
+    from personal_time_manager.csp.csp import CSP
+
+
+@dataclass
+class SolverStats:
+    nodes: int = 0 # consistent assignments made (search tree nodes expanded)
+    backtracks: int = 0 # variables whose values all failed, sending the search back up
+    backjumps: int = 0 # levels skipped over by the backjumping search when going back up
+    nogoods: int = 0 # nogoods learned by the backjumping search
+    max_depth: int = 0 # largest number of variables assigned by the search at once
+    constraint_checks: dict[str: int] = field(default_factory=dict) # calls to satisfied per constraint class
+    constraint_seconds: dict[str: float] = field(default_factory=dict) # time spent in satisfied per constraint class
+    elapsed_seconds: float = 0.0
+    solved: bool = False
+
+
+def instrument(csp: CSP, stats: SolverStats) -> CSP:
+    '''
+    shallow copy of the csp whose consistent method counts and times every call to satisfied per constraint class
+    the copy is what gets searched, the csp itself stays uninstrumented
+    '''
+    instrumented = copy.copy(csp)
+    checks = stats.constraint_checks
+    seconds = stats.constraint_seconds
+
+    def consistent(variable: Session, assignment: dict[Session: datetime]) -> bool:
+        for constraint in csp.watching(variable):
+            name = type(constraint).__name__
+            start = time.perf_counter()
+            satisfied = constraint.satisfied_by(variable, assignment)
+            seconds[name] = seconds.get(name, 0.0) + time.perf_counter() - start
+            checks[name] = checks.get(name, 0) + 1
+            if not satisfied:
+                return False
+        return True
+
+    instrumented.consistent = consistent
+    return instrumented
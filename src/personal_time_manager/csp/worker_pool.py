@@ -0,0 +1,95 @@
+'''
+Process pool of the parallel searches (portfolio.py, decompose.py)
+
+The caller usually has its answer before every task is done (the first solution of the portfolio,
+a component without solution) and the searches still running are then pointless.
+A ProcessPoolExecutor can't stop a running task through its api, a multiprocessing.Pool can (Pool.terminate):
+- the workers get a shared stop event, the tasks pass check_stop to their search (search.interruptible)
+  so they raise Stopped on the next value they try once the caller stopped the pool
+- a worker still busy STOP_GRACE seconds later (the search between two values for that long) is terminated with the pool
+'''
+from __future__ import annotations
+import multiprocessing
+import queue
+import time
+from multiprocessing.pool import AsyncResult
+from typing import Callable, Iterator
+
+STOP_GRACE = 1.0 # seconds the tasks still running get to stop on their own before the pool is terminated
+
+
+class Stopped(Exception):
+    '''
+    raised from inside a task's search once the caller stopped the pool
+    '''
+
+
+### Worker side
+_stop_event = None
+
+def _init_worker(stop_event) -> None:
+    global _stop_event
+    _stop_event = stop_event
+
+def check_stop() -> None:
+    '''
+    raises Stopped once the pool of this worker is stopped, the check given to search.interruptible by the tasks
+    '''
+    if _stop_event is not None and _stop_event.is_set():
+        raise Stopped()
+
+
+### Caller side
+def context():
+    # forkserver children don't inherit the threads of the caller (flask, the pool of a previous call ...)
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+class WorkerPool:
+    '''
+    used as a context manager, leaving it stops the tasks still running:
+        with WorkerPool(4) as pool:
+            for index, result in pool.as_completed(function, tasks):
+                ...
+    '''
+    def __init__(self, processes: int, grace: float = STOP_GRACE):
+        method_context = context()
+        self.grace = grace
+        self._stop_event = method_context.Event()
+        self._pool = method_context.Pool(processes, initializer=_init_worker, initargs=(self._stop_event,))
+        self._pending: list[AsyncResult] = []
+
+    def as_completed(self, function: Callable, tasks: list[tuple]) -> Iterator[tuple[int, object]]:
+        '''
+        runs function(*task) for every task in the workers
+        :return iterator: (index of the task, its result) in the order the tasks complete, the exception of a failed task is raised
+        '''
+        done = queue.SimpleQueue()
+        for index, task in enumerate(tasks):
+            self._pending.append(self._pool.apply_async(
+                function, task, callback=lambda result, index=index: done.put((index, result, None)),
+                error_callback=lambda error, index=index: done.put((index, None, error))))
+
+        for _ in tasks:
+            index, result, error = done.get()
+            if error is not None:
+                raise error
+            yield index, result
+
+    def stop(self) -> None:
+        '''
+        asks the tasks still running to stop, terminates the workers once they did or after the grace
+        '''
+        self._stop_event.set()
+        deadline = time.monotonic() + self.grace
+        for result in self._pending:
+            result.wait(max(0.0, deadline - time.monotonic()))
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self) -> WorkerPool:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
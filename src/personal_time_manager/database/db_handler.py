@@ -192,3 +192,25 @@ class DatabaseHandler:
                     user['students'] = students_by_user.get(user_id_str, [])
                 
                 return users
+
+    def get_cached_solution(self, fingerprint):
+        """Fetches the cached CSP solution entry of a problem fingerprint (see csp/cache.py)."""
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("SELECT solution FROM solution_cache WHERE fingerprint = %s;", (fingerprint,))
+                row = cur.fetchone()
+                return row['solution'] if row else None
+
+    def save_cached_solution(self, fingerprint, solution):
+        """Saves the CSP solution entry of a problem fingerprint, an existing entry is replaced."""
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    INSERT INTO solution_cache (fingerprint, solution)
+                    VALUES (%s, %s)
+                    ON CONFLICT (fingerprint) DO UPDATE SET solution = EXCLUDED.solution, created_at = NOW();
+                    """,
+                    (fingerprint, json.dumps(solution))
+                )
+                conn.commit()
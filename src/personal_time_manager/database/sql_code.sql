@@ -4,6 +4,7 @@ Here is the SQL code I used so far to create the tables:
   - Students:
   - Timetables:
   - Tuitions:
+  - Solution cache:
 */
 
 -- Create a table to store user accounts
@@ -21,3 +22,9 @@ CREATE TABLE students (
     student_data JSONB NOT NULL
 );
 
+-- Create a table to store the solutions of already solved timetable problems (see csp/cache.py)
+CREATE TABLE solution_cache (
+    fingerprint CHAR(64) PRIMARY KEY,
+    solution JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
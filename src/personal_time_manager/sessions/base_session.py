@@ -4,8 +4,9 @@ This script defines the "variables" in the CSP framework which is time 'sessions
 '''
 from __future__ import annotations
 from abc import ABC, abstractmethod
-from typing import TypeAlias
+from typing import Hashable, TypeAlias
 from datetime import datetime, timedelta
+from personal_time_manager.sessions.minute_domain import MinuteDomain
 
 class SessionDescriptor(ABC):
     """
@@ -23,7 +24,10 @@ class Session:
     """
     Represents a schedulable session with duration and overlap rules.
     Durations are stored and manipulated as `timedelta` objects.
+    No per instance __dict__, a whole tutoring centre is a lot of sessions (see session_table.py for a compact table of them).
     """
+    __slots__ = ("session_descriptor", "base_duration", "domain_values", "allowed_to_overlap_session")
+
     def __init__(
          self, 
          session_descriptor: SessionDescriptor, 
@@ -34,38 +38,42 @@ class Session:
         self.session_descriptor = session_descriptor
         self.base_duration = base_duration
         self.domain_values = domain_values
-        self.allowed_to_overlap_session = allowed_to_overlap_session or []
-        self.overlapped_sessions: list[Session] = []
-        allowed_to_overlap_session: list[Session] = []
+        self.allowed_to_overlap_session: list[Session] = allowed_to_overlap_session or []
 
-    def add_overlap(self, overlapped_session: Session) -> None:
-        """
-        Registers an allowed overlapping session.
-        """
-        self.overlapped_sessions.append(overlapped_session)
+    def __setstate__(self, state) -> None:
+        # (None, slots) from pickle, pkl files made before __slots__ hold the plain __dict__,
+        # with attributes Session no longer has (overlapped_sessions) which are dropped
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **state[1]}
+        for name, value in state.items():
+            if name in Session.__slots__:
+                setattr(self, name, value)
 
-    def reset_overlap(self) -> None:
+    @property
+    def duration(self) -> timedelta:
         """
-        Clears all tracked overlaps.
+        Duration of the session on its own.
+        Sessions are not modified while solving, the duration extended by the sessions overlapping it
+        depends on the assignment, see NoTimeOverlapConstraint.duration.
         """
-        self.overlapped_sessions.clear()
+        return self.base_duration
 
     @property
-    def duration(self) -> timedelta:
+    def max_duration(self) -> timedelta:
         """
-        Total duration (base + overlapped sessions).
+        Upper bound of the duration, reached if every allowed_to_overlap_session ends up overlapped.
         """
+        return self._max_duration(set())
+
+    def _max_duration(self, visited: set[int]) -> timedelta:
+        visited.add(id(self))
         duration = self.base_duration
-        for overlapped_session in self.overlapped_sessions:
-            duration += overlapped_session.duration
+        for session in self.allowed_to_overlap_session:
+            if id(session) not in visited:
+                duration += session._max_duration(visited)
 
         return duration
 
-
-        # return self.base_duration + sum(
-        #     session.duration for session in self.overlapped_sessions
-        # )
-
     def __repr__(self) -> str:
         return f"Session(name={self.session_descriptor.name}, duration={self.duration})"
 
@@ -81,11 +89,44 @@ class SessionGroup(ABC):
     Abstract base class for a group of related sessions.
     """
     WEEK_START_DAY = 5 # saturday
+    LOAD_TIMEOUT: float = 30.0 # seconds the group may take to load its sessions, see loading.py
+
     def __init__(self, week_start_date: datetime):
         if week_start_date.weekday() != self.WEEK_START_DAY:
             raise ValueError("week_start_date must be a Saturday!")
         self.week_start_date: datetime = week_start_date
 
+    @classmethod
+    def week_start_of(cls, moment: datetime) -> datetime:
+        """
+        midnight of the Saturday starting the week the moment is in
+        """
+        day = datetime.combine(moment.date(), datetime.min.time())
+        return day - timedelta(days=(day.weekday() - cls.WEEK_START_DAY) % 7)
+
+    def load(self) -> SessionGroup:
+        """
+        does the slow part of building the sessions (network, disk) when the constructor doesn't, returns self
+        after it csp_variables and csp_domains do no I/O. Called from a worker thread by loading.load_session_groups
+        """
+        return self
+
+    @property
+    def version(self) -> Hashable:
+        """
+        equal for two loads of the week giving the same sessions, what is built from them (planner.WeekCache) is then still valid
+        by default the content of the sessions, a group knowing its changes gives a cheaper token (GoogleCalendar)
+        """
+        return tuple((session.session_descriptor.name, session.base_duration, tuple(session.domain_values),
+                      tuple(other.session_descriptor.name for other in session.allowed_to_overlap_session))
+                     for session in self.csp_variables)
+
+    def minute_domain(self, values: list[datetime]) -> MinuteDomain:
+        """
+        compact domain of the start times, stored as minutes from week_start_date (see minute_domain.py)
+        """
+        return MinuteDomain.from_values(self.week_start_date, values)
+
     @abstractmethod
     def csp_variables(self) -> list[Session]:
         pass
@@ -1,3 +1,267 @@
 '''
+The meetings of a Google Calendar as fixed sessions
 
+External meetings are the biggest source of fixed blocks of the timetable. Asking the calendar for every event
+each time a week is built would fetch the same events again and again, so the events are synced incrementally into a local store:
+- the first sync lists every event (page by page) and keeps the nextSyncToken the api gives at the end
+- every later sync sends that token and only gets the events created, changed or deleted since (usually none)
+- a token the api no longer accepts (410 Gone) starts a full sync again
+https://developers.google.com/calendar/api/guides/sync
+
+Only the changed events get a new Session, the others keep theirs, so a week with no changed event gives back
+the same Session objects. Every week has a version, moved on when its sessions change: GoogleCalendar.version
+is compared by whoever built something from the week (planner.WeekCache) to know if it is still valid,
+nothing is consumed by reading it so every caller gets the same answer.
+Events marked free (transparent) and all day events (holidays, birthdays ...) don't block time and are left out.
 '''
+from __future__ import annotations
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo
+import requests
+from personal_time_manager.sessions.base_session import Session, SessionDescriptor, SessionGroup
+from personal_time_manager.sessions.minute_domain import MinuteDomain
+
+
+@dataclass(frozen=True)
+class CalendarEvent(SessionDescriptor):
+    event_id: str
+    summary: str
+
+    @property
+    def name(self):
+        return f"MEETING({self.summary})"
+
+
+class SyncTokenExpired(Exception):
+    '''
+    the api answered 410 Gone to a sync token, everything has to be listed again
+    '''
+
+
+class GoogleCalendarClient:
+    '''
+    the events.list endpoint of the Calendar api v3, through a pooled http session
+    '''
+    BASE_URL = "https://www.googleapis.com/calendar/v3"
+    REQUEST_TIMEOUT = 10 # seconds
+
+    def __init__(self, calendar_id: str, access_token: Optional[str] = None, base_url: str = BASE_URL,
+                 session: Optional[requests.Session] = None):
+        '''
+        :param base_url: the api root, a local stand-in server in the tests
+        '''
+        self.calendar_id = calendar_id
+        self.base_url = base_url.rstrip("/")
+        self.session = session if session is not None else requests.Session()
+        if access_token:
+            self.session.headers["Authorization"] = f"Bearer {access_token}"
+        self.requests_made = 0
+
+    def list_events(self, sync_token: Optional[str] = None) -> tuple[list[dict], str]:
+        '''
+        :param sync_token: the token of the last sync, None lists every event
+        :return tuple: (the events, changed ones only with a sync token, the token of the next sync)
+        '''
+        url = f"{self.base_url}/calendars/{requests.utils.quote(self.calendar_id, safe='')}/events"
+        params = {"singleEvents": "true", "showDeleted": "true", "maxResults": 250}
+        if sync_token is not None:
+            params["syncToken"] = sync_token
+
+        events = []
+        while True:
+            try:
+                self.requests_made += 1
+                response = self.session.get(url, params=params, timeout=self.REQUEST_TIMEOUT)
+                if response.status_code == 410:
+                    raise SyncTokenExpired()
+                response.raise_for_status()
+                data: dict = response.json()
+            except (requests.RequestException, json.JSONDecodeError) as e:
+                raise ValueError(f"Failed to sync the calendar: {e}")
+
+            events.extend(data.get("items", []))
+            if "nextPageToken" in data:
+                params["pageToken"] = data["nextPageToken"]
+            elif "nextSyncToken" in data:
+                return events, data["nextSyncToken"]
+            else:
+                raise ValueError("Failed to sync the calendar: the last page has no nextSyncToken")
+
+
+class EventStore:
+    '''
+    the events of the calendar as last synced {event id: event} and the token of the next sync,
+    kept in a json file when a path is given so a restart doesn't list everything again
+    '''
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.events: dict[str: dict] = {}
+        self.sync_token: Optional[str] = None
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path) as store_file:
+                    stored = json.load(store_file)
+                self.events, self.sync_token = stored["events"], stored["sync_token"]
+            except (OSError, ValueError, KeyError) as e:
+                print(f"!!! CALENDAR STORE UNREADABLE, SYNCING EVERYTHING AGAIN: {e} !!!")
+
+    def clear(self) -> None:
+        self.events.clear()
+        self.sync_token = None
+
+    def apply(self, events: list[dict], sync_token: str) -> set[str]:
+        '''
+        :return set: ids of the events added, changed or deleted
+        '''
+        changed = set()
+        for event in events:
+            if event.get("status") == "cancelled":
+                if self.events.pop(event["id"], None) is not None:
+                    changed.add(event["id"])
+            elif self.events.get(event["id"]) != event:
+                self.events[event["id"]] = event
+                changed.add(event["id"])
+        self.sync_token = sync_token
+        self.save()
+        return changed
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        try:
+            with open(f"{self.path}.tmp", "w") as store_file:
+                json.dump({"events": self.events, "sync_token": self.sync_token}, store_file)
+            os.replace(f"{self.path}.tmp", self.path)
+        except OSError as e:
+            print(f"!!! CALENDAR STORE WRITE FAILED: {e} !!!")
+
+
+class CalendarSync:
+    '''
+    keeps an EventStore up to date with the calendar and a Session per busy event
+    '''
+    def __init__(self, client: GoogleCalendarClient, store: Optional[EventStore] = None,
+                 timezone: str = "Africa/Cairo", min_interval: float = 0.0):
+        '''
+        :param timezone: the local time of the timetable, event times are converted to it
+        :param min_interval: seconds during which the last sync is trusted without asking the api
+        '''
+        self.client = client
+        self.store = store if store is not None else EventStore()
+        self.timezone = ZoneInfo(timezone)
+        self.min_interval = min_interval
+        self._sessions: dict[str: Optional[Session]] = {} # None for the events that block no time
+        self._given: dict[datetime: tuple[Session, ...]] = {} # the Sessions last given for every week
+        self._versions: dict[datetime: int] = {} # moved on every time the Sessions of the week change
+        self._last_sync: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def sync(self) -> set[str]:
+        '''
+        :return set: ids of the events changed since the last sync
+        '''
+        with self._lock:
+            if self._last_sync is not None and time.monotonic() - self._last_sync < self.min_interval:
+                return set()
+            try:
+                changed = self.store.apply(*self.client.list_events(self.store.sync_token))
+            except SyncTokenExpired:
+                previous = set(self.store.events)
+                self.store.clear()
+                changed = self.store.apply(*self.client.list_events()) | previous
+            for event_id in changed:
+                self._sessions.pop(event_id, None)
+            self._last_sync = time.monotonic()
+            return changed
+
+    def week_sessions(self, week_start: datetime) -> tuple[list[Session], int]:
+        '''
+        :return tuple: (Sessions of the busy events starting in the week ordered by start,
+                        version of the week, the same as long as these Sessions are)
+        '''
+        week_end = week_start + timedelta(days=7)
+        with self._lock:
+            found = []
+            for event_id, event in self.store.events.items():
+                if event_id not in self._sessions:
+                    self._sessions[event_id] = self._to_session(event)
+                session = self._sessions[event_id]
+                if session is not None and week_start <= session.domain_values[0] < week_end:
+                    found.append(session)
+            found.sort(key=lambda session: session.domain_values[0])
+
+            # a changed event has a new Session, comparing the objects (Sessions are only equal to themselves)
+            # finds additions, changes and deletions
+            given = tuple(found)
+            if self._given.get(week_start) != given:
+                self._given[week_start] = given
+                self._versions[week_start] = self._versions.get(week_start, -1) + 1
+            return found, self._versions[week_start]
+
+    def _local(self, moment: str) -> datetime:
+        return datetime.fromisoformat(moment).astimezone(self.timezone).replace(tzinfo=None, second=0, microsecond=0)
+
+    def _to_session(self, event: dict) -> Optional[Session]:
+        if event.get("transparency") == "transparent" or "dateTime" not in event.get("start", {}):
+            return None
+        start, end = self._local(event["start"]["dateTime"]), self._local(event["end"]["dateTime"])
+        if end <= start:
+            return None
+        descriptor = CalendarEvent(event["id"], event.get("summary", ""))
+        return Session(descriptor, end - start, MinuteDomain.from_values(SessionGroup.week_start_of(start), [start]))
+
+
+def _default_sync() -> Optional[CalendarSync]:
+    calendar_id = os.environ.get("GOOGLE_CALENDAR_ID")
+    if not calendar_id:
+        return None
+    client = GoogleCalendarClient(calendar_id, os.environ.get("GOOGLE_CALENDAR_TOKEN"))
+    return CalendarSync(client, EventStore(os.environ.get("GOOGLE_CALENDAR_STORE")), min_interval=60)
+
+
+class GoogleCalendar(SessionGroup):
+    # shared by all the weeks, configured from GOOGLE_CALENDAR_ID, GOOGLE_CALENDAR_TOKEN and GOOGLE_CALENDAR_STORE
+    # (None when no calendar is configured, the group then has no sessions)
+    SYNC: Optional[CalendarSync] = _default_sync()
+
+    def __init__(self, week_start_date: datetime, sync: Optional[CalendarSync] = None):
+        '''
+        :param sync: the calendar to read, GoogleCalendar.SYNC by default
+        '''
+        super().__init__(week_start_date)
+        self.sync = sync if sync is not None else self.SYNC
+        self._version: Optional[int] = None # of the week in the sync, see CalendarSync.week_sessions
+        self._csp_variables: Optional[list[Session]] = None
+
+    def load(self) -> GoogleCalendar:
+        if self.sync is None:
+            self._csp_variables, self._version = [], 0
+            return self
+        self.sync.sync()
+        self._csp_variables, self._version = self.sync.week_sessions(self.week_start_date)
+        return self
+
+    @property
+    def version(self) -> int:
+        '''
+        the version of the week when it was loaded, a later load gives the same one if no session of the week changed
+        '''
+        if self._version is None:
+            self.load()
+        return self._version
+
+    @property
+    def csp_variables(self) -> list[Session]:
+        if self._csp_variables is None:
+            self.load()
+        return self._csp_variables
+
+    @property
+    def csp_domains(self) -> dict[Session: list[datetime]]:
+        return {session: session.domain_values for session in self.csp_variables}
@@ -0,0 +1,56 @@
+'''
+Loading the sessions of a week from all the input sources at once
+
+Every SessionGroup is an input source (Prayers asks the prayer times api, Tuitions reads its file ...)
+and building a week used to load them one after the other, waiting for the sum of their latencies.
+Here each source is built and loaded (SessionGroup.load) in its own thread, the sources being I/O bound,
+so a week waits for the slowest source only.
+
+Every source has a timeout (SessionGroup.LOAD_TIMEOUT by default) counted from the start of the loading,
+a source that is late raises TimeoutError: a week missing one of its sources would give a wrong timetable.
+A late thread can't be killed, it is left to finish in the background and its result is dropped.
+'''
+from __future__ import annotations
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+from typing import Optional
+from personal_time_manager.sessions.base_session import Session, SessionGroup
+
+
+def _load(session_group: type[SessionGroup], week_start: datetime) -> SessionGroup:
+    return session_group(week_start).load()
+
+def load_session_groups(week_start: datetime, session_groups: tuple[type[SessionGroup], ...],
+                        timeouts: Optional[dict[type[SessionGroup]: float]] = None) -> list[SessionGroup]:
+    '''
+    :param timeouts: seconds each source may take, the LOAD_TIMEOUT of the source when not given
+    :return list: the loaded groups, in the order of session_groups
+    '''
+    timeouts = timeouts or {}
+    executor = ThreadPoolExecutor(max_workers=max(1, len(session_groups)), thread_name_prefix="session-group")
+    start = time.perf_counter()
+    try:
+        futures = [executor.submit(_load, session_group, week_start) for session_group in session_groups]
+        loaded = []
+        for session_group, future in zip(session_groups, futures):
+            timeout = timeouts.get(session_group, session_group.LOAD_TIMEOUT)
+            try:
+                loaded.append(future.result(timeout=max(0.0, start + timeout - time.perf_counter())))
+            except FutureTimeout:
+                raise TimeoutError(f"{session_group.__name__} took more than {timeout} seconds to load")
+        return loaded
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def load_week(week_start: datetime, session_groups: tuple[type[SessionGroup], ...],
+              timeouts: Optional[dict[type[SessionGroup]: float]] = None) -> tuple[list[Session], dict[Session: list[datetime]]]:
+    '''
+    :return tuple: (variables, domains) of the week, from all the sources loaded concurrently
+    '''
+    variables: list[Session] = []
+    domains: dict[Session: list[datetime]] = {}
+    for session_group in load_session_groups(week_start, session_groups, timeouts):
+        variables.extend(session_group.csp_variables)
+        domains.update(session_group.csp_domains)
+    return variables, domains
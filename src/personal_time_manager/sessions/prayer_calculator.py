@@ -0,0 +1,140 @@
+'''
+Offline prayer times (optional, needs numpy)
+
+The athan times are only a function of the position of the sun, so they can be computed locally
+instead of asking api.aladhan.com: no network latency and weeks can be built when the api is slow or down.
+The computation is the one of the api (the PrayTimes.org algorithm):
+- declination of the sun and equation of time from the low precision solar coordinates of the Astronomical Almanac
+- Dhuhr at the sun's transit, Fajr and Isha when the sun is the angle of the calculation method below the horizon,
+  sunrise/Maghrib at 0.833 degrees below it (refraction and the sun's radius), Asr when a shadow is its length (standard school)
+  plus its noon shadow
+- one refinement of each time from the sun's position at its first guess, results rounded to the minute
+
+Every step works on numpy arrays of days so a whole year is computed in one batch,
+AstronomicalProvider answers timings(day) like AladhanCalendarProvider from the year of the day, computed once.
+
+Only checked against the api on the recorded day of the tests (a summer day, 2025-07-11, within a minute).
+Winter days and the days around the daylight saving time changes have no recorded answer to compare with,
+so it is not a validated replacement of the api: use it for offline runs (tests, benchmarks, the api being down),
+not in place of the api for real timetables until it is checked on those days.
+'''
+from __future__ import annotations
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+from personal_time_manager.sessions.prayer_times import PRAYER_NAMES, PrayerTimesProvider
+
+try:
+    import numpy as np
+except ImportError: # optional dependency
+    np = None
+
+# twilight angles of the calculation methods, by the index the api uses (https://api.aladhan.com/v1/methods)
+METHOD_ANGLES: dict[int: tuple[float, float]] = {
+    1: (18.0, 18.0), # University of Islamic Sciences, Karachi
+    2: (15.0, 15.0), # Islamic Society of North America (ISNA)
+    3: (18.0, 17.0), # Muslim World League
+    5: (19.5, 17.5), # Egyptian General Authority of Survey
+}
+RISE_SET_ANGLE = 0.833
+ASR_SHADOW_FACTOR = 1 # standard school, 2 for hanafi
+
+# first guesses of the times, in hours, refined once (like the api)
+FIRST_GUESS = {"Fajr": 5, "Dhuhr": 12, "Asr": 13, "Maghrib": 18, "Isha": 18}
+
+
+def _sin(degrees): return np.sin(np.radians(degrees))
+def _cos(degrees): return np.cos(np.radians(degrees))
+def _tan(degrees): return np.tan(np.radians(degrees))
+def _arcsin(x): return np.degrees(np.arcsin(x))
+def _arccos(x): return np.degrees(np.arccos(x))
+def _arctan2(y, x): return np.degrees(np.arctan2(y, x))
+
+def sun_position(julian_day: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    :return tuple: (declination in degrees, equation of time in hours) of the sun
+    '''
+    days = julian_day - 2451545.0
+    mean_anomaly = (357.529 + 0.98560028 * days) % 360
+    mean_longitude = (280.459 + 0.98564736 * days) % 360
+    longitude = (mean_longitude + 1.915 * _sin(mean_anomaly) + 0.020 * _sin(2 * mean_anomaly)) % 360
+    obliquity = 23.439 - 0.00000036 * days
+
+    right_ascension = (_arctan2(_cos(obliquity) * _sin(longitude), _cos(longitude)) / 15) % 24
+    equation_of_time = mean_longitude / 15 - right_ascension
+    declination = _arcsin(_sin(obliquity) * _sin(longitude))
+    return declination, equation_of_time
+
+def prayer_minutes(days: list[date], latitude: float, longitude: float, utc_offsets: np.ndarray,
+                   method: int = 2) -> dict[str: np.ndarray]:
+    '''
+    :param utc_offsets: hours from UTC of the local time of every day
+    :return dict: {prayer name: minutes from local midnight of every day}
+    '''
+    fajr_angle, isha_angle = METHOD_ANGLES[method]
+
+    # julian day of every midnight (UT), moved to the local solar time of the longitude
+    julian_day = np.array([day.toordinal() for day in days], dtype=np.float64) + 1721424.5 - longitude / (15 * 24)
+
+    def transit(hours: float) -> np.ndarray:
+        _, equation_of_time = sun_position(julian_day + hours / 24)
+        return (12 - equation_of_time) % 24
+
+    def sun_angle_time(angle, hours: float, before_transit: bool) -> np.ndarray:
+        declination, _ = sun_position(julian_day + hours / 24)
+        half_arc = _arccos((-_sin(angle) - _sin(declination) * _sin(latitude)) / (_cos(declination) * _cos(latitude))) / 15
+        return transit(hours) + (-half_arc if before_transit else half_arc)
+
+    def asr(hours: float) -> np.ndarray:
+        declination, _ = sun_position(julian_day + hours / 24)
+        angle = -np.degrees(np.arctan(1 / (ASR_SHADOW_FACTOR + _tan(np.abs(latitude - declination)))))
+        return sun_angle_time(angle, hours, before_transit=False)
+
+    solar = {
+        "Fajr": sun_angle_time(fajr_angle, FIRST_GUESS["Fajr"], before_transit=True),
+        "Dhuhr": transit(FIRST_GUESS["Dhuhr"]),
+        "Asr": asr(FIRST_GUESS["Asr"]),
+        "Maghrib": sun_angle_time(RISE_SET_ANGLE, FIRST_GUESS["Maghrib"], before_transit=False),
+        "Isha": sun_angle_time(isha_angle, FIRST_GUESS["Isha"], before_transit=False),
+    }
+    local = {name: hours + utc_offsets - longitude / 15 for name, hours in solar.items()}
+    return {name: np.floor(hours * 60 + 0.5).astype(np.int64) for name, hours in local.items()}
+
+
+class AstronomicalProvider(PrayerTimesProvider):
+    '''
+    prayer times computed locally a year at a time, no network
+    only compared with the api on a summer day so far, see the module docstring
+    '''
+    def __init__(self, latitude: float, longitude: float, method: int = 2, timezone: str = "Africa/Cairo"):
+        '''
+        :param method: index of the calculation method like the api's, see METHOD_ANGLES
+        :param timezone: IANA name of the local time, daylight saving time included
+        '''
+        if np is None:
+            raise ImportError("the prayer calculator needs numpy, install it with `pip install numpy`")
+        if method not in METHOD_ANGLES:
+            raise ValueError(f"Unknown calculation method {method}, choose from {list(METHOD_ANGLES)}")
+        self.latitude = latitude
+        self.longitude = longitude
+        self.method = method
+        self.timezone = ZoneInfo(timezone)
+        self._years: dict[int: dict[str: np.ndarray]] = {}
+
+    def year_minutes(self, year: int) -> dict[str: np.ndarray]:
+        '''
+        :return dict: {prayer name: minutes from midnight of every day of the year}, computed on the first call
+        '''
+        minutes = self._years.get(year)
+        if minutes is None:
+            first = date(year, 1, 1)
+            days = [first + timedelta(days=offset) for offset in range((date(year + 1, 1, 1) - first).days)]
+            utc_offsets = np.array([self.timezone.utcoffset(datetime.combine(day, time(12))) / timedelta(hours=1)
+                                    for day in days])
+            minutes = prayer_minutes(days, self.latitude, self.longitude, utc_offsets, self.method)
+            self._years[year] = minutes
+        return minutes
+
+    def timings(self, day: date) -> dict[str: time]:
+        minutes = self.year_minutes(day.year)
+        index = day.timetuple().tm_yday - 1
+        return {name: time(*divmod(int(minutes[name][index]), 60)) for name in PRAYER_NAMES}
@@ -0,0 +1,149 @@
+'''
+Where Prayers gets the athan times from
+
+One answer of the aladhan timings endpoint holds the five prayers of a day, asking it once per prayer meant
+35 blocking round trips (each returning the same day 5 times) to build one week.
+AladhanCalendarProvider asks the calendar endpoint instead: one request gives every day of a month,
+so a week is one request (two when it spans two months) and a whole term a handful.
+
+The months fetched are kept in memory and on disk (one json file per month), keyed by the month, the coordinates
+and the calculation method, and fetched again once older than the ttl.
+If the api can't be reached an expired month is still used rather than failing.
+
+A provider only has to answer timings(day) -> {"Fajr": time, "Dhuhr": time, "Asr": time, "Maghrib": time, "Isha": time},
+AstronomicalProvider (prayer_calculator.py) computes them offline, for offline runs (not yet validated against the api
+on winter days and around the daylight saving time changes).
+'''
+import json
+import os
+import threading
+import time as clock
+from abc import ABC, abstractmethod
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+import requests
+
+PRAYER_NAMES = ("Fajr", "Dhuhr", "Asr", "Maghrib", "Isha") # the names used by the api
+
+DEFAULT_CACHE_DIR = os.environ.get("PRAYER_TIMES_CACHE_DIR",
+                                   os.path.join(os.path.expanduser("~"), ".cache", "personal_time_manager", "prayer_times"))
+
+
+class PrayerTimesProvider(ABC):
+    @abstractmethod
+    def timings(self, day: date) -> dict[str: time]:
+        '''
+        :return dict: {prayer name: athan time} of the day
+        '''
+        pass
+
+
+class AladhanCalendarProvider(PrayerTimesProvider):
+    '''
+    prayer times of a whole month per request from api.aladhan.com, cached in memory and on disk
+    '''
+    BASE_URL = "http://api.aladhan.com/v1/calendar"
+    REQUEST_TIMEOUT = 10 # seconds
+
+    def __init__(self, latitude: float, longitude: float, method: int, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 ttl: timedelta = timedelta(days=30), session: Optional[requests.Session] = None):
+        '''
+        :param cache_dir: directory of the month files, None to only cache in memory
+        :param ttl: age after which a cached month is fetched again
+        :param session: http session the requests go through (pooled connections), a new requests.Session by default
+        '''
+        self.latitude = latitude
+        self.longitude = longitude
+        self.method = method
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.session = session if session is not None else requests.Session()
+        self.requests_made = 0
+        self._months: dict[tuple: tuple[float, dict[str: dict[str: str]]]] = {} # key: (fetched_at, {DD-MM-YYYY: timings})
+        self._lock = threading.Lock() # the same month is fetched once when several weeks are built at the same time
+
+    def timings(self, day: date) -> dict[str: time]:
+        day_timings = self._month(day.year, day.month).get(day.strftime("%d-%m-%Y"))
+        if day_timings is None:
+            raise ValueError(f"Failed to get prayer time: no timings for {day}")
+        return {name: _parse_time(day_timings[name]) for name in PRAYER_NAMES}
+
+    def _key(self, year: int, month: int) -> tuple:
+        return (round(self.latitude, 6), round(self.longitude, 6), self.method, year, month)
+
+    def _path(self, key: tuple) -> str:
+        latitude, longitude, method, year, month = key
+        return os.path.join(self.cache_dir, f"{latitude}_{longitude}_method{method}_{year}-{month:02d}.json")
+
+    def _fresh(self, fetched_at: float) -> bool:
+        return clock.time() - fetched_at < self.ttl.total_seconds()
+
+    def _month(self, year: int, month: int) -> dict[str: dict[str: str]]:
+        key = self._key(year, month)
+        with self._lock:
+            cached = self._months.get(key) or self._read(key)
+            if cached is not None and self._fresh(cached[0]):
+                self._months[key] = cached
+                return cached[1]
+
+            try:
+                days = self._fetch(year, month)
+            except ValueError as e:
+                if cached is None:
+                    raise
+                print(f"!!! PRAYER TIMES REFRESH FAILED, USING THE EXPIRED ONES: {e} !!!")
+                return cached[1]
+
+            self._months[key] = (clock.time(), days)
+            self._write(key, self._months[key])
+            return days
+
+    def _fetch(self, year: int, month: int) -> dict[str: dict[str: str]]:
+        params = {"latitude": self.latitude, "longitude": self.longitude, "method": self.method}
+        try:
+            self.requests_made += 1
+            response = self.session.get(f"{self.BASE_URL}/{year}/{month}", params=params, timeout=self.REQUEST_TIMEOUT)
+            response.raise_for_status()
+            data: dict = response.json()
+
+            if data["code"] != 200 or "data" not in data:
+                raise ValueError("Invalid response from server")
+
+            return {day["date"]["gregorian"]["date"]: {name: day["timings"][name] for name in PRAYER_NAMES}
+                    for day in data["data"]}
+
+        except (requests.RequestException, json.JSONDecodeError, KeyError, TypeError) as e:
+            raise ValueError(f"Failed to get prayer time: {e}")
+
+    def _read(self, key: tuple) -> Optional[tuple[float, dict]]:
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._path(key)) as cache_file:
+                cached = json.load(cache_file)
+            return cached["fetched_at"], cached["days"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write(self, key: tuple, month: tuple[float, dict]) -> None:
+        '''
+        a failing disk never fails the loading, the month is just fetched again next time
+        '''
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(f"{path}.tmp", "w") as cache_file:
+                json.dump({"fetched_at": month[0], "days": month[1]}, cache_file)
+            os.replace(f"{path}.tmp", path) # readers never see a half written file
+        except OSError as e:
+            print(f"!!! PRAYER TIMES CACHE WRITE FAILED: {e} !!!")
+
+
+def _parse_time(value: str) -> time:
+    '''
+    "04:46 (EET)" as the calendar endpoint gives it, or "04:46"
+    '''
+    hour, minute = map(int, value.split()[0].split(":"))
+    return time(hour, minute)
@@ -1,12 +1,14 @@
 '''
 This is the script that gets the latest prayer times
 '''
-import json
-import requests
+import os
 from enum import Enum, auto
 from dataclasses import dataclass
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta
+from typing import Optional
 from personal_time_manager.sessions.base_session import Session, SessionGroup, SessionDescriptor
+from personal_time_manager.sessions.prayer_times import AladhanCalendarProvider, PrayerTimesProvider
+from personal_time_manager.sessions.prayer_calculator import AstronomicalProvider
 
 class PrayerType(Enum):
     FAJR = auto()
@@ -51,12 +53,23 @@ class Prayers(SessionGroup):
 
     LATITUDE = 29.954090 
     LONGITUDE = 31.067551
+    TIMEZONE = "Africa/Cairo"
  
-    BASE_URL = "http://api.aladhan.com/v1/timings"
     PRAYER_CALC_METHOD = 2 # https://api.aladhan.com/v1/methods shows the index for each method
 
-    def __init__(self, week_start_date: datetime):
+    # shared by all the weeks so a month is only fetched (or a year computed) once, see prayer_times.py
+    # PRAYER_TIMES_PROVIDER=offline computes the times locally (prayer_calculator.py) instead of asking the api,
+    # for offline runs only: it was only compared with the api on a summer day (no winter or daylight saving time change day)
+    PROVIDER: PrayerTimesProvider = (AstronomicalProvider(LATITUDE, LONGITUDE, PRAYER_CALC_METHOD, TIMEZONE)
+                                     if os.environ.get("PRAYER_TIMES_PROVIDER") == "offline"
+                                     else AladhanCalendarProvider(LATITUDE, LONGITUDE, PRAYER_CALC_METHOD))
+
+    def __init__(self, week_start_date: datetime, provider: Optional[PrayerTimesProvider] = None):
+        '''
+        :param provider: where the athan times come from, Prayers.PROVIDER by default
+        '''
         super().__init__(week_start_date)
+        self.provider = provider if provider is not None else self.PROVIDER
 
         # creating the sessions
         self._csp_variables = [
@@ -85,52 +98,17 @@ class Prayers(SessionGroup):
 
         return list(WeekDay).index(prayer.day)
 
-    def prayer_to_api_params(self, prayer: Prayer) -> tuple[str, str]:
+    def get_prayer_time(self, prayer: Prayer) -> datetime:
         '''
-        returns the data needed to be parsed as json and sent as HTML request to server
+        returns the datetime of the time of a specific prayer within this week
         '''
         # check if name is valid
         if prayer not in self.ALL_PRAYERS:
             raise ValueError(f"Invalid prayer: {prayer}")
 
-        # find day offset
-        day_offset = self.get_prayer_day_offset(prayer)
-        prayer_date = self.week_start_date + timedelta(days=day_offset)
+        prayer_date = self.week_start_date + timedelta(days=self.get_prayer_day_offset(prayer))
         prayer_name = prayer.type.name.lower().capitalize()
-        
-        return prayer_date.strftime("%d-%m-%Y"), prayer_name
-
-    def get_prayer_time(self, prayer: Prayer) -> datetime:
-        '''
-        returns the datetime of the time of a specific prayer within this week
-        '''
-        date_str, prayer_name = self.prayer_to_api_params(prayer)
-
-        params = {
-            "latitude": self.LATITUDE,
-            "longitude": self.LONGITUDE,
-            "date": date_str,
-            "method": self.PRAYER_CALC_METHOD
-        }
-
-        try:
-            response = requests.get(self.BASE_URL, params=params)
-            response.raise_for_status()  # Raise exception for HTTP errors
-            data: dict = response.json()
-            
-            if data["code"] != 200 or "data" not in data:
-                raise ValueError("Invalid response from server")
-                
-            timings = data["data"]["timings"]
-            hour, minute = map(int, timings[prayer_name].split(":"))
-            
-            day_offset = self.get_prayer_day_offset(prayer)
-            prayer_date = self.week_start_date + timedelta(days=day_offset)
-
-            return datetime.combine(prayer_date.date(), time(hour, minute))
-            
-        except (requests.RequestException, json.JSONDecodeError, KeyError) as e:
-            raise ValueError(f"Failed to get prayer time: {e}")           
+        return datetime.combine(prayer_date.date(), self.provider.timings(prayer_date.date())[prayer_name])
 
     def get_prayer_domain_times(self, prayer: Prayer) -> list[datetime]:
         '''
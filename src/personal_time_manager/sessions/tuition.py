@@ -4,9 +4,14 @@ This is the script to read the json file storing all the data of the pupils rega
 from datetime import datetime, timedelta, time
 from enum import Enum, auto
 from dataclasses import dataclass, field
+import copy
+import os
 import pickle
+import threading
+from collections import OrderedDict
 from typing import Optional
-from sessions import SessionGroup, Session, SessionDescriptor
+from personal_time_manager.sessions.base_session import SessionGroup, Session, SessionDescriptor
+from personal_time_manager.sessions.minute_domain import MinuteDomain
 
 class Subject(Enum):
     Maths = auto()
@@ -37,34 +42,119 @@ class Tuition(SessionDescriptor):
 
     @property
     def name(self):
-        return f"Tuition(({subject}) for ({self.students}) for ({duration}))"
+        return f"Tuition(({self.subject.name}) for ({self.students}) for ({self.duration}))"
+
+class TuitionSource:
+    '''
+    The tuitions of one pkl file, unpickled once and kept in memory.
+    The file is read again only when its modification time changes or invalidate() is called.
+    The Sessions of a week are built once from the template and given back to every later Tuitions of that week,
+    so building the same week again does no I/O and always uses the same Session objects.
+    '''
+    KEPT_WEEKS = 16 # weeks whose Sessions are kept, the least recently used are dropped
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.reads = 0 # times the file was unpickled
+        self._mtime: Optional[int] = None
+        self._template: Optional[list[Session]] = None
+        self._weeks: OrderedDict[datetime: list[Session]] = OrderedDict()
+        self._lock = threading.Lock() # weeks may be loaded from several threads, see loading.py
+
+    def invalidate(self, *_) -> None:
+        '''
+        forget everything, the next week asked for reads the file again
+        '''
+        with self._lock:
+            self._template = None
+            self._weeks.clear()
+
+    def _read(self) -> list[Session]:
+        try:
+            with open(self.file_name, 'rb') as pkl_file:
+                tuition_list = pickle.load(pkl_file)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Error: File {self.file_name} not found.")
+        except Exception as e:
+            raise Exception(f"Error loading pickle file: {e}")
+        self.reads += 1
+        return tuition_list
+
+    def sessions(self, week_start_date: datetime) -> list[Session]:
+        '''
+        the Sessions of the week starting on week_start_date, the template domains moved onto it
+        '''
+        with self._lock:
+            try:
+                mtime = os.stat(self.file_name).st_mtime_ns
+            except FileNotFoundError:
+                raise FileNotFoundError(f"Error: File {self.file_name} not found.")
+            if mtime != self._mtime or self._template is None:
+                self._template, self._mtime = self._read(), mtime
+                self._weeks.clear()
+
+            week = self._weeks.get(week_start_date)
+            if week is None:
+                week = self._weeks[week_start_date] = self._move_onto(week_start_date)
+                while len(self._weeks) > self.KEPT_WEEKS:
+                    self._weeks.popitem(last=False)
+            self._weeks.move_to_end(week_start_date)
+            return week
+
+    def _move_onto(self, week_start_date: datetime) -> list[Session]:
+        '''
+        copies of the template Sessions with their domains moved onto the week, overlaps between them pointing to the copies
+        '''
+        starts = [start for tuition in self._template for start in tuition.domain_values]
+        shift = week_start_date - SessionGroup.week_start_of(min(starts)) if starts else timedelta(0)
+
+        copies = {tuition: copy.copy(tuition) for tuition in self._template}
+        for tuition in copies.values():
+            tuition.domain_values = MinuteDomain.from_values(week_start_date, [start + shift for start in tuition.domain_values])
+            tuition.allowed_to_overlap_session = [copies.get(other, other) for other in tuition.allowed_to_overlap_session]
+        return list(copies.values())
+
+
+_sources: dict[str: TuitionSource] = {}
+_sources_lock = threading.Lock()
+
+def tuition_source(file_name: str) -> TuitionSource:
+    '''
+    the TuitionSource of the file, the same one every time
+    '''
+    with _sources_lock:
+        if file_name not in _sources:
+            _sources[file_name] = TuitionSource(file_name)
+        return _sources[file_name]
+
 
 class Tuitions(SessionGroup):
     PKL_TUITION_DOMAIN_DICT_FILE_NAME = "tuition_domain_dict.pkl"
 
     def __init__(self, week_start_date: datetime):
         super().__init__(week_start_date)
+        self._csp_variables: Optional[list[Session]] = None
+
+    def load(self) -> "Tuitions":
+        self._csp_variables = self.get_tuition_list_from_pkl()
+        return self
 
     def get_tuition_list_from_pkl(self) -> list[Session]:
         '''
-        Reads the local pkl file generated manually or from App that contains the list of all the wanted tuition in a week and the domain of each Tuition.
+        The list of all the wanted tuition in a week and the domain of each Tuition, from the local pkl file generated manually or from App.
+        The domains are moved onto week_start_date whatever week the pkl was made for.
+        The file is only read again when it changed, see TuitionSource.
         
         Returns:
             list[Session]: A list of Session objects containing tuition information and their domains.
         '''
-        try:
-            with open(self.PKL_TUITION_DOMAIN_DICT_FILE_NAME, 'rb') as pkl_file:
-                tuition_list = pickle.load(pkl_file)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Error: File {self.PKL_TUITION_DOMAIN_DICT_FILE_NAME} not found.")
-        except Exception as e:
-            raise Exception(f"Error loading pickle file: {e}")
-
-        return tuition_list
+        return tuition_source(self.PKL_TUITION_DOMAIN_DICT_FILE_NAME).sessions(self.week_start_date)
 
     @property
     def csp_variables(self) -> list[Session]:
-        return self.get_tuition_list_from_pkl()
+        if self._csp_variables is None:
+            self.load()
+        return self._csp_variables
 
     @property
     def csp_domains(self) -> dict[Session: list[datetime]]:
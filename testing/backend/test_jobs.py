@@ -0,0 +1,168 @@
+'''
+Testing the background solve jobs, offline: the jobs solve small CSPs built here instead of real weeks
+'''
+import runpy
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+import pytest
+from flask import Flask
+from personal_time_manager.csp.csp import CSP
+from personal_time_manager.csp.constraints import NoTimeOverlapConstraint, PreferredHoursPenalty
+from personal_time_manager.sessions.base_session import Session, SessionDescriptor
+from personal_time_manager.backend.jobs import CANCELLED, SOLVED, TIMED_OUT, UNSATISFIABLE, JobManager
+
+TEST_START_DATE = datetime(2025, 12, 6)  # Saturday
+
+@dataclass(frozen=True)
+class Block(SessionDescriptor):
+    label: str
+
+    @property
+    def name(self):
+        return self.label
+
+def build(lessons: int, hours: int, preferred_until: int = 0, **options) -> CSP:
+    '''
+    hour long lessons starting every 5 minutes of an afternoon of the given hours,
+    more lessons than hours makes a search long enough to be cancelled or timed out
+    :param options: given to the CSP (inference ...)
+    '''
+    starts = [TEST_START_DATE + timedelta(hours=12, minutes=5 * i) for i in range((hours - 1) * 12 + 1)]
+    sessions = [Session(Block(f"lesson_{i}"), timedelta(minutes=60), starts) for i in range(lessons)]
+    csp = CSP(sessions, {session: session.domain_values for session in sessions}, **options)
+    for session in sessions:
+        csp.add_constraint(NoTimeOverlapConstraint(session, timedelta(minutes=0)))
+    if preferred_until:
+        csp.add_soft_constraint(PreferredHoursPenalty(sessions, time(12), time(preferred_until)))
+    return csp
+
+@pytest.fixture
+def manager():
+    manager = JobManager(build, max_workers=2, default_time_limit=10)
+    yield manager
+    manager.shutdown()
+
+def test_solves_in_the_background(manager):
+    job, created = manager.submit({"lessons": 3, "hours": 4})
+    job = manager.wait(job.id, timeout=10)
+
+    assert created
+    assert job.status == SOLVED
+    assert [lesson["name"] for lesson in job.result] == ["lesson_0", "lesson_1", "lesson_2"]
+    assert job.result[0]["end"] <= job.result[1]["start"]
+
+    unsatisfiable, _ = manager.submit({"lessons": 3, "hours": 2})
+    assert manager.wait(unsatisfiable.id, timeout=10).status == UNSATISFIABLE
+
+def test_same_inputs_give_the_same_job(manager):
+    job, created = manager.submit({"lessons": 3, "hours": 4})
+    again, created_again = manager.submit({"hours": 4, "lessons": 3})
+
+    assert created and not created_again
+    assert again is job
+
+def test_finished_job_is_solved_again(manager):
+    # the data behind the same inputs (sessions, calendar, prayer times) may have changed since
+    job, _ = manager.submit({"lessons": 3, "hours": 4})
+    assert manager.wait(job.id, timeout=10).status == SOLVED
+
+    again, created = manager.submit({"lessons": 3, "hours": 4})
+    assert created and again is not job
+
+@pytest.mark.parametrize("time_limit", ["nan", float("nan"), "inf", 0, "0", -1, "soon"])
+def test_invalid_time_limit(manager, time_limit):
+    with pytest.raises(ValueError):
+        manager.submit({"lessons": 3, "hours": 4}, time_limit=time_limit)
+
+def test_time_limit_is_capped():
+    manager = JobManager(build, max_workers=1, max_time_limit=5)
+    try:
+        assert manager.submit({"lessons": 3, "hours": 4}, time_limit="1e9")[0].time_limit == 5
+    finally:
+        manager.shutdown()
+
+def test_deadline(manager):
+    job, _ = manager.submit({"lessons": 9, "hours": 8}, time_limit=0.3)
+    job = manager.wait(job.id, timeout=10)
+
+    assert job.status == TIMED_OUT
+    assert job.progress["nodes"] > 0
+    assert job.progress["elapsed_seconds"] < 5
+
+    # a job that ran out of time can be submitted again
+    retried, created = manager.submit({"lessons": 9, "hours": 8}, time_limit=0.3)
+    assert created and retried is not job
+
+@pytest.mark.parametrize("inference", ["forward_checking", "mac"])
+def test_deadline_with_inference(manager, inference: str):
+    # most values fail the inference here, the deadline still has to be checked on them
+    job, _ = manager.submit({"lessons": 12, "hours": 11, "inference": inference}, time_limit=0.3)
+    job = manager.wait(job.id, timeout=10)
+
+    assert job.status == TIMED_OUT
+    assert job.finished_at - job.started_at < 0.3 + 0.5
+
+def test_cancel(manager):
+    job, _ = manager.submit({"lessons": 9, "hours": 8})
+    while manager.get(job.id).progress["nodes"] == 0:
+        pass
+    manager.cancel(job.id)
+
+    assert manager.wait(job.id, timeout=5).status == CANCELLED
+    assert manager.cancel("no such job") is None
+
+def test_optimizing_job_keeps_the_best_timetable_found():
+    manager = JobManager(build, max_workers=1)
+    try:
+        job, _ = manager.submit({"lessons": 3, "hours": 6, "preferred_until": 15}, time_limit=10)
+        job = manager.wait(job.id, timeout=15)
+    finally:
+        manager.shutdown()
+
+    assert job.status == SOLVED
+    assert job.progress["best_cost"] == 0
+    assert all(lesson["end"] <= (TEST_START_DATE + timedelta(hours=15)).isoformat() for lesson in job.result)
+
+def test_endpoints(monkeypatch):
+    from personal_time_manager.backend import app as app_module
+    manager = JobManager(lambda week_start, options, **_: build(3, 4), max_workers=1)
+    monkeypatch.setattr(app_module, "jobs", manager)
+    backend = Flask(__name__)
+    backend.register_blueprint(app_module.main_routes)
+
+    try:
+        with backend.test_client() as client:
+            response = client.post("/timetable/solve", json={"userId": "u1", "weekStart": "2025-12-06"})
+            assert response.status_code == 202
+            job_id = response.get_json()["jobId"]
+
+            manager.wait(job_id, timeout=10)
+            response = client.get(f"/timetable/solve/{job_id}")
+            assert response.status_code == 200
+            assert response.get_json()["status"] == SOLVED and len(response.get_json()["result"]) == 3
+
+            response = client.post("/timetable/solve", json={"userId": "u1", "weekStart": "2025-12-06"})
+            assert response.get_json()["jobId"] != job_id and not response.get_json()["deduplicated"]
+
+            assert client.post("/timetable/solve", json={"userId": "u1", "weekStart": "2025-12-06",
+                                                         "timeLimit": "nan"}).status_code == 400
+            assert client.post("/timetable/solve", json={"userId": "u1", "weekStart": "2025-12-06",
+                                                         "timeLimit": 0}).status_code == 400
+
+            assert client.post("/timetable/solve", json={"userId": "u1", "weekStart": "2025-12-07"}).status_code == 400
+            assert client.post("/timetable/solve", json={"userId": "u1", "weekStart": "2025-12-06",
+                                                         "options": {"engine": "x"}}).status_code == 400
+            assert client.delete("/timetable/solve/unknown").status_code == 404
+    finally:
+        manager.shutdown()
+
+def test_gunicorn_runs_a_single_worker():
+    # the jobs live in the memory of one process
+    config = runpy.run_path(str(Path(__file__).parents[2] / "gunicorn.conf.py"))
+    assert config["workers"] == 1
+
+    config["on_starting"](SimpleNamespace(cfg=SimpleNamespace(workers=1)))
+    with pytest.raises(RuntimeError):
+        config["on_starting"](SimpleNamespace(cfg=SimpleNamespace(workers=4)))
@@ -0,0 +1,159 @@
+'''
+Benchmark of the scheduling engine on the generated weeks of week_generator.py
+
+Run from the repository root (offline, the prayer api is mocked):
+    PYTHONPATH=src python testing/benchmarks/run_benchmarks.py --sizes small medium --seeds 0 1 2 --output results.json
+
+Every engine solves every (size, seed) week once. The results are written as json with one record per run
+(size, seed, engine, variables, seconds, solved, nodes, backtracks, timed_out) plus the python version and git commit,
+so two commits are compared by diffing or loading their result files.
+A new engine is benchmarked by adding it to ENGINES.
+'''
+import argparse
+import copy
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+from week_generator import SIZES, build_week_csp
+from personal_time_manager.csp.csp import CSP
+from personal_time_manager.csp.decompose import connected_components, sub_csp
+from personal_time_manager.csp.occupancy_grid import np
+from personal_time_manager.sessions.base_session import Session
+
+
+class TimeLimit(Exception):
+    '''
+    raised from inside a search that ran past its time limit
+    '''
+
+
+def recursive_engine(csp: CSP, deadline: float) -> dict:
+    '''
+    CSP.backtracking_search, the time limit is checked on every consistency check of a shallow copy of the csp
+    (the recursive search collects no statistics)
+    '''
+    limited = copy.copy(csp)
+
+    def consistent(variable: Session, assignment: dict[Session: datetime]) -> bool:
+        if time.perf_counter() > deadline:
+            raise TimeLimit()
+        return csp.consistent(variable, assignment)
+
+    limited.consistent = consistent
+    solution = limited.backtracking_search()
+    return {"solved": solution is not None, "nodes": None, "backtracks": None, "solution": solution}
+
+def iterative_engine(csp: CSP, deadline: float) -> dict:
+    '''
+    CSP.solve with statistics, the time limit is checked by the progress callback
+    '''
+    progress = {}
+
+    def on_progress(stats) -> None:
+        progress["stats"] = stats
+        if time.perf_counter() > deadline:
+            raise TimeLimit()
+
+    try:
+        solution, stats = csp.solve(return_stats=True, on_progress=on_progress, progress_interval=100)
+    except TimeLimit as limit:
+        limit.stats = progress.get("stats")
+        raise
+    return {"solved": solution is not None, "nodes": stats.nodes, "backtracks": stats.backtracks, "solution": solution}
+
+def decomposed_engine(csp: CSP, deadline: float) -> dict:
+    '''
+    every connected component solved by the iterative engine in this process (see decompose.py)
+    '''
+    record = {"solved": True, "nodes": 0, "backtracks": 0, "solution": {}}
+    for variables in connected_components(csp):
+        component = iterative_engine(sub_csp(csp, variables), deadline)
+        record["nodes"] += component["nodes"]
+        record["backtracks"] += component["backtracks"]
+        if not component["solved"]:
+            record.update({"solved": False, "solution": None})
+            break
+        record["solution"].update(component["solution"])
+    return record
+
+# name: (options given to CSP, function solving the csp before the deadline,
+#        returning {"solved", "nodes", "backtracks", "solution"})
+ENGINES: dict[str: tuple[dict, Callable]] = {
+    "recursive": ({}, recursive_engine),
+    "iterative": ({}, iterative_engine),
+    "mrv_forward_checking": ({"variable_ordering": "mrv", "inference": "forward_checking"}, iterative_engine),
+    "backjumping": ({"backjumping": True}, iterative_engine),
+    "mrv_forward_checking_backjumping": ({"variable_ordering": "mrv", "inference": "forward_checking",
+                                          "backjumping": True}, iterative_engine),
+    "decomposed": ({}, decomposed_engine),
+    "mrv_forward_checking_disjunctive": ({"variable_ordering": "mrv", "inference": "forward_checking",
+                                          "disjunctive": True}, iterative_engine),
+}
+if np is not None: # to follow the cost of the grid, it is slower than mrv_forward_checking (see occupancy_grid.py)
+    ENGINES["mrv_forward_checking_grid"] = ({"variable_ordering": "mrv", "inference": "forward_checking",
+                                             "occupancy_grid": True}, iterative_engine)
+
+
+def run(size: str, seed: int, engine: str, time_limit: float) -> dict:
+    options, solve = ENGINES[engine]
+    csp = build_week_csp(size, seed, **options)
+    record = {"size": size, "seed": seed, "engine": engine, "variables": len(csp.variables), "timed_out": False}
+
+    start = time.perf_counter()
+    try:
+        record.update(solve(csp, start + time_limit))
+        del record["solution"]
+    except TimeLimit as limit:
+        stats = getattr(limit, "stats", None)
+        record.update({"solved": False, "timed_out": True,
+                       "nodes": stats.nodes if stats else None, "backtracks": stats.backtracks if stats else None})
+    record["seconds"] = round(time.perf_counter() - start, 6)
+    return record
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(arguments: Optional[list[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0, 1, 2])
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument("--time-limit", type=float, default=30.0, help="seconds allowed to every run")
+    parser.add_argument("--output", type=Path, help="json file of the results, printed if not given")
+    args = parser.parse_args(arguments)
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "time_limit": args.time_limit,
+        "runs": [],
+    }
+    for size in args.sizes:
+        for seed in args.seeds:
+            for engine in args.engines:
+                record = run(size, seed, engine, args.time_limit)
+                results["runs"].append(record)
+                print(f"{size:>6} seed {seed:<3} {engine:<34} {record['seconds']:>10.3f}s "
+                      f"{'timed out' if record['timed_out'] else 'solved' if record['solved'] else 'no solution'}",
+                      file=sys.stderr)
+
+    if args.output is None:
+        print(json.dumps(results, indent=2))
+    else:
+        args.output.write_text(json.dumps(results, indent=2))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+'''
+Testing the generated benchmark weeks (offline) and a quick run of the benchmark on the small size
+'''
+import json
+import time
+import pytest
+from personal_time_manager.sessions.prayers import Prayer
+from week_generator import build_week_csp
+from run_benchmarks import ENGINES, main
+
+def describe(csp):
+    return [(session.session_descriptor.name, session.base_duration, session.domain_values) for session in csp.variables]
+
+def test_same_seed_gives_the_same_week():
+    assert describe(build_week_csp("small", seed=3)) == describe(build_week_csp("small", seed=3))
+    assert describe(build_week_csp("small", seed=3)) != describe(build_week_csp("small", seed=4))
+
+def test_week_holds_the_prayers_and_the_tuitions():
+    csp = build_week_csp("medium", seed=0)
+    prayers = [session for session in csp.variables if isinstance(session.session_descriptor, Prayer)]
+    lessons = [session for session in csp.variables if session not in prayers]
+
+    assert len(prayers) == 35
+    assert lessons and all(session.allowed_to_overlap_session for session in lessons)
+
+@pytest.mark.parametrize("engine", list(ENGINES))
+def test_every_engine_solves_the_small_week(engine: str):
+    options, solve = ENGINES[engine]
+    csp = build_week_csp("small", seed=0, **options)
+    record = solve(csp, time.perf_counter() + 60)
+    solution = record["solution"]
+
+    assert record["solved"] and solution is not None
+    assert all(csp.consistent(variable, solution) for variable in csp.variables)
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_disjunctive_constraint_prunes_the_crowded_week(seed: int):
+    nodes = {}
+    for engine in ("mrv_forward_checking", "mrv_forward_checking_disjunctive"):
+        options, solve = ENGINES[engine]
+        record = solve(build_week_csp("crowded", seed=seed, **options), time.perf_counter() + 60)
+        assert not record["solved"] # the day can't hold all its lessons
+        nodes[engine] = record["nodes"]
+
+    assert nodes["mrv_forward_checking_disjunctive"] * 10 < nodes["mrv_forward_checking"]
+
+def test_results_are_written_as_json(tmp_path):
+    output = tmp_path / "results.json"
+    main(["--sizes", "small", "--seeds", "0", "--engines", "iterative", "--output", str(output)])
+
+    results = json.loads(output.read_text())
+    assert results["runs"][0]["engine"] == "iterative"
+    assert results["runs"][0]["solved"]
@@ -0,0 +1,159 @@
+'''
+Seeded generators of realistic weeks for benchmarking the scheduling engine
+
+A week is built like the real one:
+- students shaped like the student_data stored in the database (subjects with sharedWith lists)
+- one tuition Session per group of students sharing a subject, a few lessons per week
+- availability windows of varying width, starting every 15 minutes
+- the 35 fixed prayer sessions from Prayers, fetched offline from the recorded api responses
+Everything comes from random.Random(seed) so the same size and seed always give the same week.
+'''
+import random
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from personal_time_manager.csp.csp import CSP
+from personal_time_manager.csp.constraints import DisjunctiveConstraint, NoTimeOverlapConstraint
+from personal_time_manager.sessions.base_session import Session
+from personal_time_manager.sessions.minute_domain import MinuteDomain
+from personal_time_manager.sessions.prayers import Prayers
+from personal_time_manager.sessions.prayer_times import AladhanCalendarProvider
+from personal_time_manager.sessions.tuition import Student, StudentStatus, Subject, Tuition
+
+sys.path.insert(0, str(Path(__file__).parents[1] / "sessions"))
+from mock_prayers_html_response import MockAladhanSession
+
+WEEK_START = datetime(2025, 12, 6)  # Saturday, the week of the recorded api responses
+SLOT = timedelta(minutes=15)
+LESSON_TOLERANCE = timedelta(minutes=10)  # a prayer can't start in the first minutes of a lesson
+PRAYER_TOLERANCE = timedelta(minutes=0)
+
+@dataclass(frozen=True)
+class WeekSpec:
+    students: int
+    subjects_per_student: int
+    lessons_per_tuition: int
+    share_probability: float  # chance a student joins an existing group of the same subject and grade
+    windows_per_lesson: int
+    min_window_hours: int
+    max_window_hours: int
+    days: int = 7 # the lessons are on the first days of the week only
+
+SIZES: dict[str: WeekSpec] = {
+    "small": WeekSpec(students=6, subjects_per_student=1, lessons_per_tuition=1, share_probability=0.3,
+                      windows_per_lesson=2, min_window_hours=1, max_window_hours=3),
+    "medium": WeekSpec(students=12, subjects_per_student=2, lessons_per_tuition=1, share_probability=0.4,
+                       windows_per_lesson=2, min_window_hours=1, max_window_hours=5),
+    "stress": WeekSpec(students=20, subjects_per_student=2, lessons_per_tuition=1, share_probability=0.6,
+                       windows_per_lesson=3, min_window_hours=1, max_window_hours=6),
+    # ten lessons with one window each on the first day, more than the day holds: the overload reasoning
+    # of the DisjunctiveConstraint proves it in a few nodes where the pairwise constraints search hundreds
+    "crowded": WeekSpec(students=10, subjects_per_student=1, lessons_per_tuition=1, share_probability=0.0,
+                        windows_per_lesson=1, min_window_hours=4, max_window_hours=6, days=1),
+}
+
+
+def offline_prayers(week_start: datetime = WEEK_START) -> Prayers:
+    '''
+    Prayers of the week with the api requests answered from mock_prayers_html_response (same as the test_prayers fixture)
+    '''
+    provider = AladhanCalendarProvider(Prayers.LATITUDE, Prayers.LONGITUDE, Prayers.PRAYER_CALC_METHOD,
+                                       cache_dir=None, session=MockAladhanSession())
+    return Prayers(week_start, provider)
+
+def generate_students(spec: WeekSpec, generator: random.Random) -> list[dict]:
+    '''
+    student_data dicts like the ones saved by DatabaseHandler.save_student, sharedWith kept reciprocal
+    '''
+    students = []
+    groups: dict[tuple[str, int]: list[dict]] = {} # (subject, grade) -> students taking it together
+    for index in range(spec.students):
+        student = {
+            "id": f"student-{index}",
+            "basicInfo": {"firstName": f"First{index}", "familyName": f"Family{index}"},
+            "grade": generator.randint(7, 12),
+            "subjects": [],
+        }
+        for subject in generator.sample(list(Subject), spec.subjects_per_student):
+            group = groups.setdefault((subject.name, student["grade"]), [])
+            shared_with = []
+            if group and generator.random() < spec.share_probability:
+                shared_with = [other["id"] for other in group]
+                for other in group:
+                    next(s for s in other["subjects"] if s["name"] == subject.name)["sharedWith"].append(student["id"])
+            elif group:
+                groups[(subject.name, student["grade"])] = group = [] # starts a new group for the next students
+
+            group.append(student)
+            student["subjects"].append({"name": subject.name, "sharedWith": shared_with})
+        students.append(student)
+
+    return students
+
+def availability(spec: WeekSpec, duration: timedelta, generator: random.Random) -> MinuteDomain:
+    '''
+    start times every SLOT inside a few random windows of the week (afternoons and evenings)
+    '''
+    starts = set()
+    for _ in range(spec.windows_per_lesson):
+        day = WEEK_START + timedelta(days=generator.randrange(spec.days))
+        width = max(timedelta(hours=generator.randint(spec.min_window_hours, spec.max_window_hours)), duration)
+        window_start = day + timedelta(hours=generator.randint(10, 22 - spec.min_window_hours))
+        window_end = min(window_start + width, day + timedelta(hours=23))
+        start = window_start
+        while start + duration <= window_end:
+            starts.add(start)
+            start += SLOT
+    return MinuteDomain.from_values(WEEK_START, sorted(starts))
+
+def tuition_sessions(students: list[dict], spec: WeekSpec, generator: random.Random) -> list[Session]:
+    '''
+    one Tuition per group of students sharing a subject, spec.lessons_per_tuition lessons each
+    '''
+    sessions = []
+    seen = set()
+    by_id = {student["id"]: student for student in students}
+    for student in students:
+        for subject in student["subjects"]:
+            member_ids = tuple(sorted([student["id"], *subject["sharedWith"]]))
+            if (subject["name"], member_ids) in seen:
+                continue
+            seen.add((subject["name"], member_ids))
+
+            members = [Student(by_id[member_id]["basicInfo"]["firstName"], by_id[member_id]["basicInfo"]["familyName"],
+                               by_id[member_id]["grade"], StudentStatus.Alpha) for member_id in member_ids]
+            duration = timedelta(minutes=generator.choice([60, 90, 120]))
+            tuition = Tuition(members, Subject[subject["name"]], duration)
+            for _ in range(spec.lessons_per_tuition):
+                sessions.append(Session(tuition, duration, availability(spec, duration, generator)))
+
+    return sessions
+
+def build_week_csp(size: str, seed: int = 0, disjunctive: bool = False, **csp_options) -> CSP:
+    '''
+    the full CSP of a generated week: prayers and tuitions, every lesson allowing the prayers of its days inside it
+    :param size: one of SIZES
+    :param disjunctive: one DisjunctiveConstraint over the whole week instead of a NoTimeOverlapConstraint per session
+    :param csp_options: passed to CSP (variable_ordering, inference ...)
+    '''
+    spec = SIZES[size]
+    generator = random.Random(seed)
+    prayers = offline_prayers().csp_variables
+    lessons = tuition_sessions(generate_students(spec, generator), spec, generator)
+
+    for lesson in lessons:
+        days = {start.date() for start in lesson.domain_values}
+        lesson.allowed_to_overlap_session = [prayer for prayer in prayers if prayer.domain_values[0].date() in days]
+
+    variables = prayers + lessons
+    csp = CSP(variables, {session: session.domain_values for session in variables}, **csp_options)
+    if disjunctive:
+        csp.add_constraint(DisjunctiveConstraint(variables, PRAYER_TOLERANCE, {lesson: LESSON_TOLERANCE for lesson in lessons}))
+        return csp
+
+    for prayer in prayers:
+        csp.add_constraint(NoTimeOverlapConstraint(prayer, PRAYER_TOLERANCE))
+    for lesson in lessons:
+        csp.add_constraint(NoTimeOverlapConstraint(lesson, LESSON_TOLERANCE))
+    return csp
@@ -0,0 +1,49 @@
+'''
+Small offline building blocks for the csp tests
+'''
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from personal_time_manager.csp.csp import CSP
+from personal_time_manager.csp.constraints import NoTimeOverlapConstraint
+from personal_time_manager.sessions.base_session import Session, SessionDescriptor
+
+TEST_START_DATE = datetime(2025, 12, 6)  # Saturday
+
+@dataclass(frozen=True)
+class Block(SessionDescriptor):
+    label: str
+
+    @property
+    def name(self):
+        return self.label
+
+def make_session(label: str, minutes: int, starts: list[datetime]) -> Session:
+    return Session(Block(label), timedelta(minutes=minutes), starts)
+
+def slots(day: int, first_hour: int, last_hour: int, step_minutes: int = 30) -> list[datetime]:
+    '''
+    every start time from first_hour until last_hour (exclusive) of a day of the test week
+    '''
+    day_start = TEST_START_DATE + timedelta(days=day, hours=first_hour)
+    count = (last_hour - first_hour) * 60 // step_minutes
+    return [day_start + timedelta(minutes=step_minutes * i) for i in range(count)]
+
+def overlap_csp(sessions: list[Session], **kwargs) -> CSP:
+    '''
+    csp with a NoTimeOverlapConstraint (no tolerance) on every session
+    '''
+    csp = CSP(sessions, {session: session.domain_values for session in sessions}, **kwargs)
+    for session in sessions:
+        csp.add_constraint(NoTimeOverlapConstraint(session, timedelta(minutes=0)))
+    return csp
+
+def busy_afternoon() -> list[Session]:
+    '''
+    a fixed meeting in the middle of an afternoon and lessons that all compete for the same few hours
+    '''
+    meeting = make_session("meeting", 60, slots(0, 16, 17, 60))
+    lessons = [make_session(f"lesson_{i}", 60, slots(0, 14, 20, 30)) for i in range(4)]
+    return lessons + [meeting]
+
+def is_valid(csp: CSP, solution: dict[Session: datetime]) -> bool:
+    return len(solution) == len(csp.variables) and all(csp.consistent(variable, solution) for variable in csp.variables)
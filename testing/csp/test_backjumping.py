@@ -0,0 +1,68 @@
+'''
+Testing the conflict-directed backjumping search and its nogood store
+'''
+import random
+import pytest
+from datetime import timedelta
+from personal_time_manager.csp.backjumping import NogoodStore
+from personal_time_manager.csp.search import iterative_search
+from csp_helpers import TEST_START_DATE, busy_afternoon, overlap_csp, is_valid, make_session, slots
+
+def random_sessions(seed: int) -> list:
+    generator = random.Random(seed)
+    return [make_session(f"s{i}", generator.choice([30, 60, 90]), generator.sample(slots(0, 9, 13, 30), 3))
+            for i in range(6)]
+
+@pytest.mark.parametrize("inference", ["none", "forward_checking"])
+@pytest.mark.parametrize("seed", range(8))
+def test_backjumping_finds_the_same_solutions(inference: str, seed: int):
+    sessions = random_sessions(seed)
+    chronological = overlap_csp(sessions, inference=inference)
+    backjumping = overlap_csp(sessions, inference=inference, backjumping=True)
+
+    expected = {tuple(solution.items()) for solution in iterative_search(chronological)}
+    found = [tuple(solution.items()) for solution in iterative_search(backjumping)]
+    assert len(found) == len(set(found))
+    assert {tuple(sorted(solution, key=lambda item: item[0].session_descriptor.label)) for solution in found} == \
+        {tuple(sorted(solution, key=lambda item: item[0].session_descriptor.label)) for solution in expected}
+
+def test_backjumping_skips_the_variables_unrelated_to_the_failure():
+    # the lesson can only fit if the meeting isn't at 10:00, the breaks in between have nothing to do with it
+    meeting = make_session("meeting", 60, slots(0, 10, 14, 120))  # 10:00 or 12:00
+    breaks = [make_session(f"break_{i}", 15, slots(1, 8, 12, 60)) for i in range(3)]  # another day
+    lesson = make_session("lesson", 60, [TEST_START_DATE + timedelta(hours=10, minutes=30)])
+    sessions = [meeting, *breaks, lesson]
+
+    chronological, chronological_stats = overlap_csp(sessions).solve(return_stats=True)
+    backjumping, backjumping_stats = overlap_csp(sessions, backjumping=True).solve(return_stats=True)
+
+    assert backjumping == chronological
+    assert is_valid(overlap_csp(sessions), backjumping)
+    assert backjumping_stats.backjumps > 0
+    assert backjumping_stats.nodes < chronological_stats.nodes
+
+def test_nogood_store_rejects_a_learned_combination():
+    a, b, c = (make_session(label, 30, []) for label in "abc")
+    nine, ten = TEST_START_DATE + timedelta(hours=9), TEST_START_DATE + timedelta(hours=10)
+    store = NogoodStore()
+
+    assert store.add({a: nine, b: ten})
+    assert not store.add({b: ten, a: nine})  # already known
+    assert store.violated(b, ten, {a: nine, c: ten}) == {a}
+    assert store.violated(b, ten, {a: ten}) is None
+    assert store.violated(c, ten, {a: nine, b: ten}) is None
+
+def test_nogood_store_limits():
+    a, b = make_session("a", 30, []), make_session("b", 30, [])
+    store = NogoodStore(limit=1, max_size=1)
+
+    assert not store.add({a: TEST_START_DATE, b: TEST_START_DATE})  # too big
+    assert store.add({a: TEST_START_DATE})
+    assert not store.add({b: TEST_START_DATE})  # full
+    assert len(store) == 1
+
+def test_backjumping_rejects_mac():
+    csp = overlap_csp(busy_afternoon(), inference="mac", backjumping=True)
+
+    with pytest.raises(ValueError):
+        csp.solve()
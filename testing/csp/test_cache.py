@@ -0,0 +1,130 @@
+'''
+Testing the problem fingerprint and the solution cache
+'''
+from datetime import timedelta
+import pytest
+from personal_time_manager.csp.cache import MISS, PostgresSolutionStore, SolutionCache, Uncacheable, fingerprint
+from personal_time_manager.csp.csp import Constraint
+from personal_time_manager.csp.constraints import NoTimeOverlapConstraint
+from csp_helpers import busy_afternoon, overlap_csp, is_valid, make_session, slots
+
+class InMemoryDatabase:
+    '''
+    stands in for DatabaseHandler, same get_cached_solution / save_cached_solution methods
+    '''
+    def __init__(self):
+        self.rows = {}
+
+    def get_cached_solution(self, fingerprint):
+        return self.rows.get(fingerprint)
+
+    def save_cached_solution(self, fingerprint, solution):
+        self.rows[fingerprint] = solution
+
+class BrokenDatabase:
+    def get_cached_solution(self, fingerprint):
+        raise ConnectionError("database is down")
+
+    def save_cached_solution(self, fingerprint, solution):
+        raise ConnectionError("database is down")
+
+class Earliest:
+    '''
+    a plain object (no dataclass), only identified by its id
+    '''
+    def __init__(self, start):
+        self.start = start
+
+class NotBefore(Constraint):
+    def __init__(self, variable, earliest: Earliest):
+        super().__init__([variable])
+        self.earliest = earliest
+
+    def satisfied(self, assignment):
+        return self.variables[0] not in assignment or assignment[self.variables[0]] >= self.earliest.start
+
+def test_rebuilt_problem_has_the_same_fingerprint():
+    assert fingerprint(overlap_csp(busy_afternoon())) == fingerprint(overlap_csp(busy_afternoon()))
+
+def test_fingerprint_follows_what_defines_the_problem():
+    sessions = busy_afternoon()
+    reference = fingerprint(overlap_csp(sessions))
+
+    assert fingerprint(overlap_csp(sessions), {sessions[0]: sessions[0].domain_values[0]}) != reference
+    assert fingerprint(overlap_csp(sessions[::-1])) != reference
+
+    shorter = busy_afternoon()
+    shorter[0].base_duration = timedelta(minutes=30)
+    assert fingerprint(overlap_csp(shorter)) != reference
+
+    tolerant = overlap_csp(busy_afternoon())
+    tolerant.constraints[tolerant.variables[0]] = [NoTimeOverlapConstraint(tolerant.variables[0], timedelta(minutes=5))]
+    assert fingerprint(tolerant) != reference
+
+def test_identical_problem_is_answered_from_the_cache():
+    cache = SolutionCache()
+    first = overlap_csp(busy_afternoon(), solution_cache=cache)
+    second = overlap_csp(busy_afternoon(), solution_cache=cache)
+
+    solution = first.solve()
+    cached = second.solve()
+
+    assert cache.hits == 1 and cache.misses == 1
+    assert list(cached) == second.variables  # mapped to the sessions of the second csp
+    assert list(cached.values()) == list(solution.values())
+    assert is_valid(second, cached)
+
+def test_no_solution_is_cached_too():
+    cache = SolutionCache()
+    blocker = make_session("blocker", 30, slots(0, 10, 11, 60))
+    squeezed = make_session("squeezed", 120, slots(0, 9, 10, 30))
+    csp = overlap_csp([blocker, squeezed], solution_cache=cache)
+
+    assert csp.solve() is None
+    assert csp.solve() is None
+    assert cache.hits == 1
+
+def test_least_recently_used_problem_is_evicted():
+    cache = SolutionCache(capacity=2)
+    csps = [overlap_csp([make_session("s", 30, slots(day, 9, 10))]) for day in range(3)]
+    keys = [fingerprint(csp) for csp in csps]
+
+    cache.put(csps[0], keys[0], csps[0].solve())
+    cache.put(csps[1], keys[1], csps[1].solve())
+    assert cache.get(csps[0], keys[0]) is not MISS  # 0 is now the most recently used
+    cache.put(csps[2], keys[2], csps[2].solve())
+
+    assert len(cache) == 2
+    assert cache.get(csps[1], keys[1]) is MISS
+    assert cache.get(csps[0], keys[0]) is not MISS
+
+def test_persistent_store_survives_a_restart():
+    database = InMemoryDatabase()
+    solution = overlap_csp(busy_afternoon(), solution_cache=SolutionCache(store=PostgresSolutionStore(database))).solve()
+
+    restarted = SolutionCache(store=PostgresSolutionStore(database))
+    csp = overlap_csp(busy_afternoon(), solution_cache=restarted)
+    assert list(csp.solve().values()) == list(solution.values())
+    assert restarted.hits == 1
+
+def test_broken_store_does_not_break_solving(capsys):
+    csp = overlap_csp(busy_afternoon(), solution_cache=SolutionCache(store=PostgresSolutionStore(BrokenDatabase())))
+
+    assert is_valid(csp, csp.solve())
+    assert "SOLUTION CACHE" in capsys.readouterr().out
+
+def test_object_only_known_by_its_id_is_not_cached():
+    cache = SolutionCache()
+    lesson = make_session("lesson", 60, slots(0, 9, 12, 60))
+    first, second = Earliest(lesson.domain_values[1]), Earliest(lesson.domain_values[2])
+    csp = overlap_csp([lesson], solution_cache=cache)
+    csp.add_constraint(NotBefore(lesson, first))
+
+    with pytest.raises(Uncacheable):
+        fingerprint(csp)
+    assert csp.solve()[lesson] == lesson.domain_values[1]
+
+    # the second object swapped into the first one (same id): the same id now means another problem
+    vars(first).update(vars(second))
+    assert csp.solve()[lesson] == lesson.domain_values[2]
+    assert len(cache) == 0 and cache.hits == cache.misses == 0
@@ -0,0 +1,67 @@
+'''
+Testing the decomposition of a csp into independent components
+'''
+import time
+from personal_time_manager.csp.decompose import connected_components, sub_csp
+from csp_helpers import busy_afternoon, overlap_csp, is_valid, make_session, slots
+
+def two_days() -> list:
+    # the sessions of the two days can't overlap each other, the block on the third day is on its own
+    saturday = busy_afternoon()
+    sunday = [make_session(f"sunday_{i}", 60, slots(1, 9, 12, 30)) for i in range(3)]
+    monday = [make_session("monday", 30, slots(2, 9, 10, 30))]
+    return saturday + sunday + monday
+
+def test_components_follow_the_days():
+    sessions = two_days()
+    components = connected_components(overlap_csp(sessions))
+
+    assert components == [sessions[:5], sessions[5:8], sessions[8:]]
+
+def test_sub_csp_only_sees_its_variables():
+    sessions = two_days()
+    csp = overlap_csp(sessions)
+    component = sub_csp(csp, sessions[5:8])
+
+    assert component.variables == sessions[5:8]
+    assert set(component.neighbours(sessions[5])) == set(sessions[6:8])
+    assert csp.variables == sessions  # the csp itself is untouched
+
+def test_decomposed_solution_is_valid_and_complete():
+    sessions = two_days()
+    csp = overlap_csp(sessions, variable_ordering="mrv", inference="forward_checking")
+    solution = csp.solve_decomposed()
+
+    assert list(solution) == sessions
+    assert is_valid(csp, solution)
+
+def test_decomposed_solution_keeps_the_partial_assignment():
+    sessions = two_days()
+    partial = {sessions[5]: sessions[5].domain_values[-1]}
+    solution = overlap_csp(sessions).solve_decomposed(partial)
+
+    assert solution[sessions[5]] == sessions[5].domain_values[-1]
+
+def test_one_unsolvable_component_means_no_solution():
+    blocker = make_session("blocker", 30, slots(3, 10, 11, 60))
+    squeezed = make_session("squeezed", 120, slots(3, 9, 10, 30))
+    csp = overlap_csp(two_days() + [blocker, squeezed])
+
+    assert csp.solve_decomposed() is None
+    assert csp.solve_decomposed(max_workers=2) is None
+
+def test_unsolvable_component_stops_the_others():
+    # 12 one hour lessons in 11 hours on day 0: a plain search takes minutes to prove it, day 3 has no solution at once
+    slow = [make_session(f"lesson_{i}", 60, slots(0, 9, 19, 5)) for i in range(12)]
+    blocker = make_session("blocker", 30, slots(3, 10, 11, 60))
+    squeezed = make_session("squeezed", 120, slots(3, 9, 10, 30))
+    csp = overlap_csp(slow + [blocker, squeezed])
+
+    start = time.perf_counter()
+    assert csp.solve_decomposed(max_workers=2) is None
+    assert time.perf_counter() - start < 10
+
+def test_worker_pool_gives_the_same_solution():
+    csp = overlap_csp(two_days())
+
+    assert csp.solve_decomposed(max_workers=2) == csp.solve_decomposed()
@@ -0,0 +1,103 @@
+'''
+Testing the global no-overlap constraint
+'''
+import random
+from datetime import timedelta
+from personal_time_manager.csp.csp import CSP
+from personal_time_manager.csp.constraints import DisjunctiveConstraint, NoTimeOverlapConstraint
+from personal_time_manager.csp.interval_index import IndexedAssignment
+from csp_helpers import TEST_START_DATE, busy_afternoon, overlap_csp, is_valid, make_session, slots
+
+LESSON_TOLERANCE = timedelta(minutes=10)
+
+def disjunctive_csp(sessions, tolerances=None, **kwargs) -> CSP:
+    csp = CSP(sessions, {session: session.domain_values for session in sessions}, **kwargs)
+    csp.add_constraint(DisjunctiveConstraint(sessions, timedelta(minutes=0), tolerances))
+    return csp
+
+def lessons_and_prayers(generator: random.Random) -> tuple[list, dict]:
+    '''
+    lessons allowing the two prayers of the afternoon inside them, with a tolerance, and meetings that allow nothing
+    '''
+    prayers = [make_session("dhuhr", 15, slots(0, 12, 13, 15)), make_session("asr", 15, slots(0, 15, 16, 20))]
+    lessons = [make_session(f"lesson_{i}", generator.choice([45, 60, 90]), slots(0, 11, 18, 10)) for i in range(5)]
+    meetings = [make_session(f"meeting_{i}", 30, slots(0, 11, 18, 15)) for i in range(3)]
+    for lesson in lessons:
+        lesson.allowed_to_overlap_session = prayers
+    return prayers + lessons + meetings, {lesson: LESSON_TOLERANCE for lesson in lessons}
+
+def test_same_verdict_as_one_constraint_per_session():
+    generator = random.Random(7)
+    sessions, tolerances = lessons_and_prayers(generator)
+    pairwise = [NoTimeOverlapConstraint(session, tolerances.get(session, timedelta(minutes=0))) for session in sessions]
+    pairwise_csp = CSP(sessions, {session: session.domain_values for session in sessions})
+    for constraint in pairwise:
+        pairwise_csp.add_constraint(constraint)
+    csp = disjunctive_csp(sessions, tolerances)
+    constraint = csp.constraints[sessions[0]][0]
+
+    for _ in range(200):
+        assignment = {session: generator.choice(session.domain_values) for session in generator.sample(sessions, 6)}
+        for candidate in (assignment, IndexedAssignment(assignment)):
+            assert constraint.satisfied(candidate) == all(other.satisfied(candidate) for other in pairwise)
+
+        # like in the search, the value of the last variable is checked against an assignment already consistent
+        variable = next(reversed(assignment))
+        before = {session: start for session, start in assignment.items() if session is not variable}
+        if constraint.satisfied(before):
+            for candidate in (assignment, IndexedAssignment(assignment)):
+                assert csp.consistent(variable, candidate) == pairwise_csp.consistent(variable, candidate)
+
+def test_same_constraint_graph_as_one_constraint_per_session():
+    sessions = busy_afternoon() + [make_session("evening", 30, slots(0, 21, 22, 30))]
+    csp, pairwise_csp = disjunctive_csp(sessions), overlap_csp(sessions)
+
+    for session in sessions:
+        assert csp.neighbours(session) == pairwise_csp.neighbours(session)
+
+def test_solutions_are_valid_for_the_pairwise_constraints():
+    for seed in range(3):
+        sessions, tolerances = lessons_and_prayers(random.Random(seed))
+        pairwise_csp = CSP(sessions, {session: session.domain_values for session in sessions})
+        for session in sessions:
+            pairwise_csp.add_constraint(NoTimeOverlapConstraint(session, tolerances.get(session, timedelta(minutes=0))))
+
+        for inference in ("forward_checking", "mac"):
+            solution = disjunctive_csp(sessions, tolerances, variable_ordering="mrv", inference=inference).solve()
+            assert (solution is None) == (pairwise_csp.solve() is None)
+            assert solution is None or is_valid(pairwise_csp, solution)
+
+def test_prayer_inside_a_lesson_is_kept():
+    # the lesson only fits if the prayer happens inside it
+    prayer = make_session("asr", 15, [TEST_START_DATE + timedelta(hours=16, minutes=20)])
+    lesson = make_session("lesson", 60, slots(0, 16, 17, 30))
+    meeting = make_session("meeting", 45, [TEST_START_DATE + timedelta(hours=17, minutes=15)])
+    lesson.allowed_to_overlap_session = [prayer]
+
+    csp = disjunctive_csp([prayer, meeting, lesson], {lesson: LESSON_TOLERANCE}, inference="forward_checking")
+    solution = csp.solve()
+
+    assert solution[lesson] == TEST_START_DATE + timedelta(hours=16)
+
+def test_overload_is_found_before_searching_it_out():
+    # five hour long sessions can't all fit between 16:00 and 20:00
+    sessions = [make_session(f"s{i}", 60, slots(0, 16, 19, 30) + [TEST_START_DATE + timedelta(hours=19)]) for i in range(5)]
+
+    solution, stats = disjunctive_csp(sessions, inference="forward_checking").solve(return_stats=True)
+    _, pairwise_stats = overlap_csp(sessions, inference="forward_checking").solve(return_stats=True)
+
+    assert solution is None
+    assert stats.nodes < pairwise_stats.nodes
+
+def test_edge_finding_pushes_a_session_after_the_ones_that_must_come_first():
+    first = make_session("first", 60, slots(0, 16, 17, 30) + [TEST_START_DATE + timedelta(hours=17)])
+    second = make_session("second", 60, slots(0, 16, 17, 30) + [TEST_START_DATE + timedelta(hours=17)])
+    late = make_session("late", 60, slots(0, 16, 20, 30))
+    assignment = {first: TEST_START_DATE + timedelta(hours=16)}
+
+    domains = disjunctive_csp([first, second, late], inference="forward_checking").initial_domains(assignment)
+    pairwise_domains = overlap_csp([first, second, late], inference="forward_checking").initial_domains(assignment)
+
+    # second has to take 17:00 so late can't start before 18:00, forward checking alone only sees the first hour taken
+    assert min(domains[late]) == TEST_START_DATE + timedelta(hours=18)
+    assert min(pairwise_domains[late]) == TEST_START_DATE + timedelta(hours=17)
@@ -0,0 +1,53 @@
+'''
+Testing the variable and value ordering heuristics of the CSP search
+'''
+import pytest
+from csp_helpers import busy_afternoon, overlap_csp, is_valid, make_session, slots
+
+@pytest.mark.parametrize("variable_ordering", ["static", "mrv", "mrv_degree"])
+@pytest.mark.parametrize("value_ordering", ["static", "lcv"])
+def test_every_ordering_finds_a_valid_solution(variable_ordering: str, value_ordering: str):
+    csp = overlap_csp(busy_afternoon(), variable_ordering=variable_ordering, value_ordering=value_ordering)
+    solution = csp.backtracking_search({})
+
+    assert solution is not None
+    assert is_valid(csp, solution)
+
+def test_static_ordering_is_the_default():
+    sessions = busy_afternoon()
+    csp = overlap_csp(sessions)
+    unassigned = list(sessions)
+
+    assert csp.select_unassigned_variable(unassigned, {}) is sessions[0]
+    assert csp.order_domain_values(sessions[0], {}) == sessions[0].domain_values
+
+def test_mrv_picks_the_most_constrained_session():
+    sessions = busy_afternoon()
+    meeting = sessions[-1]
+    csp = overlap_csp(sessions, variable_ordering="mrv")
+
+    assert csp.select_unassigned_variable(list(sessions), {}) is meeting
+
+def test_lcv_prefers_values_leaving_room_for_others():
+    early = make_session("early", 60, slots(0, 10, 11, 30))  # 10:00 or 10:30
+    late = make_session("late", 60, slots(0, 10, 11, 60))  # 10:00
+    csp = overlap_csp([early, late], value_ordering="lcv")
+
+    # any value of early that is not 10:00 leaves late without a value
+    ordered = csp.order_domain_values(early, {})
+    assert ordered[0] == early.domain_values[0]
+
+def test_neighbours_only_cover_reachable_sessions():
+    saturday = make_session("saturday", 60, slots(0, 10, 12))
+    saturday_other = make_session("saturday_other", 60, slots(0, 10, 12))
+    sunday = make_session("sunday", 60, slots(1, 10, 12))
+    csp = overlap_csp([saturday, saturday_other, sunday])
+
+    assert csp.neighbours(saturday) == {saturday_other}
+    assert csp.neighbours(sunday) == set()
+
+def test_unknown_ordering_is_rejected():
+    csp = overlap_csp(busy_afternoon(), variable_ordering="random_walk")
+
+    with pytest.raises(ValueError):
+        csp.backtracking_search({})
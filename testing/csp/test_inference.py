@@ -0,0 +1,67 @@
+'''
+Testing the forward checking and arc consistency inference of the CSP search
+'''
+import pytest
+from datetime import timedelta
+from personal_time_manager.csp.inference import forward_checking, ac3, restore
+from csp_helpers import busy_afternoon, overlap_csp, is_valid, make_session, slots
+
+def test_forward_checking_prunes_colliding_slots():
+    sessions = busy_afternoon()
+    meeting = sessions[-1]
+    csp = overlap_csp(sessions)
+    domains = {session: list(session.domain_values) for session in sessions}
+    assignment = {meeting: meeting.domain_values[0]}  # 16:00 - 17:00
+    removals = []
+
+    assert forward_checking(csp, meeting, assignment, domains, removals)
+    lesson = sessions[0]
+    # a lesson starting at 15:30 would have the meeting start in the middle of it
+    assert meeting.domain_values[0] - timedelta(minutes=30) not in domains[lesson]
+    # 16:00 starts together with the meeting and 16:30 starts in the middle of it
+    assert meeting.domain_values[0] not in domains[lesson]
+    assert len(domains[lesson]) == len(lesson.domain_values) - 3
+
+    restore(domains, removals)
+    assert domains[lesson] == lesson.domain_values
+    assert removals == []
+
+def test_forward_checking_detects_wiped_out_domain():
+    blocker = make_session("blocker", 30, slots(0, 10, 11, 60))  # 10:00
+    squeezed = make_session("squeezed", 120, slots(0, 9, 10, 30))  # 09:00 or 09:30, both contain 10:00
+    csp = overlap_csp([blocker, squeezed])
+    domains = {session: list(session.domain_values) for session in [blocker, squeezed]}
+
+    assert not forward_checking(csp, blocker, {blocker: blocker.domain_values[0]}, domains, [])
+
+def test_ac3_preprocessing_prunes_unsupported_values():
+    fixed = make_session("fixed", 60, slots(0, 12, 13, 60))  # 12:00
+    flexible = make_session("flexible", 60, slots(0, 11, 13, 30))  # 11:00 - 12:30
+    csp = overlap_csp([fixed, flexible])
+    domains = {session: list(session.domain_values) for session in [fixed, flexible]}
+
+    assert ac3(csp, {}, domains, [])
+    # 11:30 contains the fixed start, 12:00 starts with it and 12:30 starts inside the fixed session
+    assert [value.strftime("%H:%M") for value in domains[flexible]] == ["11:00"]
+
+@pytest.mark.parametrize("inference", ["forward_checking", "mac"])
+def test_inference_finds_a_valid_solution(inference: str):
+    csp = overlap_csp(busy_afternoon(), inference=inference, ac3_preprocessing=True)
+    solution = csp.backtracking_search({})
+
+    assert solution is not None
+    assert is_valid(csp, solution)
+
+def test_forward_checking_keeps_the_static_search_result():
+    plain = overlap_csp(busy_afternoon()).backtracking_search({})
+    sessions = list(plain)
+    checked = overlap_csp(sessions, inference="forward_checking").backtracking_search({})
+
+    assert [plain[session] for session in sessions] == [checked[session] for session in sessions]
+
+def test_inference_proves_unsatisfiable_week():
+    blocker = make_session("blocker", 30, slots(0, 10, 11, 60))
+    squeezed = make_session("squeezed", 120, slots(0, 9, 10, 30))
+    csp = overlap_csp([blocker, squeezed], inference="forward_checking")
+
+    assert csp.backtracking_search({}) is None
@@ -0,0 +1,99 @@
+'''
+Testing the interval index used by NoTimeOverlapConstraint
+'''
+import random
+from datetime import timedelta
+from personal_time_manager.csp.constraints import NoTimeOverlapConstraint
+from personal_time_manager.csp.interval_index import IntervalIndex, IndexedAssignment
+from csp_helpers import TEST_START_DATE, make_session, slots
+
+def test_index_keeps_sessions_sorted_by_start():
+    a, b, c = (make_session(label, 30, []) for label in "abc")
+    index = IntervalIndex()
+    index.add(c, TEST_START_DATE + timedelta(hours=3))
+    index.add(a, TEST_START_DATE + timedelta(hours=1))
+    index.add(b, TEST_START_DATE + timedelta(hours=2))
+
+    assert [session for session, _ in index.starting_from(TEST_START_DATE)] == [a, b, c]
+    assert index.starting_between(TEST_START_DATE + timedelta(hours=1), TEST_START_DATE + timedelta(hours=3)) == \
+        [(b, TEST_START_DATE + timedelta(hours=2))]
+
+    index.remove(b, TEST_START_DATE + timedelta(hours=2))
+    assert len(index) == 2
+
+def test_indexed_assignment_follows_the_dict():
+    a, b = make_session("a", 30, []), make_session("b", 30, [])
+    assignment = IndexedAssignment({a: TEST_START_DATE})
+    assignment[b] = TEST_START_DATE + timedelta(hours=1)
+    assignment[a] = TEST_START_DATE + timedelta(hours=2)  # reassigning moves the session in the index
+
+    copy = assignment.copy()
+    del assignment[b]
+
+    assert [session for session, _ in assignment.intervals.starting_from(TEST_START_DATE)] == [a]
+    assert [session for session, _ in copy.intervals.starting_from(TEST_START_DATE)] == [b, a]
+    assert copy == {a: TEST_START_DATE + timedelta(hours=2), b: TEST_START_DATE + timedelta(hours=1)}
+
+def test_constraint_gives_the_same_answer_with_and_without_index():
+    generator = random.Random(4)
+    sessions = [make_session(f"s{i}", generator.choice([15, 30, 60, 90]), slots(0, 8, 20, 15)) for i in range(30)]
+    constraints = [NoTimeOverlapConstraint(session, timedelta(minutes=0)) for session in sessions]
+
+    for _ in range(50):
+        assignment = {session: generator.choice(session.domain_values) for session in generator.sample(sessions, 10)}
+        indexed = IndexedAssignment(assignment)
+        for constraint in constraints:
+            assert constraint.satisfied(assignment) == constraint.satisfied(indexed)
+
+def test_allowed_overlaps_extend_the_session_in_time_order():
+    lesson = make_session("lesson", 60, [])
+    prayer = make_session("prayer", 15, [])
+    second_prayer = make_session("second_prayer", 15, [])
+    lesson.allowed_to_overlap_session = [prayer, second_prayer]
+    constraint = NoTimeOverlapConstraint(lesson, timedelta(minutes=5))
+
+    # the first prayer pushes the end of the lesson to 11:15 which now contains the second one
+    assignment = IndexedAssignment({
+        second_prayer: TEST_START_DATE + timedelta(hours=11, minutes=10),
+        lesson: TEST_START_DATE + timedelta(hours=10),
+        prayer: TEST_START_DATE + timedelta(hours=10, minutes=30),
+    })
+    assert constraint.satisfied(assignment)
+    assert constraint.overlapped_sessions(assignment) == [prayer, second_prayer]
+    assert constraint.duration(assignment) == timedelta(minutes=90)
+
+    # within the tolerance of the lesson start it is not allowed
+    assignment[prayer] = TEST_START_DATE + timedelta(hours=10, minutes=5)
+    assert not constraint.satisfied(assignment)
+
+def test_checks_leave_the_sessions_untouched():
+    lesson = make_session("lesson", 60, [])
+    prayer = make_session("prayer", 15, [])
+    lesson.allowed_to_overlap_session = [prayer]
+    constraint = NoTimeOverlapConstraint(lesson, timedelta(minutes=5))
+    assignment = {lesson: TEST_START_DATE, prayer: TEST_START_DATE + timedelta(minutes=30)}
+
+    assert constraint.satisfied(assignment)
+    assert constraint.duration(assignment) == timedelta(minutes=75)
+    assert lesson.duration == timedelta(minutes=60)
+    assert lesson.allowed_to_overlap_session == [prayer] and lesson.base_duration == timedelta(minutes=60)
+    assert not hasattr(lesson, "__dict__") # nothing can be cached on a Session (__slots__)
+
+def test_cached_walks_follow_the_changes_of_the_assignment():
+    generator = random.Random(7)
+    sessions = [make_session(f"s{i}", generator.choice([15, 30, 60, 90]), slots(0, 8, 14, 15)) for i in range(20)]
+    for session in sessions:
+        session.allowed_to_overlap_session = generator.sample(sessions, 3)
+    constraints = [NoTimeOverlapConstraint(session, timedelta(minutes=5)) for session in sessions]
+
+    assignment = IndexedAssignment()
+    for _ in range(300):
+        session = generator.choice(sessions)
+        if session in assignment and generator.random() < 0.3:
+            del assignment[session]
+        else:
+            assignment[session] = generator.choice(session.domain_values)
+
+        for constraint in constraints:
+            assert constraint.satisfied(assignment) == constraint.satisfied(dict(assignment))
+            assert constraint.overlapped_sessions(assignment) == constraint.overlapped_sessions(dict(assignment))
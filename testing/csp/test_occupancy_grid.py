@@ -0,0 +1,82 @@
+'''
+Testing the numpy occupancy grid pre-filter
+'''
+import random
+import pytest
+from datetime import timedelta
+from csp_helpers import TEST_START_DATE, busy_afternoon, overlap_csp, make_session, slots
+
+pytest.importorskip("numpy")
+from personal_time_manager.csp.occupancy_grid import OccupancyGrid
+
+def test_free_starts_match_the_constraint():
+    generator = random.Random(7)
+    sessions = [make_session(f"s{i}", generator.choice([15, 30, 60, 90]), slots(0, 8, 20, 5)) for i in range(25)]
+    csp = overlap_csp(sessions)
+    grid_csp = overlap_csp(sessions, occupancy_grid=True)
+
+    for _ in range(20):
+        placed = generator.sample(sessions, 8)
+        plain = {session: generator.choice(session.domain_values) for session in placed}
+        gridded = grid_csp.make_assignment(plain)
+
+        for session in sessions:
+            if session not in plain:
+                assert csp.legal_values(session, plain, csp.domains) == grid_csp.legal_values(session, gridded, grid_csp.domains)
+
+def test_free_starts_ignore_allowed_sessions():
+    lesson = make_session("lesson", 60, slots(0, 10, 11, 30))
+    prayer = make_session("prayer", 15, [TEST_START_DATE + timedelta(hours=10, minutes=40)])
+    meeting = make_session("meeting", 30, [TEST_START_DATE + timedelta(hours=11)])
+    lesson.allowed_to_overlap_session = [prayer]
+    grid = OccupancyGrid.for_domains({session: session.domain_values for session in [lesson, prayer, meeting]})
+
+    grid.place(prayer, prayer.domain_values[0])
+    assert grid.free_starts(lesson, lesson.domain_values) == lesson.domain_values
+
+    grid.place(meeting, meeting.domain_values[0])
+    assert grid.free_starts(lesson, lesson.domain_values) == lesson.domain_values[:1]  # 10:30 contains 11:00
+
+    grid.remove(meeting)
+    assert grid.free_starts(lesson, lesson.domain_values) == lesson.domain_values
+
+@pytest.mark.parametrize("inference", ["none", "forward_checking"])
+def test_grid_keeps_the_solution(inference: str):
+    sessions = busy_afternoon()
+    expected = overlap_csp(sessions, inference=inference).solve()
+
+    assert overlap_csp(sessions, inference=inference, occupancy_grid=True).solve() == expected
+    assert overlap_csp(sessions, inference=inference, occupancy_grid=True).solve(engine="recursive") == expected
+
+def test_grid_rejects_starts_outside_of_it():
+    lesson = make_session("lesson", 60, slots(0, 10, 11, 30))
+    grid = OccupancyGrid.for_domains({lesson: lesson.domain_values})
+
+    with pytest.raises(ValueError):
+        grid.place(lesson, TEST_START_DATE)  # before the origin, would wrap to the end of the grid
+    with pytest.raises(ValueError):
+        grid.place(lesson, TEST_START_DATE + timedelta(days=1))
+
+def test_grid_spans_the_given_assignment():
+    lesson = make_session("lesson", 60, slots(0, 10, 11, 30))
+    early = make_session("early", 30, slots(0, 8, 9, 30))
+    csp = overlap_csp([lesson, early], occupancy_grid=True)
+    # a start outside of the domain, the constraint rejects it but the grid has to hold it
+    assignment = csp.make_assignment({early: TEST_START_DATE + timedelta(hours=7)})
+
+    assert assignment.grid.origin == TEST_START_DATE + timedelta(hours=7)
+
+def test_copies_keep_their_own_prefix_sums():
+    lesson = make_session("lesson", 60, slots(0, 10, 12, 30))
+    first = make_session("first", 30, [TEST_START_DATE + timedelta(hours=10)])
+    second = make_session("second", 30, [TEST_START_DATE + timedelta(hours=11)])
+    grid = OccupancyGrid.for_domains({session: session.domain_values for session in [lesson, first, second]})
+    grid.place(first, first.domain_values[0])
+    copy = grid.copy()
+
+    copy.place(second, second.domain_values[0])
+    assert grid.free_starts(lesson, lesson.domain_values) == lesson.domain_values[1:]
+    assert copy.free_starts(lesson, lesson.domain_values) == lesson.domain_values[3:]
+    grid.remove(first)
+    assert grid.free_starts(lesson, lesson.domain_values) == lesson.domain_values
+    assert copy.free_starts(lesson, lesson.domain_values) == lesson.domain_values[3:]
@@ -0,0 +1,71 @@
+'''
+Testing the soft constraints and the branch and bound optimization
+'''
+from datetime import time, timedelta
+from personal_time_manager.csp.constraints import GapPenalty, PreferredHoursPenalty
+from csp_helpers import TEST_START_DATE, overlap_csp, is_valid, make_session, slots
+
+def evening_lessons() -> list:
+    return [make_session(f"lesson_{i}", 60, slots(0, 12, 22, 60)) for i in range(3)]
+
+def test_preferred_hours_penalty():
+    lesson = make_session("lesson", 60, [])
+    penalty = PreferredHoursPenalty([lesson], time(9), time(20))
+
+    assert penalty.penalty({lesson: TEST_START_DATE + timedelta(hours=10)}) == 0
+    assert penalty.penalty({lesson: TEST_START_DATE + timedelta(hours=19, minutes=30)}) == 30
+    assert penalty.penalty({lesson: TEST_START_DATE + timedelta(hours=8, minutes=15)}) == 45
+
+def test_gap_penalty_counts_idle_minutes_per_day():
+    a, b, c = (make_session(label, 60, []) for label in "abc")
+    penalty = GapPenalty([a, b, c])
+    assignment = {
+        a: TEST_START_DATE + timedelta(hours=10),
+        b: TEST_START_DATE + timedelta(hours=12, minutes=30),  # 90 minutes after a ends
+        c: TEST_START_DATE + timedelta(days=1, hours=10),  # alone on sunday
+    }
+    assert penalty.penalty(assignment) == 90
+
+def test_optimize_finds_the_best_timetable():
+    lessons = evening_lessons()
+    csp = overlap_csp(lessons)
+    csp.add_soft_constraint(PreferredHoursPenalty(lessons, time(9), time(18)))
+    csp.add_soft_constraint(GapPenalty(lessons))
+
+    improvements = []
+    solution, cost = csp.optimize(on_improvement=lambda solution, cost: improvements.append(cost))
+
+    assert is_valid(csp, solution)
+    assert cost == 0
+    assert improvements == sorted(improvements, reverse=True) and improvements[-1] == cost
+
+def test_first_solution_is_not_the_best():
+    lessons = evening_lessons()
+    csp = overlap_csp(lessons)
+    csp.add_soft_constraint(PreferredHoursPenalty(lessons, time(17), time(22)))
+
+    assert csp.cost(csp.solve()) > 0
+    assert csp.optimize()[1] == 0
+
+def test_budget_returns_best_so_far():
+    lessons = evening_lessons()
+    csp = overlap_csp(lessons)
+    csp.add_soft_constraint(PreferredHoursPenalty(lessons, time(17), time(22)))
+
+    solution, cost = csp.optimize(node_budget=3)
+    assert is_valid(csp, solution)
+    assert cost > 0
+
+    assert csp.optimize(node_budget=0) == (None, float("inf"))
+
+def test_k_best_by_cost_matches_sorting_every_solution():
+    lessons = evening_lessons()
+    csp = overlap_csp(lessons)
+    csp.add_soft_constraint(PreferredHoursPenalty(lessons, time(9), time(18)))
+    csp.add_soft_constraint(GapPenalty(lessons))
+
+    best = list(csp.iter_solutions(limit=5, order_by="cost"))
+    every_cost = sorted(csp.cost(solution) for solution in csp.iter_solutions())
+
+    assert [csp.cost(solution) for solution in best] == every_cost[:5]
+    assert all(is_valid(csp, solution) for solution in best)
@@ -0,0 +1,77 @@
+'''
+Testing the multi-week planner
+'''
+from datetime import datetime, timedelta
+from personal_time_manager.csp.heuristics import WarmStartOrdering
+from personal_time_manager.csp.planner import plan_weeks, week_starts
+from csp_helpers import TEST_START_DATE, Block, overlap_csp, is_valid
+from personal_time_manager.sessions.base_session import Session
+
+def afternoon_week(week_start: datetime, **csp_options):
+    '''
+    four lessons and a meeting fighting for the same saturday afternoon of the week
+    the lessons come first, a cold search fills the meeting's hour with them and has to backtrack
+    '''
+    def starts(first_hour: int, count: int) -> list[datetime]:
+        first = week_start + timedelta(hours=first_hour)
+        return [first + timedelta(minutes=30 * i) for i in range(count)]
+
+    lessons = [Session(Block(f"lesson_{i}"), timedelta(minutes=60), starts(14, 12)) for i in range(4)]
+    meeting = Session(Block("meeting"), timedelta(minutes=60), starts(16, 1))
+    return overlap_csp([*lessons, meeting], **csp_options)
+
+def test_week_starts_are_the_saturdays_of_the_range():
+    starts = week_starts(TEST_START_DATE + timedelta(days=3, hours=10), TEST_START_DATE + timedelta(days=15))
+
+    assert starts == [TEST_START_DATE, TEST_START_DATE + timedelta(days=7), TEST_START_DATE + timedelta(days=14)]
+    assert all(start.weekday() == 5 for start in starts)
+
+def test_every_week_is_solved_in_order():
+    built = []
+    def build_week(week_start, **csp_options):
+        built.append(afternoon_week(week_start, **csp_options))
+        return built[-1]
+
+    plans = list(plan_weeks(TEST_START_DATE, TEST_START_DATE + timedelta(weeks=3), build_week,
+                            variable_ordering="mrv", inference="forward_checking"))
+
+    assert [week_start for week_start, _ in plans] == week_starts(TEST_START_DATE, TEST_START_DATE + timedelta(weeks=3))
+    for csp, (week_start, solution) in zip(built, plans):
+        assert is_valid(csp, solution)
+        assert all(start >= week_start for start in solution.values())
+
+def test_warm_start_keeps_the_timetable_and_skips_the_backtracking():
+    built = []
+    def build_week(week_start, **csp_options):
+        built.append(afternoon_week(week_start, **csp_options))
+        return built[-1]
+
+    (_, first), (_, second) = plan_weeks(TEST_START_DATE, TEST_START_DATE + timedelta(weeks=1), build_week)
+
+    # same timetable a week later
+    assert [start - timedelta(weeks=1) for start in second.values()] == list(first.values())
+    assert isinstance(built[1].value_ordering, WarmStartOrdering)
+
+    _, warm_stats = built[1].solve(return_stats=True)
+    _, cold_stats = afternoon_week(TEST_START_DATE + timedelta(weeks=1)).solve(return_stats=True)
+    assert warm_stats.backtracks == 0
+    assert warm_stats.nodes < cold_stats.nodes
+
+def test_warm_start_can_be_turned_off():
+    built = []
+    def build_week(week_start, **csp_options):
+        built.append(afternoon_week(week_start, **csp_options))
+        return built[-1]
+
+    list(plan_weeks(TEST_START_DATE, TEST_START_DATE + timedelta(weeks=1), build_week, warm_start=False))
+
+    assert all(csp.value_ordering == "static" for csp in built)
+
+def test_hint_outside_the_domain_is_ignored():
+    csp = afternoon_week(TEST_START_DATE)
+    lesson = csp.variables[0]
+    ordering = WarmStartOrdering({lesson: TEST_START_DATE + timedelta(days=3)})
+
+    assert ordering(csp, lesson, {}, csp.domains) == lesson.domain_values
+    hinted = WarmStartOrdering({lesson: lesson.domain_values[4]})(csp, lesson, {}, csp.domains)
+    assert hinted[0] == lesson.domain_values[4] and sorted(hinted) == lesson.domain_values
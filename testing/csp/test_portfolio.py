@@ -0,0 +1,73 @@
+'''
+Testing the parallel portfolio solving
+'''
+import pickle
+import threading
+import time
+import pytest
+from personal_time_manager.csp.portfolio import configure, _run_configuration, CANCELLED, SOLVED
+from personal_time_manager.csp.worker_pool import WorkerPool, _init_worker
+from csp_helpers import busy_afternoon, overlap_csp, is_valid, make_session, slots
+
+def test_csp_is_picklable():
+    csp = overlap_csp(busy_afternoon())
+    copy = pickle.loads(pickle.dumps(csp))
+
+    assert len(copy.variables) == len(csp.variables)
+    assert all(copy.variables[0] in constraint.variables for constraint in copy.constraints[copy.variables[0]])
+
+def test_worker_returns_solution_by_variable_index():
+    csp = overlap_csp(busy_afternoon())
+    status, solution = _run_configuration(csp, {"variable_ordering": "mrv"})
+
+    assert status == SOLVED
+    assert is_valid(csp, {csp.variables[index]: value for index, value in solution.items()})
+
+def test_portfolio_returns_a_valid_solution():
+    csp = overlap_csp(busy_afternoon())
+    solution = csp.solve_portfolio(max_workers=2)
+
+    assert is_valid(csp, solution)
+    assert list(solution) == csp.variables # in the order of the variables like solve()
+
+def test_portfolio_proves_unsatisfiable():
+    blocker = make_session("blocker", 30, slots(0, 10, 11, 60))
+    squeezed = make_session("squeezed", 120, slots(0, 9, 10, 30))
+    csp = overlap_csp([blocker, squeezed])
+
+    assert csp.solve_portfolio([{"variable_ordering": "static"}, {"inference": "forward_checking"}]) is None
+
+def test_seeded_configuration_is_reproducible():
+    csp = overlap_csp(busy_afternoon())
+    configuration = {"variable_ordering": "mrv_random", "value_ordering": "random", "seed": 3}
+
+    assert configure(csp, configuration).solve() == configure(csp, configuration).solve()
+
+def test_unknown_configuration_is_rejected():
+    with pytest.raises(ValueError):
+        overlap_csp(busy_afternoon()).solve_portfolio([{"threads": 4}])
+
+def test_worker_stops_on_values_failing_the_inference():
+    # 12 one hour lessons in 11 hours: MAC rejects nearly every value before it becomes a node
+    lessons = [make_session(f"lesson_{i}", 60, slots(0, 9, 19, 5)) for i in range(12)]
+    stop_event = threading.Event()
+    stop_event.set()
+    _init_worker(stop_event)
+    try:
+        start = time.perf_counter()
+        status, _ = _run_configuration(overlap_csp(lessons), {"inference": "mac"})
+    finally:
+        _init_worker(None)
+
+    assert status == CANCELLED
+    assert time.perf_counter() - start < 0.5
+
+def test_workers_still_running_after_the_grace_are_terminated():
+    # time.sleep never checks the stop event
+    pool = WorkerPool(2, grace=0.2)
+    with pool:
+        for index, _ in pool.as_completed(time.sleep, [(0,), (60,)]):
+            break
+        start = time.perf_counter()
+    assert time.perf_counter() - start < 5
+    assert index == 0
@@ -0,0 +1,48 @@
+'''
+Testing the min-conflicts repair of a previous solution
+'''
+from datetime import timedelta
+from personal_time_manager.csp.repair import carry_over, min_conflicts
+from csp_helpers import TEST_START_DATE, Block, busy_afternoon, overlap_csp, is_valid, make_session, slots
+
+def week() -> list:
+    lessons = [make_session(f"lesson_{day}_{i}", 60, slots(day, 14, 20, 30)) for day in range(3) for i in range(3)]
+    prayers = [make_session(f"prayer_{day}", 15, [TEST_START_DATE + timedelta(days=day, hours=16, minutes=40)]) for day in range(3)]
+    return prayers + lessons  # the fixed prayers first, the static search places the lessons around them
+
+def test_unchanged_problem_keeps_the_previous_solution():
+    csp = overlap_csp(week())
+    previous = csp.solve()
+
+    assert csp.repair(previous) == previous
+
+def test_moved_prayer_only_moves_its_neighbours():
+    sessions = week()
+    previous = overlap_csp(sessions).solve()
+
+    # the saturday prayer moves into the middle of a lesson, rebuilt as a new Session like a new week of Prayers would be
+    moved = make_session("prayer_0", 15, [TEST_START_DATE + timedelta(hours=14, minutes=20)])
+    new_sessions = [moved if session.session_descriptor == Block("prayer_0") else session for session in sessions]
+    csp = overlap_csp(new_sessions)
+
+    repaired = min_conflicts(csp, previous)
+    assert is_valid(csp, repaired)
+    assert repaired[moved] == moved.domain_values[0]
+
+    untouched_days = [session for session in new_sessions if session.session_descriptor.label.split("_")[1] != "0"]
+    assert all(repaired[session] == previous[session] for session in untouched_days)
+
+def test_carry_over_drops_values_outside_the_domain():
+    sessions = busy_afternoon()
+    csp = overlap_csp(sessions)
+    previous = {sessions[0]: TEST_START_DATE, sessions[1]: sessions[1].domain_values[0]}
+
+    assert carry_over(csp, previous) == {sessions[1]: sessions[1].domain_values[0]}
+
+def test_repair_falls_back_to_full_search():
+    csp = overlap_csp(busy_afternoon())
+    lessons = csp.variables[:-1]
+    staggered = {lesson: lesson.domain_values[index] for index, lesson in enumerate(lessons)}  # each one starts inside the previous
+
+    assert min_conflicts(csp, staggered, max_steps=0) is None
+    assert is_valid(csp, csp.repair(staggered, max_steps=0))
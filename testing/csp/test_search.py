@@ -0,0 +1,94 @@
+'''
+Testing the iterative search engine against the recursive backtracking search
+'''
+import sys
+import pytest
+from datetime import timedelta
+from csp_helpers import TEST_START_DATE, busy_afternoon, overlap_csp, is_valid, make_session, slots
+
+CONFIGURATIONS = [
+    dict(),
+    dict(variable_ordering="mrv"),
+    dict(variable_ordering="mrv_degree", value_ordering="lcv"),
+    dict(inference="forward_checking"),
+    dict(variable_ordering="mrv", inference="mac", ac3_preprocessing=True),
+]
+
+@pytest.mark.parametrize("configuration", CONFIGURATIONS)
+def test_iterative_matches_recursive(configuration: dict):
+    sessions = busy_afternoon()
+    csp = overlap_csp(sessions, **configuration)
+
+    recursive = csp.solve(engine="recursive")
+    iterative = csp.solve(engine="iterative")
+
+    assert iterative == recursive
+    assert is_valid(csp, iterative)
+
+def test_iterative_extends_partial_assignment():
+    sessions = busy_afternoon()
+    first_lesson = sessions[0]
+    partial = {first_lesson: first_lesson.domain_values[-1]}
+    csp = overlap_csp(sessions)
+
+    solution = csp.solve(partial)
+    assert solution[first_lesson] == first_lesson.domain_values[-1]
+    assert partial == {first_lesson: first_lesson.domain_values[-1]}  # the passed assignment isn't mutated
+    assert solution == csp.solve(partial, engine="recursive")
+
+def test_iterative_reports_no_solution():
+    blocker = make_session("blocker", 30, slots(0, 10, 11, 60))
+    squeezed = make_session("squeezed", 120, slots(0, 9, 10, 30))
+    csp = overlap_csp([blocker, squeezed])
+
+    assert csp.solve() is None
+
+def test_iterative_search_has_no_recursion_limit():
+    count = sys.getrecursionlimit() + 100
+    sessions = [make_session(f"block_{i}", 30, [TEST_START_DATE + timedelta(hours=i)]) for i in range(count)]
+    csp = overlap_csp(sessions)
+
+    solution = csp.solve()
+    assert len(solution) == count
+
+def test_backtracking_search_default_assignment_is_not_shared():
+    csp = overlap_csp(busy_afternoon())
+
+    assert csp.backtracking_search() == csp.backtracking_search()
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError):
+        overlap_csp(busy_afternoon()).solve(engine="quantum")
+
+def test_iter_solutions_enumerates_lazily():
+    lessons = [make_session(f"lesson_{i}", 60, slots(0, 14, 17, 60)) for i in range(3)]
+    csp = overlap_csp(lessons)
+
+    solutions = list(csp.iter_solutions())
+    assert len(solutions) == 6  # 3 lessons in 3 hours, every order
+    assert all(is_valid(csp, solution) for solution in solutions)
+    assert len({tuple(solution.values()) for solution in solutions}) == 6
+
+    first_two = csp.iter_solutions(limit=2)
+    assert next(first_two) == solutions[0] and next(first_two) == solutions[1]
+    assert next(first_two, None) is None
+
+def test_iter_solutions_keeps_the_k_best():
+    lessons = [make_session(f"lesson_{i}", 60, slots(0, 14, 18, 60)) for i in range(3)]
+    csp = overlap_csp(lessons)
+    latest_end = lambda solution: (max(solution.values()) - TEST_START_DATE) / timedelta(minutes=1)
+
+    best = list(csp.iter_solutions(limit=4, order_by=latest_end))
+    everything = sorted(csp.iter_solutions(), key=latest_end)
+
+    assert [latest_end(solution) for solution in best] == [latest_end(solution) for solution in everything[:4]]
+    with pytest.raises(ValueError):
+        csp.iter_solutions(order_by=latest_end)
+
+@pytest.mark.parametrize("order_by", [None, "cost", len])
+def test_iter_solutions_with_a_zero_limit_is_empty(order_by):
+    csp = overlap_csp(busy_afternoon())
+
+    assert list(csp.iter_solutions(limit=0, order_by=order_by)) == []
+    with pytest.raises(ValueError):
+        csp.iter_solutions(limit=-1, order_by=order_by)
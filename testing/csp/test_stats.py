@@ -0,0 +1,57 @@
+'''
+Testing the solver statistics
+'''
+import pytest
+from personal_time_manager.csp.stats import SolverStats
+from csp_helpers import busy_afternoon, overlap_csp, make_session, slots
+
+def test_stats_are_returned_with_the_solution():
+    csp = overlap_csp(busy_afternoon())
+    solution, stats = csp.solve(return_stats=True)
+
+    assert solution == csp.solve()
+    assert stats.solved
+    assert stats.nodes >= len(csp.variables)
+    assert stats.max_depth == len(csp.variables)
+    assert stats.constraint_checks["NoTimeOverlapConstraint"] >= stats.nodes
+    assert stats.constraint_seconds["NoTimeOverlapConstraint"] > 0
+    assert stats.elapsed_seconds >= stats.constraint_seconds["NoTimeOverlapConstraint"]
+
+def test_backtracks_are_counted_on_unsatisfiable_week():
+    blocker = make_session("blocker", 30, slots(0, 10, 11, 60))
+    squeezed = make_session("squeezed", 120, slots(0, 9, 10, 30))
+    solution, stats = overlap_csp([blocker, squeezed]).solve(return_stats=True)
+
+    assert solution is None
+    assert not stats.solved
+    assert stats.backtracks == 2  # squeezed then blocker ran out of values
+
+def test_progress_callback():
+    csp = overlap_csp(busy_afternoon())
+    progress = []
+    solution = csp.solve(on_progress=lambda stats: progress.append(stats.nodes), progress_interval=2)
+
+    assert solution == csp.solve()
+    assert progress and progress[-1] == max(progress)
+
+def test_given_stats_survive_a_stopped_search():
+    checks = []
+    def check():
+        checks.append(None)
+        if len(checks) > 5:
+            raise TimeoutError()
+
+    stats = SolverStats()
+    with pytest.raises(TimeoutError):
+        overlap_csp(busy_afternoon()).solve(check=check, stats=stats)
+    assert stats.nodes > 0 # no progress report was made, the nodes are still counted
+
+def test_csp_is_not_left_instrumented():
+    csp = overlap_csp(busy_afternoon())
+    csp.solve(return_stats=True)
+
+    assert "consistent" not in vars(csp)
+
+def test_stats_need_the_iterative_engine():
+    with pytest.raises(ValueError):
+        overlap_csp(busy_afternoon()).solve(engine="recursive", return_stats=True)
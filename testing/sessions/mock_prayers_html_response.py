@@ -69,3 +69,31 @@ athan_api_data = {"06-12-2025": {'code': 200, 'status': 'OK', 'data': {'timings'
 "12-12-2025": {'code': 200, 'status': 'OK', 'data': {'timings': {'Fajr': '04:46', 'Sunrise': '06:03', 'Dhuhr': '13:01', 'Asr': '16:37', 'Sunset': '19:59', 'Maghrib': '19:59', 'Isha': '21:16', 'Imsak': '04:36', 'Midnight': '01:01', 'Firstthird': '23:21', 'Lastthird': '02:42'}, 'date': {'readable': '11 Jul 2025', 'timestamp': '1752206400', 'hijri': {'date': '16-01-1447', 'format': 'DD-MM-YYYY', 'day': '16', 'weekday': {'en': "Al Juma'a", 'ar': 'الجمعة'}, 'month': {'number': 1, 'en': 'Muḥarram', 'ar': 'مُحَرَّم', 'days': 30}, 'year': '1447', 'designation': {'abbreviated': 'AH', 'expanded': 'Anno Hegirae'}, 'holidays': ['Birth of Shaykh Jamaluddin al-Ghumuqi al-Husayni ق'], 'adjustedHolidays': [], 'method': 'HJCoSA'}, 'gregorian': {'date': '11-07-2025', 'format': 'DD-MM-YYYY', 'day': '11', 'weekday': {'en': 'Friday'}, 'month': {'number': 7, 'en': 'July'}, 'year': '2025', 'designation': {'abbreviated': 'AD', 'expanded': 'Anno Domini'}, 'lunarSighting': False}}, 'meta': {'latitude': 29.95409, 'longitude': 31.067551, 'timezone': 'Africa/Cairo', 'method': {'id': 2, 'name': 'Islamic Society of North America (ISNA)', 'params': {'Fajr': 15, 'Isha': 15}, 'location': {'latitude': 39.70421229999999, 'longitude': -86.39943869999999}}, 'latitudeAdjustmentMethod': 'ANGLE_BASED', 'midnightMode': 'STANDARD', 'school': 'STANDARD', 'offset': {'Imsak': 0, 'Fajr': 0, 'Sunrise': 0, 'Dhuhr': 0, 'Asr': 0, 'Maghrib': 0, 'Sunset': 0, 'Isha': 0, 'Midnight': 0}}}}}
 
 # print(athan_api_data['06-12-2025'])
+
+
+class MockAladhanSession:
+    '''
+    stands in for the requests.Session of AladhanCalendarProvider, answering the calendar endpoint
+    with the recorded days above (the days of the month that weren't recorded are left out)
+    '''
+    def __init__(self):
+        self.requested: list[str] = []
+
+    def get(self, url: str, params: dict = None, timeout: float = None) -> "MockResponse":
+        self.requested.append(url)
+        year, month = map(int, url.rstrip("/").split("/")[-2:])
+        days = [{"timings": {name: f"{value} (EET)" for name, value in day["data"]["timings"].items()},
+                 "date": {"gregorian": {"date": date}}}
+                for date, day in athan_api_data.items() if date.endswith(f"-{month:02d}-{year}")]
+        return MockResponse({"code": 200, "status": "OK", "data": days})
+
+
+class MockResponse:
+    def __init__(self, data: dict):
+        self.data = data
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> dict:
+        return self.data
@@ -0,0 +1,177 @@
+'''
+Testing the incremental calendar sync against a local stand-in of the Calendar api
+'''
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+from test_base_session import TEST_START_DATE
+from personal_time_manager.sessions.google_calender import CalendarSync, EventStore, GoogleCalendar, GoogleCalendarClient
+from personal_time_manager.csp.planner import WeekCache, build_week_csp
+
+PAGE_SIZE = 2
+
+class FakeCalendar:
+    '''
+    events.list of one calendar: pages of PAGE_SIZE events, sync tokens being the version of the calendar they were given at
+    '''
+    def __init__(self):
+        self.version = 0
+        self.events: dict[str: tuple[int, dict]] = {} # id: (version it last changed at, event)
+        self.requests: list[dict] = []
+        self.oldest_token = 0 # older sync tokens get 410 Gone
+
+    def put(self, event: dict) -> None:
+        self.version += 1
+        self.events[event["id"]] = (self.version, event)
+
+    def delete(self, event_id: str) -> None:
+        self.put({"id": event_id, "status": "cancelled"})
+
+    def answer(self, params: dict) -> tuple[int, dict]:
+        self.requests.append(params)
+        since = int(params.get("syncToken", 0))
+        if "syncToken" in params and since < self.oldest_token:
+            return 410, {"error": {"code": 410, "message": "Sync token is no longer valid"}}
+
+        items = [event for version, event in self.events.values()
+                 if version > since and ("syncToken" in params or event.get("status") != "cancelled")]
+        first = int(params.get("pageToken", 0))
+        page = {"items": items[first:first + PAGE_SIZE]}
+        if first + PAGE_SIZE < len(items):
+            page["nextPageToken"] = str(first + PAGE_SIZE)
+        else:
+            page["nextSyncToken"] = str(self.version)
+        return 200, page
+
+@pytest.fixture
+def calendar():
+    fake = FakeCalendar()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            assert url.path == "/calendar/v3/calendars/me%40example.com/events"
+            status, body = fake.answer({key: values[0] for key, values in parse_qs(url.query).items()})
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps(body).encode())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fake.url = f"http://127.0.0.1:{server.server_port}/calendar/v3"
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+def meeting(event_id: str, start: datetime, minutes: int = 60, **extra) -> dict:
+    # the api gives the times with their offset, Cairo is +02:00 in december
+    return {"id": event_id, "status": "confirmed", "summary": event_id,
+            "start": {"dateTime": start.isoformat() + "+02:00"},
+            "end": {"dateTime": (start + timedelta(minutes=minutes)).isoformat() + "+02:00"}, **extra}
+
+def make_sync(calendar, store=None) -> CalendarSync:
+    return CalendarSync(GoogleCalendarClient("me@example.com", "token", base_url=calendar.url), store)
+
+def names(group: GoogleCalendar) -> list[str]:
+    return [session.session_descriptor.event_id for session in group.csp_variables]
+
+def test_full_then_incremental_sync(calendar):
+    calendar.put(meeting("standup", TEST_START_DATE + timedelta(hours=9), 30))
+    calendar.put(meeting("review", TEST_START_DATE + timedelta(days=2, hours=14)))
+    calendar.put(meeting("next_week", TEST_START_DATE + timedelta(days=8, hours=10)))
+    calendar.put({**meeting("holiday", TEST_START_DATE), "start": {"date": "2025-12-06"}, "end": {"date": "2025-12-07"}})
+    calendar.put(meeting("focus", TEST_START_DATE + timedelta(hours=11), transparency="transparent"))
+    sync = make_sync(calendar)
+
+    week = GoogleCalendar(TEST_START_DATE, sync).load()
+    assert names(week) == ["standup", "review"]
+    assert week.csp_variables[0].domain_values == [TEST_START_DATE + timedelta(hours=9)]
+    assert week.csp_variables[0].base_duration == timedelta(minutes=30)
+    assert len(calendar.requests) == 3 # the 5 events in pages of 2
+
+    # nothing changed: one request with the sync token, the same sessions and nothing to rebuild
+    again = GoogleCalendar(TEST_START_DATE, sync).load()
+    assert calendar.requests[-1]["syncToken"] == "5" and len(calendar.requests) == 4
+    assert again.version == week.version
+    assert all(a is b for a, b in zip(again.csp_variables, week.csp_variables))
+
+def test_only_changed_events_get_new_sessions(calendar):
+    calendar.put(meeting("standup", TEST_START_DATE + timedelta(hours=9), 30))
+    calendar.put(meeting("review", TEST_START_DATE + timedelta(days=2, hours=14)))
+    calendar.put(meeting("next_week", TEST_START_DATE + timedelta(days=8, hours=10)))
+    sync = make_sync(calendar)
+    before = GoogleCalendar(TEST_START_DATE, sync).load()
+    following_week = GoogleCalendar(TEST_START_DATE + timedelta(days=7), sync).load()
+
+    calendar.put(meeting("review", TEST_START_DATE + timedelta(days=2, hours=16)))
+    after = GoogleCalendar(TEST_START_DATE, sync).load()
+    assert after.version != before.version
+    assert after.csp_variables[0] is before.csp_variables[0]
+    assert after.csp_variables[1].domain_values == [TEST_START_DATE + timedelta(days=2, hours=16)]
+    # the change was in another week
+    assert GoogleCalendar(TEST_START_DATE + timedelta(days=7), sync).load().version == following_week.version
+    assert following_week.csp_variables
+
+    calendar.delete("standup")
+    after_delete = GoogleCalendar(TEST_START_DATE, sync).load()
+    assert after_delete.version != after.version and names(after_delete) == ["review"]
+
+def test_every_reader_sees_the_change(calendar):
+    calendar.put(meeting("standup", TEST_START_DATE + timedelta(hours=9), 30))
+    sync = make_sync(calendar)
+    first_reader, second_reader = GoogleCalendar(TEST_START_DATE, sync).load(), GoogleCalendar(TEST_START_DATE, sync).load()
+
+    calendar.put(meeting("standup", TEST_START_DATE + timedelta(hours=10), 30))
+    # reading the week once doesn't hide the change from the next reader
+    assert GoogleCalendar(TEST_START_DATE, sync).load().version != first_reader.version
+    assert GoogleCalendar(TEST_START_DATE, sync).load().version != second_reader.version
+
+def test_unchanged_week_reuses_its_csp(calendar):
+    calendar.put(meeting("standup", TEST_START_DATE + timedelta(hours=9), 30))
+    calendar.put(meeting("review", TEST_START_DATE + timedelta(days=2, hours=14)))
+    meetings = type("Meetings", (GoogleCalendar,), {"SYNC": make_sync(calendar)})
+    cache = WeekCache()
+
+    first = build_week_csp(TEST_START_DATE, (meetings,), cache=cache, variable_ordering="mrv")
+    second = build_week_csp(TEST_START_DATE, (meetings,), cache=cache, variable_ordering="mrv")
+    assert second.constraints is first.constraints and second.variables is first.variables
+    assert (cache.hits, cache.misses) == (1, 1)
+    # other options are another csp
+    build_week_csp(TEST_START_DATE, (meetings,), cache=cache)
+    assert cache.misses == 2
+
+    calendar.put(meeting("review", TEST_START_DATE + timedelta(days=2, hours=16)))
+    rebuilt = build_week_csp(TEST_START_DATE, (meetings,), cache=cache, variable_ordering="mrv")
+    assert rebuilt.constraints is not first.constraints
+    assert rebuilt.variables[1].domain_values == [TEST_START_DATE + timedelta(days=2, hours=16)]
+
+def test_expired_sync_token_lists_everything_again(calendar):
+    calendar.put(meeting("standup", TEST_START_DATE + timedelta(hours=9), 30))
+    sync = make_sync(calendar)
+    GoogleCalendar(TEST_START_DATE, sync).load()
+
+    calendar.delete("standup")
+    calendar.put(meeting("review", TEST_START_DATE + timedelta(days=2, hours=14)))
+    calendar.oldest_token = calendar.version
+    week = GoogleCalendar(TEST_START_DATE, sync).load()
+
+    assert "syncToken" not in calendar.requests[-1]
+    assert names(week) == ["review"] and week.version == 1
+
+def test_store_survives_a_restart(calendar, tmp_path):
+    calendar.put(meeting("standup", TEST_START_DATE + timedelta(hours=9), 30))
+    GoogleCalendar(TEST_START_DATE, make_sync(calendar, EventStore(str(tmp_path / "events.json")))).load()
+
+    restarted = GoogleCalendar(TEST_START_DATE, make_sync(calendar, EventStore(str(tmp_path / "events.json")))).load()
+    assert names(restarted) == ["standup"]
+    assert calendar.requests[-1]["syncToken"] == "1"
+
+def test_no_calendar_configured():
+    assert GoogleCalendar(TEST_START_DATE, None).load().csp_variables == []
@@ -0,0 +1,69 @@
+'''
+Testing the concurrent loading of the input sources of a week
+'''
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+import pytest
+from test_base_session import TEST_START_DATE
+from personal_time_manager.sessions.base_session import Session, SessionDescriptor, SessionGroup
+from personal_time_manager.sessions.loading import load_session_groups, load_week
+
+LATENCY = 0.3 # seconds every fake source waits, like a network call
+
+@dataclass(frozen=True)
+class Block(SessionDescriptor):
+    label: str
+
+    @property
+    def name(self):
+        return self.label
+
+class SlowSource(SessionGroup):
+    LABEL = "slow"
+    DELAY = LATENCY
+
+    def load(self) -> SessionGroup:
+        time.sleep(self.DELAY)
+        self._csp_variables = [Session(Block(f"{self.LABEL}_{i}"), timedelta(minutes=30),
+                                       [self.week_start_date + timedelta(hours=10 + i)]) for i in range(2)]
+        return self
+
+    @property
+    def csp_variables(self) -> list[Session]:
+        return self._csp_variables
+
+    @property
+    def csp_domains(self) -> dict:
+        return {session: session.domain_values for session in self.csp_variables}
+
+class OtherSource(SlowSource):
+    LABEL = "other"
+
+class ThirdSource(SlowSource):
+    LABEL = "third"
+
+class StuckSource(SlowSource):
+    LABEL = "stuck"
+    DELAY = 5 * LATENCY
+    LOAD_TIMEOUT = LATENCY
+
+def test_sources_load_at_the_same_time():
+    start = time.perf_counter()
+    variables, domains = load_week(TEST_START_DATE, (SlowSource, OtherSource, ThirdSource))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 2 * LATENCY # not the 3 latencies of loading them one after the other
+    assert [variable.session_descriptor.name for variable in variables] == [
+        "slow_0", "slow_1", "other_0", "other_1", "third_0", "third_1"]
+    assert all(domains[variable] is variable.domain_values for variable in variables)
+
+def test_late_source():
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError, match="StuckSource"):
+        load_session_groups(TEST_START_DATE, (SlowSource, StuckSource))
+    assert time.perf_counter() - start < 3 * LATENCY
+
+def test_timeout_per_source():
+    groups = load_session_groups(TEST_START_DATE, (SlowSource, StuckSource), timeouts={StuckSource: 10 * LATENCY})
+    assert [type(group) for group in groups] == [SlowSource, StuckSource]
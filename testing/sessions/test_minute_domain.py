@@ -0,0 +1,133 @@
+'''
+Testing the compact domain of start times
+'''
+import pickle
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import pytest
+from personal_time_manager.csp.cache import fingerprint
+from personal_time_manager.csp.constraints import NoTimeOverlapConstraint
+from personal_time_manager.csp.csp import CSP
+from personal_time_manager.sessions.base_session import Session, SessionDescriptor
+from personal_time_manager.sessions.minute_domain import MinuteDomain
+
+TEST_START_DATE = datetime(2025, 12, 6)  # Saturday
+
+@dataclass(frozen=True)
+class Block(SessionDescriptor):
+    label: str
+
+    @property
+    def name(self):
+        return self.label
+
+def afternoon(step_minutes: int = 30) -> list[datetime]:
+    first = TEST_START_DATE + timedelta(hours=14)
+    return [first + timedelta(minutes=step_minutes * i) for i in range(12)]
+
+def build_csp(compact: bool, **kwargs) -> CSP:
+    starts = afternoon()
+    meeting_start = [TEST_START_DATE + timedelta(hours=16)]
+    sessions = [Session(Block(f"lesson_{i}"), timedelta(minutes=60), starts) for i in range(4)]
+    sessions.append(Session(Block("meeting"), timedelta(minutes=60), meeting_start))
+    if compact:
+        for session in sessions:
+            session.domain_values = MinuteDomain.from_values(TEST_START_DATE, session.domain_values)
+
+    csp = CSP(sessions, {session: session.domain_values for session in sessions}, **kwargs)
+    for session in sessions:
+        csp.add_constraint(NoTimeOverlapConstraint(session, timedelta(minutes=0)))
+    return csp
+
+def test_reads_like_the_list_it_was_built_from():
+    starts = afternoon()
+    domain = MinuteDomain.from_values(TEST_START_DATE, starts)
+
+    assert len(domain) == len(starts)
+    assert list(domain) == starts
+    assert domain[0] == starts[0] and domain[-1] == starts[-1]
+    assert domain == starts
+    assert domain[2:5] == starts[2:5] and isinstance(domain[2:5], MinuteDomain)
+    assert MinuteDomain.from_range(TEST_START_DATE, starts[0], starts[-1] + timedelta(minutes=30), timedelta(minutes=30)) == domain
+
+def test_membership():
+    domain = MinuteDomain.from_values(TEST_START_DATE, afternoon())
+
+    assert afternoon()[3] in domain
+    assert afternoon()[3] + timedelta(minutes=15) not in domain
+    assert afternoon()[3] + timedelta(seconds=30) not in domain
+    assert "14:00" not in domain
+
+    unsorted = MinuteDomain.from_values(TEST_START_DATE, afternoon()[::-1])
+    assert afternoon()[3] in unsorted and list(unsorted) == afternoon()[::-1]
+
+def test_equal_whatever_the_origin():
+    shifted = MinuteDomain.from_values(TEST_START_DATE - timedelta(days=1), afternoon())
+
+    assert shifted == MinuteDomain.from_values(TEST_START_DATE, afternoon())
+    assert shifted != MinuteDomain.from_values(TEST_START_DATE, afternoon()[1:])
+
+def test_only_whole_minutes():
+    with pytest.raises(ValueError):
+        MinuteDomain.from_values(TEST_START_DATE, [TEST_START_DATE + timedelta(seconds=30)])
+
+def test_smaller_than_a_list_of_datetimes():
+    week = [TEST_START_DATE + timedelta(minutes=5 * i) for i in range(7 * 24 * 12)]
+    as_list = sys.getsizeof(week) + sum(sys.getsizeof(start) for start in week)
+    compact = MinuteDomain.from_values(TEST_START_DATE, week)
+
+    assert sys.getsizeof(compact.offsets) * 8 < as_list
+    assert pickle.loads(pickle.dumps(compact)) == week
+
+@pytest.mark.parametrize("options", [
+    {},
+    {"variable_ordering": "mrv", "inference": "forward_checking"},
+    {"variable_ordering": "mrv", "inference": "mac"},
+    {"backjumping": True, "inference": "forward_checking"},
+    {"occupancy_grid": True, "variable_ordering": "mrv", "inference": "forward_checking"},
+])
+def test_same_solution_as_list_domains(options):
+    solution = build_csp(False, **options).solve()
+    compact_solution = build_csp(True, **options).solve()
+
+    assert solution is not None
+    assert list(compact_solution.values()) == list(solution.values())
+
+def test_same_fingerprint_as_list_domains():
+    assert fingerprint(build_csp(True)) == fingerprint(build_csp(False))
+
+def test_pruned_domains_stay_compact():
+    csp = build_csp(True, inference="forward_checking")
+    lesson, meeting = csp.variables[0], csp.variables[-1]
+    assignment = {meeting: meeting.domain_values[0]}
+    domains = csp.initial_domains(assignment)
+
+    assert isinstance(domains[lesson], MinuteDomain)
+    assert len(domains[lesson]) < len(lesson.domain_values)
+    assert meeting.domain_values[0] not in domains[lesson]
+
+def test_offset_comparisons_match_the_datetimes():
+    starts = afternoon()
+    for domain in [MinuteDomain.from_values(TEST_START_DATE, starts), MinuteDomain.from_values(TEST_START_DATE, starts[::-1])]:
+        for low, high in [(starts[2], starts[5]), (starts[2] + timedelta(seconds=1), starts[3]),
+                          (starts[-1] + timedelta(minutes=1), starts[-1] + timedelta(hours=1)), (starts[0] - timedelta(hours=1), starts[0])]:
+            assert domain.starts_within(low, high) == any(low <= value < high for value in domain)
+            assert domain.between(low, high) == [value for value in domain if low <= value <= high]
+
+def test_order_is_carried_through_subsets():
+    domain = MinuteDomain.from_values(TEST_START_DATE, afternoon())
+
+    assert domain.ordered and domain.take([1, 4, 7]).ordered and domain[2:9].ordered
+    assert not domain[::-1].ordered and not MinuteDomain.from_values(TEST_START_DATE, afternoon()[::-1]).take([0, 2]).ordered
+    assert domain.take([1, 4, 7]) == [afternoon()[1], afternoon()[4], afternoon()[7]]
+
+@pytest.mark.parametrize("inference", ["forward_checking", "mac"])
+def test_pruning_works_on_the_offsets(monkeypatch, inference: str):
+    csp = build_csp(True, variable_ordering="mrv", inference=inference)
+    expected = csp.solve()
+
+    def from_values(*args):
+        raise AssertionError("a pruned domain was rebuilt from datetimes")
+    monkeypatch.setattr(MinuteDomain, "from_values", from_values)
+    assert csp.solve() == expected
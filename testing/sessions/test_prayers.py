@@ -1,36 +1,34 @@
 '''
 Testing prayers session management
 '''
-from typing import Any
-from unittest.mock import MagicMock
+import json
+import os
+from datetime import date, datetime, time, timedelta
 import pytest
 from test_base_session import TEST_START_DATE
-from mock_prayers_html_response import athan_api_data
+from mock_prayers_html_response import MockAladhanSession, athan_api_data
 from personal_time_manager.sessions.prayers import Prayers
+from personal_time_manager.sessions.prayer_times import AladhanCalendarProvider, PRAYER_NAMES
+from personal_time_manager.sessions.prayer_calculator import AstronomicalProvider
 
 def test_actual_api_connection_response():
     pass
 
+def mock_provider(cache_dir=None, session=None, **kwargs) -> AladhanCalendarProvider:
+    return AladhanCalendarProvider(Prayers.LATITUDE, Prayers.LONGITUDE, Prayers.PRAYER_CALC_METHOD,
+                                   cache_dir=cache_dir, session=session or MockAladhanSession(), **kwargs)
+
 @pytest.fixture
-def prayers(monkeypatch: pytest.MonkeyPatch) -> Prayers:
+def prayers() -> Prayers:
     '''
-    Creating a Fixture for the prayers class which intercept the HTTP request to api and replace with mock data to prevent time waste with every test
+    Creating a Fixture for the prayers class whose provider answers the HTTP requests to the api with mock data to prevent time waste with every test
     '''
-    def fake_get(url: str, params: dict[str, Any]) -> Any:
-        mock_response = MagicMock()
-        mock_response.raise_for_status.return_value = None
-        print("pytest print", params["date"], type(params['date']))
-        mock_response.json.return_value = athan_api_data[params["date"]] #TODO
-        return mock_response
-
-    monkeypatch.setattr("requests.get", fake_get)
-    prayers = Prayers(TEST_START_DATE)
-    return prayers
+    return Prayers(TEST_START_DATE, mock_provider())
 
 
 def test_prayer_class(prayers: Prayers):
     '''
-    the prayers argument here is the fixture prayers object :D which runs a mock api response using mokeypatch http request interception ;)
+    the prayers argument here is the fixture prayers object :D which runs a mock api response using a mock http session ;)
     '''
 
     # Test1: This running without errors is the first test
@@ -40,3 +38,72 @@ def test_prayer_class(prayers: Prayers):
     # Test2: 
     assert len(prayers.csp_variables) == 5*7
 
+    # Test3: fajr of saturday at 04:46, eqama 20 minutes later, leaving 5 minutes before it
+    fajr = prayers.csp_variables[0]
+    assert fajr.domain_values == [datetime(2025, 12, 6, 4, 46) + timedelta(minutes=15)]
+
+def test_one_request_per_month():
+    session = MockAladhanSession()
+    provider = mock_provider(session=session)
+
+    Prayers(TEST_START_DATE, provider)
+    Prayers(TEST_START_DATE, provider)
+
+    assert len(session.requested) == 1
+    assert session.requested[0].endswith("/2025/12")
+
+def test_months_are_cached_on_disk(tmp_path):
+    mock_provider(cache_dir=str(tmp_path)).timings(date(2025, 12, 6))
+    session = MockAladhanSession()
+    provider = mock_provider(cache_dir=str(tmp_path), session=session)
+
+    assert provider.timings(date(2025, 12, 6))["Fajr"] == time(4, 46)
+    assert session.requested == []
+
+def test_expired_months_are_fetched_again(tmp_path):
+    mock_provider(cache_dir=str(tmp_path)).timings(date(2025, 12, 6))
+    for file_name in os.listdir(tmp_path):
+        with open(tmp_path / file_name) as cache_file:
+            cached = json.load(cache_file)
+        cached["fetched_at"] -= timedelta(days=31).total_seconds()
+        with open(tmp_path / file_name, "w") as cache_file:
+            json.dump(cached, cache_file)
+
+    session = MockAladhanSession()
+    mock_provider(cache_dir=str(tmp_path), session=session).timings(date(2025, 12, 6))
+    assert len(session.requested) == 1
+
+def test_unknown_day():
+    with pytest.raises(ValueError):
+        mock_provider().timings(date(2025, 12, 20))
+
+def offline_provider() -> AstronomicalProvider:
+    pytest.importorskip("numpy")
+    return AstronomicalProvider(Prayers.LATITUDE, Prayers.LONGITUDE, Prayers.PRAYER_CALC_METHOD, Prayers.TIMEZONE)
+
+def test_offline_times_match_the_recorded_api_responses():
+    # only a summer day (2025-07-11) is recorded, answers of the api for a winter day and for the days on each side
+    # of the daylight saving time changes are still needed before the offline provider can stand in for the api
+    provider = offline_provider()
+    for response in athan_api_data.values():
+        recorded_date = datetime.strptime(response["data"]["date"]["gregorian"]["date"], "%d-%m-%Y").date()
+        timings = provider.timings(recorded_date)
+        for name in PRAYER_NAMES:
+            recorded = datetime.combine(recorded_date, time(*map(int, response["data"]["timings"][name].split(":"))))
+            assert abs(datetime.combine(recorded_date, timings[name]) - recorded) <= timedelta(minutes=1), name
+
+def test_offline_times_over_a_year():
+    provider = offline_provider()
+    minutes = provider.year_minutes(2025)
+
+    assert all(len(day_minutes) == 365 for day_minutes in minutes.values())
+    for earlier, later in zip(PRAYER_NAMES, PRAYER_NAMES[1:]):
+        assert (minutes[earlier] < minutes[later]).all()
+    # summer time starts on the last friday of april in Egypt, every prayer jumps an hour
+    assert provider.timings(date(2025, 4, 25))["Dhuhr"].hour == provider.timings(date(2025, 4, 24))["Dhuhr"].hour + 1
+
+def test_offline_prayers(prayers: Prayers):
+    offline = Prayers(TEST_START_DATE, offline_provider())
+
+    assert [session.session_descriptor for session in offline.csp_variables] == [session.session_descriptor for session in prayers.csp_variables]
+    assert all(len(session.domain_values) == 1 for session in offline.csp_variables)
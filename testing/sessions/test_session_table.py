@@ -0,0 +1,114 @@
+'''
+Testing the columnar table of sessions
+'''
+import pickle
+import sys
+from dataclasses import dataclass
+from datetime import timedelta
+import pytest
+from test_base_session import TEST_START_DATE
+from personal_time_manager.csp.csp import CSP
+from personal_time_manager.csp.constraints import NoTimeOverlapConstraint
+from personal_time_manager.csp.planner import build_table_csp
+from personal_time_manager.sessions.base_session import Session, SessionDescriptor
+from personal_time_manager.sessions.session_table import SessionTable, TableRow
+
+@dataclass(frozen=True)
+class Block(SessionDescriptor):
+    label: str
+
+    @property
+    def name(self):
+        return self.label
+
+def afternoon(first_hour: int = 14, count: int = 12) -> list:
+    return [TEST_START_DATE + timedelta(hours=first_hour, minutes=30 * i) for i in range(count)]
+
+def sessions() -> list[Session]:
+    prayer = Session(Block("asr"), timedelta(minutes=15), [TEST_START_DATE + timedelta(hours=16)])
+    lessons = [Session(Block(f"lesson_{i}"), timedelta(minutes=60), afternoon()) for i in range(3)]
+    for lesson in lessons:
+        lesson.allowed_to_overlap_session = [prayer]
+    return [prayer] + lessons
+
+def test_session_has_no_dict():
+    session = sessions()[1]
+    with pytest.raises(AttributeError):
+        session.cached_something = 1
+    assert not hasattr(session, "__dict__")
+    assert pickle.loads(pickle.dumps(session)).domain_values == session.domain_values
+
+def test_session_loads_a_pickle_made_before_slots():
+    prayer, lesson = sessions()[:2]
+    # the __dict__ a Session had before __slots__
+    old_state = {"session_descriptor": lesson.session_descriptor, "base_duration": lesson.base_duration,
+                 "domain_values": lesson.domain_values, "allowed_to_overlap_session": [prayer], "overlapped_sessions": []}
+    loaded = Session.__new__(Session)
+    loaded.__setstate__(old_state)
+
+    assert loaded.session_descriptor == lesson.session_descriptor and loaded.domain_values == lesson.domain_values
+    assert loaded.allowed_to_overlap_session == [prayer]
+    assert not hasattr(loaded, "overlapped_sessions")
+
+def test_columns_hold_the_sessions():
+    original = sessions()
+    table = SessionTable.from_sessions(original, TEST_START_DATE)
+
+    assert len(table) == 4 and table.keys == ["asr", "lesson_0", "lesson_1", "lesson_2"]
+    assert list(table.durations) == [15, 60, 60, 60]
+    assert table.domain(2) == original[2].domain_values
+    assert list(table.overlaps(3)) == [0] and list(table.overlaps(0)) == []
+    assert table.descriptor(1) is original[1].session_descriptor
+    assert table.nbytes() < sys.getsizeof(original[1].domain_values) * len(original)
+
+def test_solved_on_the_table_like_the_sessions():
+    table = SessionTable.from_sessions(sessions(), TEST_START_DATE)
+    csp = build_table_csp(table, timedelta(minutes=10), variable_ordering="mrv", inference="forward_checking")
+    solution = csp.solve()
+
+    original = sessions()
+    direct = CSP(original, {session: session.domain_values for session in original}, variable_ordering="mrv", inference="forward_checking")
+    for session in original:
+        direct.add_constraint(NoTimeOverlapConstraint(session, timedelta(minutes=10)))
+
+    assert list(solution.values()) == list(direct.solve().values())
+    assert [row["descriptor"].name for row in table.render(solution)] == [
+        session.session_descriptor.name for session, _ in sorted(direct.solve().items(), key=lambda item: item[1])]
+
+def test_descriptors_are_built_only_when_rendered():
+    built = []
+    def describe(label):
+        def build():
+            built.append(label)
+            return Block(label)
+        return build
+
+    table = SessionTable(TEST_START_DATE)
+    for i in range(3):
+        table.add(f"lesson_{i}", 60, [14 * 60 + 60 * i, 18 * 60], descriptor=describe(f"lesson_{i}"))
+    table.add("free", 30, [20 * 60])
+
+    solution = build_table_csp(table).solve()
+    assert built == []
+    assert all(isinstance(session.session_descriptor, TableRow) for session in solution)
+
+    timetable = table.render(solution)
+    assert sorted(built) == ["lesson_0", "lesson_1", "lesson_2"]
+    assert timetable[-1]["descriptor"] == TableRow("free", 3)
+    with pytest.raises(ValueError):
+        table.add("free", 30, [])
+
+def test_domains_view_the_offsets_column():
+    table = SessionTable.from_sessions(sessions(), TEST_START_DATE)
+    rows = table.table_sessions()
+
+    assert rows[2].domain_values.offsets.obj is table.domain_offsets  # a view, not a copy
+    assert rows[2].domain_values == sessions()[2].domain_values
+    assert pickle.loads(pickle.dumps(rows[2])).domain_values == rows[2].domain_values
+    with pytest.raises(ValueError):
+        table.add("late", 30, [20 * 60])  # the viewed column can't grow
+    assert len(table) == 4
+
+    del rows
+    table.add("late", 30, [20 * 60])
+    assert table.domain(4) == [TEST_START_DATE + timedelta(hours=20)]
@@ -2,3 +2,68 @@
 Testing Tuition session management
 '''
 
+import os
+import pickle
+from datetime import datetime, timedelta
+from personal_time_manager.sessions.base_session import Session
+from personal_time_manager.sessions.minute_domain import MinuteDomain
+from personal_time_manager.sessions.tuition import Student, StudentStatus, Subject, Tuition, Tuitions, tuition_source
+
+TEST_START_DATE = datetime(2025, 12, 6)  # Saturday
+
+def test_pkl_domains_are_moved_onto_the_wanted_week(tmp_path, monkeypatch):
+    student = Student("Omar", "Adel", 10, StudentStatus.Alpha)
+    tuition = Tuition([student], Subject.Maths, timedelta(hours=1))
+    # the template was made for the week of the 6th, starting on the monday
+    template_starts = [TEST_START_DATE + timedelta(days=2, hours=17), TEST_START_DATE + timedelta(days=4, hours=18)]
+    pkl_file = tmp_path / "tuition_domain_dict.pkl"
+    pkl_file.write_bytes(pickle.dumps([Session(tuition, tuition.duration, template_starts)]))
+    monkeypatch.setattr(Tuitions, "PKL_TUITION_DOMAIN_DICT_FILE_NAME", str(pkl_file))
+
+    same_week = Tuitions(TEST_START_DATE).csp_variables[0]
+    later_week = Tuitions(TEST_START_DATE + timedelta(weeks=3)).csp_variables[0]
+
+    assert isinstance(same_week.domain_values, MinuteDomain)
+    assert list(same_week.domain_values) == template_starts
+    assert list(later_week.domain_values) == [start + timedelta(weeks=3) for start in template_starts]
+
+def write_template(pkl_file, minutes: int = 60) -> list[Session]:
+    student = Student("Omar", "Adel", 10, StudentStatus.Alpha)
+    maths = Tuition([student], Subject.Maths, timedelta(minutes=minutes))
+    physics = Tuition([student], Subject.Physics, timedelta(minutes=minutes))
+    sessions = [Session(maths, maths.duration, [TEST_START_DATE + timedelta(hours=17)]),
+                Session(physics, physics.duration, [TEST_START_DATE + timedelta(hours=19)])]
+    sessions[0].allowed_to_overlap_session = [sessions[1]]
+    pkl_file.write_bytes(pickle.dumps(sessions))
+    return sessions
+
+def test_pkl_is_read_once(tmp_path, monkeypatch):
+    pkl_file = tmp_path / "tuition_domain_dict.pkl"
+    write_template(pkl_file)
+    monkeypatch.setattr(Tuitions, "PKL_TUITION_DOMAIN_DICT_FILE_NAME", str(pkl_file))
+
+    tuitions = Tuitions(TEST_START_DATE)
+    again = Tuitions(TEST_START_DATE)
+    later = Tuitions(TEST_START_DATE + timedelta(weeks=1))
+
+    assert tuitions.csp_variables is again.csp_variables
+    assert list(tuitions.csp_domains) == tuitions.csp_variables
+    assert later.csp_variables[0] is not tuitions.csp_variables[0]
+    # the overlaps point to the sessions of the same week
+    assert later.csp_variables[0].allowed_to_overlap_session == [later.csp_variables[1]]
+    assert tuition_source(str(pkl_file)).reads == 1
+
+def test_pkl_is_read_again_when_it_changes(tmp_path, monkeypatch):
+    pkl_file = tmp_path / "tuition_domain_dict.pkl"
+    write_template(pkl_file)
+    monkeypatch.setattr(Tuitions, "PKL_TUITION_DOMAIN_DICT_FILE_NAME", str(pkl_file))
+    before = Tuitions(TEST_START_DATE).csp_variables
+
+    write_template(pkl_file, minutes=90)
+    os.utime(pkl_file, ns=(os.stat(pkl_file).st_atime_ns, os.stat(pkl_file).st_mtime_ns + 10**9))
+    after = Tuitions(TEST_START_DATE).csp_variables
+    assert after[0].base_duration == timedelta(minutes=90) and after is not before
+
+    tuition_source(str(pkl_file)).invalidate()
+    assert Tuitions(TEST_START_DATE).csp_variables is not after
+    assert tuition_source(str(pkl_file)).reads == 3